@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""واجهة قراءة بدون Streamlit (HTTP محلي أو سطر أوامر) لأرقام لوحة المتابعة.
+
+    python api.py serve [--host 127.0.0.1] [--port 8502]
+    python api.py today|mtd|funding|monthly|daily [--start YYYY-MM-DD] [--end ...]
+                  [--days 30] [--branch X] [--format json|csv] [--if-none-match ETAG]
+
+HTTP: GET /today, /mtd, /funding, /monthly, /daily بنفس المعاملات كـ query
+(?start=&end=&days=&branch=&format=csv).
+
+- today / mtd / funding / monthly من الملخصات المحفوظة (نفس أرقام اللوحة)، و daily
+  صفوف الإطار المشتق (نفس منطق fetch_daily_df) شهرًا بشهر عبر exporter.iter_month_frames
+  ومتدفقة (chunked) فالمدى الكبير لا يُجمع في الذاكرة.
+- ETag = عدّاد الكتابات + التقرير ومعاملاته + تاريخ اليوم. العدّاد (صف واحد) يُقرأ في
+  كل طلب، فالطلب المكرر بدون كتابات يرجع 304 باستعلام واحد رخيص بدل التقرير. في CLI:
+  --if-none-match يخرج بالرمز 3 بدون ناتج لو لم يتغير شيء.
+"""
+import argparse
+import hashlib
+import json
+import sys
+import traceback
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import db
+import profiling
+import rollups
+
+DEFAULT_PORT = 8502
+FUND_LOOKBACK_DAYS = 30  # مثل نافذة التمويل في اللوحة
+NOT_MODIFIED = 3         # رمز خروج CLI عند تطابق --if-none-match
+
+# أعمدة daily: (المفتاح في الناتج، العمود في الإطار المشتق)
+DAILY_FIELDS = [
+    ("dte", "dte"),
+    ("units_baton", "units_baton"), ("units_round", "units_round"),
+    ("sales_baton", "مبيعات البسطونة"), ("sales_round", "مبيعات المدور"),
+    ("sales", "إجمالي المبيعات"),
+    ("core_expenses", "الإجمالي اليومي للمصروفات (بدون الغاز والإيجار)"),
+    ("allocated", "تكلفة يومية مُوزعة (غاز + إيجار)"),
+    ("expenses", "الإجمالي اليومي للمصروفات (شامل الموزع)"),
+    ("profit", "الربح الصافي لليوم"),
+    ("funding", "funding"),
+]
+
+# # ============== الإصدار (ETag) # ==============
+
+def data_token(path: str = None) -> str:
+    """نسخة بيانات الفرع: عدّاد الكتابات (SELECT لصف واحد في كل طلب).
+
+    لا نعتمد على stat لملف القاعدة/الـ WAL: دقة mtime وإعادة استخدام الـ WAL بعد
+    checkpoint بنفس الحجم قد تُبقي التوقيع كما هو بعد كتابة → 304 قديم."""
+    path = path or db.current_path()
+    if path == ":memory:":
+        return f"m{db.data_version()}"
+    return str(db.write_counter(path))
+
+
+def etag(report: str, params: dict, path: str = None) -> str:
+    key = json.dumps([report, sorted(params.items()), date.today().isoformat()], default=str)
+    return f'"{data_token(path)}-{hashlib.sha1(key.encode()).hexdigest()[:12]}"'
+
+
+# # ============== التقارير # ==============
+
+def _day(value, name):
+    if value in (None, ""):
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        raise ValueError(f"تاريخ غير صالح في {name}: {value}") from None
+
+
+@profiling.timed
+def report_today(params) -> dict:
+    """آخر يوم مسجّل: المبيعات والمصروفات (شامل الموزع) والربح."""
+    latest = rollups.latest_day()
+    if latest is None:
+        return {"date": None, "sales": 0, "expenses": 0, "profit": 0}
+    return {"date": latest.isoformat(), **rollups.summary(latest, latest)}
+
+
+@profiling.timed
+def report_mtd(params) -> dict:
+    """من أول شهر end (الافتراضي آخر يوم مسجّل) حتى end."""
+    end = _day(params.get("end"), "end") or rollups.latest_day()
+    if end is None:
+        return {"start": None, "end": None, "sales": 0, "expenses": 0, "profit": 0}
+    start = end.replace(day=1)
+    return {"start": start.isoformat(), "end": end.isoformat(), **rollups.summary(start, end)}
+
+
+@profiling.timed
+def report_funding(params) -> dict:
+    """تمويل آخر days يوم حتى end (الافتراضي اليوم) + إجمالي التمويل."""
+    days = int(params.get("days") or FUND_LOOKBACK_DAYS)
+    if days < 1:
+        raise ValueError("days يجب أن يكون 1 أو أكثر")
+    end = _day(params.get("end"), "end")
+    start = (end or date.today()) - timedelta(days=days)
+    return {
+        "days": days, "start": start.isoformat(), "end": end.isoformat() if end else None,
+        "funding": rollups.summary(start, end, metrics=("funding",))["funding"],
+        "total_funding": rollups.summary(metrics=("funding",))["funding"],
+    }
+
+
+@profiling.timed
+def report_monthly(params) -> list:
+    """مجاميع كل شهر يتقاطع مع start/end."""
+    df = rollups.monthly_totals(_day(params.get("start"), "start"), _day(params.get("end"), "end"))
+    return df.to_dict("records")
+
+
+def iter_daily(params):
+    """إطارات daily (أعمدة DAILY_FIELDS) شهرًا بشهر."""
+    import exporter
+
+    start, end = _day(params.get("start"), "start"), _day(params.get("end"), "end")
+    for _, df in exporter.iter_month_frames(start, end):
+        out = df.reindex(columns=[c for _, c in DAILY_FIELDS])
+        out.columns = [k for k, _ in DAILY_FIELDS]
+        out["dte"] = out["dte"].dt.strftime("%Y-%m-%d")
+        yield out
+
+
+REPORTS = {
+    "today": report_today,
+    "mtd": report_mtd,
+    "funding": report_funding,
+    "monthly": report_monthly,
+    "daily": None,  # متدفق: iter_daily
+}
+
+
+def _csv_line(values) -> str:
+    return ",".join("" if v is None else str(v) for v in values) + "\n"
+
+
+def body(report: str, params: dict, fmt: str = "json"):
+    """مولّد نصوص الناتج. لا يلمس القاعدة قبل أول next()."""
+    if report == "daily":
+        first = True
+        if fmt == "json":
+            yield "["
+        for df in iter_daily(params):
+            if fmt == "csv":
+                yield df.to_csv(index=False, header=first, lineterminator="\n")
+            else:
+                rows = df.to_json(orient="records", force_ascii=False)[1:-1]
+                if rows:
+                    yield ("" if first else ",") + rows
+            first = False
+        if fmt == "json":
+            yield "]"
+        elif first:
+            yield _csv_line(k for k, _ in DAILY_FIELDS)
+        return
+    out = REPORTS[report](params)
+    if fmt == "json":
+        yield json.dumps(out, ensure_ascii=False)
+        return
+    rows = out if isinstance(out, list) else [out]
+    header = list(rows[0]) if rows else ["month", "days", "sales", "expenses", "profit", "funding"]
+    yield _csv_line(header)
+    for r in rows:
+        yield _csv_line(r.get(k) for k in header)
+
+
+def _check(report: str, params: dict, fmt: str):
+    if report not in REPORTS:
+        raise LookupError(f"تقرير غير معروف: {report}")
+    if fmt not in ("json", "csv"):
+        raise ValueError(f"صيغة غير معروفة: {fmt}")
+    branch = params.get("branch")
+    if branch and branch not in db.branches():
+        raise LookupError(f"فرع غير موجود: {branch}")
+
+
+# # ============== HTTP # ==============
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # chunked لـ daily
+    server_version = "BakeryAPI/1"
+
+    def _send_error(self, code, msg):
+        data = json.dumps({"error": msg}, ensure_ascii=False).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        report = url.path.strip("/")
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        fmt = params.pop("format", "json")
+        headers_sent = False
+        try:
+            _check(report, params, fmt)
+            with db.use_branch(params.get("branch")):
+                db.init_db()
+                tag = etag(report, {**params, "format": fmt})
+                if tag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+                    self.send_response(304)
+                    self.send_header("ETag", tag)
+                    self.end_headers()
+                    return
+                chunks = body(report, params, fmt)
+                first = next(chunks)  # أخطاء المعاملات قبل إرسال 200
+                self.send_response(200)
+                ctype = "text/csv" if fmt == "csv" else "application/json"
+                self.send_header("Content-Type", f"{ctype}; charset=utf-8")
+                self.send_header("ETag", tag)
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                headers_sent = True
+                for chunk in _chain(first, chunks):
+                    data = chunk.encode()
+                    if data:
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # العميل قطع أثناء التدفق
+        except Exception as e:
+            if headers_sent:
+                # 200 أُرسل: لا رد خطأ داخل التدفق. نقطع الاتصال بدون الكتلة الأخيرة
+                # (0\r\n\r\n) فيرى العميل ردًا ناقصًا بدل JSON/CSV مبتور يبدو سليمًا
+                self.close_connection = True
+                self.log_error("انقطع تدفق %s: %s", report, traceback.format_exc())
+            elif isinstance(e, LookupError):
+                self._send_error(404, str(e))
+            elif isinstance(e, ValueError):
+                self._send_error(400, str(e))
+            else:
+                self.log_error("خطأ في %s: %s", self.path, traceback.format_exc())
+                self._send_error(500, "خطأ داخلي")
+
+    def log_request(self, code="-", size="-"):
+        pass  # بدون سطر لكل طلب (الاستعلام المتكرر كل ثوانٍ)؛ log_error يبقى
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+def serve(host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    db.init_db(db.DB_FILE)
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+# # ============== CLI # ==============
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="قراءة تقارير المخبز بدون Streamlit")
+    ap.add_argument("report", choices=["serve", *REPORTS])
+    ap.add_argument("--start", default=None)
+    ap.add_argument("--end", default=None)
+    ap.add_argument("--days", type=int, default=None, help=f"نافذة funding (الافتراضي {FUND_LOOKBACK_DAYS})")
+    ap.add_argument("--branch", default=None)
+    ap.add_argument("--format", choices=["json", "csv"], default="json")
+    ap.add_argument("--if-none-match", default=None, help="ETag سابق: لا ناتج (رمز 3) لو لم يتغير")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = ap.parse_args(argv)
+
+    if args.report == "serve":
+        server = serve(args.host, args.port)
+        print(f"http://{args.host}:{server.server_port}/ (today, mtd, funding, monthly, daily)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    params = {k: v for k, v in (("start", args.start), ("end", args.end), ("days", args.days),
+                                ("branch", args.branch)) if v is not None}
+    try:
+        _check(args.report, params, args.format)
+        with db.use_branch(args.branch):
+            db.init_db()
+            tag = etag(args.report, {**params, "format": args.format})
+            print(f"ETag: {tag}", file=sys.stderr)
+            if args.if_none_match == tag:
+                return NOT_MODIFIED
+            for chunk in body(args.report, params, args.format):
+                sys.stdout.write(chunk)
+    except (LookupError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    if args.format == "json":
+        sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
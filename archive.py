@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""أرشفة الشهور المغلقة: طبقة ساخنة (SQLite) وطبقة باردة (Parquet لكل شهر).
+
+الشهر المغلق = قبل الشهر الحالي وله قيد غاز/إيجار في monthly؛ صفوفه لا تتغير بعد
+ذلك. archive_month يكتب صفوف الشهر مشتقة بالكامل (نفس metrics.enrich) في
+<القاعدة>.archive/YYYY-MM.parquet، يسجّله في archive_months ويحذفه من daily في
+معاملة واحدة. الملخصات (daily_rollup / monthly_rollup) تبقى كما هي.
+
+- القراءة: read_enriched يقرأ من الفهرس الشهور الباردة المتقاطعة مع المدى فقط
+  (تقليم بالشهر) ويضمها للصفوف الساخنة بعد اشتقاقها.
+- الاسترجاع: أي كتابة على تاريخ في شهر مؤرشف (تصحيح بأثر رجعي، قيد شهري، تعديل
+  تاريخ) تعيد الشهر إلى daily بنفس الـ ids داخل معاملة الكتابة (db._thaw)، ويمكن
+  استرجاع شهر يدويًا بـ restore_month. الحذف/التعديل بالـ id يسترجع شهره (thaw_ids).
+- التصفح: page_rows يكمل صفحات db.page_daily بالصفوف المؤرشفة.
+
+    python archive.py --list
+    python archive.py --close              # أرشفة كل الشهور المغلقة
+    python archive.py --restore 2025-01    [--branch NAME]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from datetime import date
+
+import pandas as pd
+
+import db
+import profiling
+import reports
+import rollups
+
+SUFFIX = ".archive"
+
+
+def create_tables(conn):
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS archive_months ("
+        "month TEXT PRIMARY KEY, rows INTEGER NOT NULL, file TEXT NOT NULL, archived_at REAL NOT NULL)"
+    )
+
+
+def archive_dir(path: str = None) -> str:
+    return (path or db.current_path()) + SUFFIX
+
+
+def _file_path(name: str, path: str = None) -> str:
+    return os.path.join(archive_dir(path), name)
+
+
+def _next_key(key: str) -> str:
+    return reports.iso_day(reports.next_month(date.fromisoformat(key)))
+
+
+def archived(conn=None) -> dict:
+    """{شهر YYYY-MM-01: عدد الصفوف} للشهور الموجودة في الطبقة الباردة."""
+    if conn is None:
+        with db.connection() as conn:
+            return archived(conn)
+    return dict(conn.execute("SELECT month, rows FROM archive_months ORDER BY month"))
+
+
+def closed_months() -> list:
+    """شهور مغلقة ما زالت في SQLite (قبل الشهر الحالي ولها قيد في monthly)."""
+    current = rollups.month_key(date.today())
+    with db.connection() as conn:
+        rows = conn.execute(
+            "SELECT r.month FROM monthly_rollup r JOIN monthly m ON m.month = r.month "
+            "WHERE r.month < ? AND r.rows > 0 AND r.month NOT IN (SELECT month FROM archive_months) "
+            "ORDER BY r.month",
+            (current,),
+        ).fetchall()
+    return [r[0] for r in rows]
+
+
+# # ============== الأرشفة / الاسترجاع # ==============
+
+@profiling.timed
+def archive_month(month) -> int:
+    """ينقل شهرًا مغلقًا إلى Parquet. يرجّع عدد الصفوف المنقولة (0 لو لا شيء)."""
+    from metrics import enrich
+
+    if not db.DB_PERSISTENT:
+        raise ValueError("الأرشفة تحتاج قاعدة بيانات على القرص (DB_DIR)")
+    key = rollups.month_key(month)
+    if key >= rollups.month_key(date.today()):
+        raise ValueError("الشهر الحالي يبقى في SQLite")
+    nxt = _next_key(key)
+    name = key[:7] + ".parquet"
+    with db.connection() as conn:
+        # قفل الكتابة طوال العملية: الشهر لا يتغير بين القراءة والحذف
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute("SELECT 1 FROM archive_months WHERE month=?", (key,)).fetchone():
+            return 0
+        # نفس الاتصال: قراءة من pool آخر أثناء BEGIN IMMEDIATE تنتظر اتصالًا (أو ترى لقطة أخرى)
+        df = enrich(db.read_daily(start=key, end=nxt, conn=conn), db.fetch_monthly_df(conn=conn))
+        if df.empty:
+            return 0
+        os.makedirs(archive_dir(), exist_ok=True)
+        tmp = _file_path(name + ".tmp")
+        df.to_parquet(tmp, index=False)
+        with open(tmp, "rb") as fh:
+            os.fsync(fh.fileno())
+        os.replace(tmp, _file_path(name))
+        conn.execute(
+            "INSERT INTO archive_months (month, rows, file, archived_at) VALUES (?,?,?,?)",
+            (key, len(df), name, time.time()),
+        )
+        conn.execute("DELETE FROM daily WHERE dte >= ? AND dte < ?", (key, nxt))
+        n = db._mark_write(conn)
+    db._wrote(n)
+    db._bump_version(db.RESET, None)  # الصفوف انتقلت بين الطبقتين → إعادة بناء المشتق
+    return len(df)
+
+
+def archive_closed() -> dict:
+    """يؤرشف كل الشهور المغلقة. يرجّع {شهر: صفوف}."""
+    out = {m: archive_month(m) for m in closed_months()}
+    _prune_files()
+    return out
+
+
+def thaw(conn, dtes) -> list:
+    """يعيد الشهور المؤرشفة لهذه التواريخ إلى daily داخل معاملة conn. يرجّع الشهور."""
+    keys = sorted({rollups.month_key(d) for d in dtes if d})
+    if not keys:
+        return []
+    rows = conn.execute(
+        f"SELECT month, file FROM archive_months WHERE month IN ({','.join('?' * len(keys))})", keys
+    ).fetchall()
+    cols = list(db.SCHEMA_DAILY)
+    for month, name in rows:
+        df = pd.read_parquet(_file_path(name), columns=cols)
+        df["dte"] = df["dte"].dt.strftime("%Y-%m-%d")
+        values = df.astype(object).where(df.notna(), None)
+        conn.executemany(
+            f"INSERT INTO daily ({','.join(cols)}) VALUES ({','.join('?' * len(cols))})",
+            values.itertuples(index=False, name=None),
+        )
+        conn.execute("DELETE FROM archive_months WHERE month=?", (month,))
+    # ملف الشهر يبقى حتى _prune_files (لو فشلت المعاملة يظل الفهرس مشيرًا إليه)
+    return [m for m, _ in rows]
+
+
+def thaw_ids(conn, ids) -> list:
+    """مثل thaw لكن بالـ id (حذف/تعديل من متصفح السجلات): الشهور المؤرشفة التي تحوي
+    ids غير موجودة في daily تعود إليها. لا يفتح أي ملف لو كانت كلها ساخنة."""
+    ids = sorted({int(i) for i in ids})
+    if not ids:
+        return []
+    hot = {r[0] for r in conn.execute(f"SELECT id FROM daily WHERE id IN ({','.join('?' * len(ids))})", ids)}
+    missing = set(ids) - hot
+    if not missing:
+        return []
+    months = [m for m, name in _catalog(conn).items()
+              if pd.read_parquet(_file_path(name), columns=["id"])["id"].isin(missing).any()]
+    return thaw(conn, months)
+
+
+@profiling.timed
+def restore_month(month) -> bool:
+    """استرجاع يدوي لشهر مؤرشف إلى SQLite. يرجّع False لو لم يكن مؤرشفًا."""
+    with db.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        done = thaw(conn, [rollups.month_key(month)])
+        n = db._mark_write(conn) if done else None
+    if done:
+        db._wrote(n)
+        db._bump_version(db.RESET, None)
+    _prune_files()
+    return bool(done)
+
+
+def _prune_files():
+    """يحذف ملفات Parquet التي لم تعد في الفهرس (شهور استُرجعت)."""
+    folder = archive_dir()
+    if not os.path.isdir(folder):
+        return
+    keep = {v for v in _catalog().values()}
+    for f in glob.glob(os.path.join(glob.escape(folder), "*.parquet")):
+        if os.path.basename(f) not in keep:
+            try:
+                os.remove(f)
+            except OSError:
+                pass
+
+
+def _catalog(conn=None) -> dict:
+    if conn is None:
+        with db.connection() as conn:
+            return _catalog(conn)
+    return dict(conn.execute("SELECT month, file FROM archive_months"))
+
+
+# # ============== القراءة الموحّدة # ==============
+
+@profiling.timed
+def read_enriched(start=None, end=None, monthly: pd.DataFrame = None, path: str = None) -> pd.DataFrame:
+    """اليومية المشتقة من الطبقتين بين start و end (end شامل)، مرتبة بالتاريخ ثم id.
+
+    الشهور الباردة تُقرأ جاهزة من Parquet (الشهور خارج المدى لا تُفتح)، والساخنة
+    تُقرأ أشهرًا كاملة وتُشتق (حتى يبقى آخر يوم مسجّل والبواقي صحيحًا) ثم تُقص.
+    path: قاعدة بعينها بدل الفرع الحالي (محرك metrics المرتبط بمسار).
+    """
+    from metrics import enrich
+
+    lo, hi = reports.iso_day(start), reports.end_exclusive(end)
+    first = rollups.month_key(lo) if lo else None
+    last = None
+    if hi:  # حد الشهر الكامل الذي يحوي آخر يوم في المدى
+        last = hi if hi.endswith("-01") else _next_key(rollups.month_key(hi))
+    with db.connection(path) as conn:
+        conn.execute("BEGIN")  # لقطة واحدة: الفهرس والصفوف الساخنة والقيود الشهرية معًا
+        monthly = db.fetch_monthly_df(conn=conn) if monthly is None else monthly
+        catalog = _catalog(conn)
+        hot = db.read_daily(start=first, end=last, conn=conn)
+    frames = [] if hot.empty else [enrich(hot, monthly)]
+    months = sorted(m for m in catalog if (first is None or m >= first) and (hi is None or m < hi))
+    if months:
+        frames += [pd.read_parquet(_file_path(catalog[m], path)) for m in months]
+    if not frames:
+        return hot
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    if len(frames) > 1:
+        df = df.sort_values(["dte", "id"], kind="stable", ignore_index=True)
+    if lo:
+        df = df[df["dte"] >= lo]
+    if hi:
+        df = df[df["dte"] < hi]
+    return df.reset_index(drop=True)
+
+
+def page_rows(start: str = None, end: str = None, after=None, limit: int = 50) -> pd.DataFrame:
+    """أول limit صف خام (أعمدة SCHEMA_DAILY) من الطبقة الباردة بعد المؤشر after = (dte, id)
+    ضمن start <= dte < end — نصف db.page_daily المؤرشف. يفتح الشهور بالترتيب ويتوقف
+    عند اكتمال الصفحة؛ None لو لا شيء."""
+    lo = rollups.month_key(start) if start else None
+    if after is not None:
+        lo = max(lo or "", rollups.month_key(after[0]))
+    frames, n = [], 0
+    for month, name in sorted(_catalog().items()):
+        if (lo and month < lo) or (end and month >= end):
+            continue
+        df = pd.read_parquet(_file_path(name), columns=list(db.SCHEMA_DAILY))
+        day = df["dte"].dt.strftime("%Y-%m-%d")
+        keep = pd.Series(True, index=df.index)
+        if start:
+            keep &= day >= start
+        if end:
+            keep &= day < end
+        if after is not None:
+            keep &= (day > after[0]) | ((day == after[0]) & (df["id"] > int(after[1])))
+        df = df[keep]
+        if not df.empty:
+            frames.append(df)
+            n += len(df)
+            if n >= limit:
+                break
+    if not frames:
+        return None
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    return df.sort_values(["dte", "id"], kind="stable", ignore_index=True).head(limit)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="أرشفة الشهور المغلقة إلى Parquet واسترجاعها")
+    ap.add_argument("--list", action="store_true", help="عرض الشهور المؤرشفة والمغلقة")
+    ap.add_argument("--close", action="store_true", help="أرشفة كل الشهور المغلقة")
+    ap.add_argument("--restore", metavar="YYYY-MM", help="استرجاع شهر إلى SQLite")
+    ap.add_argument("--branch", default=None)
+    args = ap.parse_args(argv)
+    db.set_branch(args.branch)
+    db.init_db()
+    if args.close:
+        for m, n in archive_closed().items():
+            print(f"أُرشف {m[:7]}: {n} صف")
+    if args.restore:
+        ok = restore_month(args.restore + "-01" if len(args.restore) == 7 else args.restore)
+        print("تم الاسترجاع." if ok else "الشهر غير مؤرشف.")
+    if args.list or not (args.close or args.restore):
+        for m, n in archived().items():
+            print(f"مؤرشف {m[:7]}: {n} صف")
+        print(f"مغلق وما زال في SQLite: {', '.join(m[:7] for m in closed_months()) or '—'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
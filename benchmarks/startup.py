@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""قياس زمن بدء التطبيق (تشغيل بارد في عملية جديدة لكل قياس).
+
+    python benchmarks/startup.py [--runs 5] [--days 730] [--json out.json]
+
+لكل صفحة: عملية Python جديدة تستورد streamlit ثم تشغّل app.py مرة واحدة عبر AppTest
+على قاعدة مؤقتة فيها --days يومًا. يُسجَّل زمن استيراد streamlit، زمن أول تشغيل
+للسكربت، وهل حُمّلت المكتبات الثقيلة (plotly.express / openpyxl / gspread). الناتج JSON
+(الوسيط لكل صفحة) لمقارنته بين النسخ.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = {
+    "input": "📝 الإدخال اليومي",
+    "dashboard": "📈 لوحة المتابعة",
+    "monthly": "🗓️ التكاليف الشهرية",
+    "manage": "🧰 إدارة البيانات",
+}
+HEAVY = ("plotly.express", "openpyxl", "gspread")  # streamlit نفسه يستورد plotly الخفيف
+
+_SEED = """
+import random, sys
+sys.path.insert(0, {root!r})
+import db, pandas as pd
+db.init_db()
+random.seed(0)
+days = pd.date_range(end=pd.Timestamp.today().normalize(), periods={days})
+db.insert_daily_many([
+    {{"dte": d.strftime("%Y-%m-%d"), "units_baton": random.randint(100, 900), "u1000_baton": 200,
+      "units_round": random.randint(50, 400), "u1000_round": 160, "yeast": random.randint(0, 3000)}}
+    for d in days
+])
+for m in sorted({{d.strftime("%Y-%m-01") for d in days}}):
+    db.upsert_monthly(m, random.randint(0, 90_000), random.randint(0, 90_000))
+"""
+
+_RUN = """
+import json, os, sys, time
+os.chdir({root!r})
+sys.path.insert(0, {root!r})
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t1 = time.perf_counter()
+at = AppTest.from_file("app.py", default_timeout=300)
+at.secrets["startup_bench"] = "1"
+at.session_state["page"] = {page!r}
+at.run()
+t2 = time.perf_counter()
+print(json.dumps({{
+    "import_streamlit_s": t1 - t0,
+    "first_run_s": t2 - t1,
+    "loaded": {{m: m in sys.modules for m in {heavy!r}}},
+    "exception": [e.message for e in at.exception],
+}}))
+"""
+
+
+def _python(code: str, env: dict) -> str:
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return out.stdout.strip().splitlines()[-1]
+
+
+def measure(runs: int = 5, days: int = 730) -> dict:
+    env = dict(os.environ, DB_DIR=tempfile.mkdtemp(prefix="bakery_startup_"))
+    env.pop("BAKERY_CPROFILE", None)
+    subprocess.run([sys.executable, "-c", _SEED.format(root=ROOT, days=days)], env=env, check=True)
+    result = {"python": sys.version.split()[0], "runs": runs, "days": days, "pages": {}}
+    for name, label in PAGES.items():
+        samples = [json.loads(_python(_RUN.format(root=ROOT, page=label, heavy=HEAVY), env)) for _ in range(runs)]
+        result["pages"][name] = {
+            "import_streamlit_s": statistics.median(s["import_streamlit_s"] for s in samples),
+            "first_run_s": statistics.median(s["first_run_s"] for s in samples),
+            "loaded": samples[-1]["loaded"],
+            "exception": samples[-1]["exception"],
+        }
+    return result
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="قياس زمن بدء التطبيق لكل صفحة")
+    ap.add_argument("--runs", type=int, default=5, help="عدد العمليات الباردة لكل صفحة (الوسيط)")
+    ap.add_argument("--days", type=int, default=730, help="أيام البيانات في القاعدة المؤقتة")
+    ap.add_argument("--json", default=None, help="حفظ النتيجة في ملف بدل الطباعة فقط")
+    args = ap.parse_args(argv)
+    result = measure(args.runs, args.days)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            fh.write(text)
+    print(text)
+    return 1 if any(p["exception"] for p in result["pages"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+"""قياس الأداء من الطرف للطرف على بيانات مُولّدة (benchmarks/synth.py).
+
+    python benchmarks/suite.py [--scales 1,10,50] [--repeat 5] [--json out.json]
+    python benchmarks/suite.py --compare base.json new.json [--threshold 1.2]
+
+لكل حجم (سنة-فرع): عملية جديدة بـ DB_DIR مؤقت تولّد البيانات ثم تقيس المسارات:
+
+- load:      db.read_daily كاملة (SQLite → إطار مضغوط الأنواع)
+- derive:    metrics.fetch_daily_df (إعادة حساب كاملة) وبناء محرك جديد من الصفر
+- aggregate: ملخصات اللوحة (rollups / charts.series بكاش فارغ) وكل الفروع
+  المسارات "الباردة" تمسح الكاش المشترك (shared_cache) قبل كل تكرار؛ *_warm نفس
+  المسار وملف الكاش موجود (عملية أخرى بنته: قراءة mmap)
+- scenario:  شبكة "ماذا لو" (scenarios.profit_grid) بكاش فارغ
+- export:    exporter.write_workbook إلى ملف مؤقت
+- insert:    دفعة من السجلات بـ insert_daily مباشرة، وعبر طابور الإدخال (ingest)
+- concurrent: كتّاب وقرّاء متزامنون لمدة --seconds (دوال مباشرة، أو جلسات AppTest
+  للوحة المتابعة مع --apptest تتناوب على خيط واحد)
+
+لكل مسار: الوسيط و p95 والأقل بالمللي ثانية، وعدد استعلامات SQL والصفوف المقروءة
+من profiling في أول تشغيل (خيط القياس فقط؛ عمل خيوط الفروع/الطابور لا يُعدّ). الناتج JSON فيه رقم الـ commit لمقارنته بين النسخ بـ
+--compare. لا شيء يحتاج شبكة.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HERE = os.path.dirname(os.path.abspath(__file__))
+PAGE_DASH = "📈 لوحة المتابعة"
+BURST_ROWS = 200
+SLOW_REPEAT = 2   # تكرار المسارات البطيئة (التصدير، الدفعات)
+NOISE_MS = 1.0    # فرق أقل من هذا لا يُعدّ تراجعًا مهما كانت النسبة
+
+
+def _stats(samples: list) -> dict:
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "runs": len(ms),
+        "median_ms": statistics.median(ms),
+        "p95_ms": ms[min(len(ms) - 1, int(round(0.95 * (len(ms) - 1))))],
+        "min_ms": ms[0],
+    }
+
+
+def _measure(fn, repeat: int, setup=None) -> dict:
+    """يشغّل fn مرة تحت profiling (استعلامات/صفوف) ثم repeat مرة للزمن."""
+    import profiling
+
+    if setup:
+        setup()
+    profiling.begin_run("bench")
+    fn()
+    run = profiling.end_run()
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return {**_stats(samples), "sql_calls": run["sql_calls"], "rows_read": run["rows_read"]}
+
+
+# # ============== المسارات # ==============
+
+def _future_rows(first: date, n: int, offset: int = 0) -> list:
+    """سجلات لأيام بعد آخر يوم في البيانات (لا تصطدم بالتاريخ الفريد)."""
+    return [
+        {"dte": (first + timedelta(days=offset + i)).isoformat(), "units_baton": 500 + i % 50,
+         "units_round": 200, "u1000_baton": 25, "u1000_round": 16, "flour_bags": 2,
+         "flour_bag_price": 12_000, "yeast": 3000, "breakfast": 1500}
+        for i in range(n)
+    ]
+
+
+def run_paths(repeat: int):
+    """(نتائج المسارات، أول يوم حر بعد دفعات الإدخال)."""
+    import charts
+    import db
+    import exporter
+    import ingest
+    import metrics
+    import rollups
+    import scenarios
+    import shared_cache
+
+    def cold_engine():
+        # الكاش المشترك (Arrow) يجعل "إعادة البناء" قراءة mmap: المسار البارد يبني فعلًا
+        shared_cache.clear()
+
+    def warm_charts():
+        with charts._lock:
+            charts._cache.clear()
+
+    def cold_charts():
+        shared_cache.clear()
+        warm_charts()
+
+    def cold_scenarios():
+        with scenarios._lock:
+            scenarios._bases.clear()
+            scenarios._surfaces.clear()
+
+    def engine_rebuild():
+        return metrics.DerivedMetrics(db.current_path()).daily()
+
+    def charts_month():
+        return charts.series("month")
+
+    def charts_day_90d():
+        return charts.series("day", start=date.today() - timedelta(days=90))
+
+    out = {
+        "load.read_daily": _measure(db.read_daily, repeat),
+        "derive.fetch_daily_df": _measure(metrics.fetch_daily_df, repeat),
+        "derive.engine_rebuild": _measure(engine_rebuild, repeat, setup=cold_engine),
+        "derive.engine_rebuild_warm": _measure(engine_rebuild, repeat),
+        "aggregate.rollups_summary": _measure(rollups.summary, repeat),
+        "aggregate.charts_month": _measure(charts_month, repeat, setup=cold_charts),
+        "aggregate.charts_month_warm": _measure(charts_month, repeat, setup=warm_charts),
+        "aggregate.charts_day_90d": _measure(charts_day_90d, repeat, setup=cold_charts),
+        "aggregate.charts_day_90d_warm": _measure(charts_day_90d, repeat, setup=warm_charts),
+        "aggregate.all_branches": _measure(lambda: rollups.combine(rollups.summary_by_branch()), repeat),
+        "aggregate.all_branches_series": _measure(rollups.daily_series_all, repeat),
+        "scenario.grid_41x41x21": _measure(
+            lambda: scenarios.profit_grid(range(-20, 21), range(-20, 21), range(-50, 55, 5)),
+            repeat, setup=cold_scenarios),
+    }
+
+    fd, xlsx = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        out["export.write_workbook"] = _measure(lambda: exporter.write_workbook(xlsx), SLOW_REPEAT)
+        out["export.write_workbook"]["bytes"] = os.path.getsize(xlsx)
+    finally:
+        os.remove(xlsx)
+
+    # دفعات إدخال بعد آخر يوم: كل تكرار على أيام جديدة
+    first = date.today() + timedelta(days=1)
+    offset = [0]
+
+    def burst_direct():
+        for row in _future_rows(first, BURST_ROWS, offset[0]):
+            db.insert_daily(row)
+        offset[0] += BURST_ROWS
+
+    def burst_ingest():
+        tickets = [ingest.submit(row) for row in _future_rows(first, BURST_ROWS, offset[0])]
+        offset[0] += BURST_ROWS
+        for t in tickets:
+            ingest.wait(t, timeout=30)
+
+    for name, fn in (("insert.direct", burst_direct), ("insert.ingest", burst_ingest)):
+        res = _measure(fn, SLOW_REPEAT)
+        res["rows"] = BURST_ROWS
+        res["rows_per_s"] = BURST_ROWS / (res["median_ms"] / 1000)
+        out[name] = res
+    ingest.stop()
+    return out, first + timedelta(days=offset[0])
+
+
+def _reader_direct():
+    import charts
+    import metrics
+    import rollups
+
+    metrics.get_daily_df()
+    rollups.summary(date.today().replace(day=1), date.today())
+    charts.series("day", start=date.today() - timedelta(days=90))
+
+
+def run_concurrent(first: date, seconds: float, writers: int, readers: int, apptest: bool) -> dict:
+    """كتّاب (ingest.submit + wait كزر الحفظ) وقرّاء متزامنون لمدة seconds."""
+    import ingest
+
+    stop = threading.Event()
+    lat = {"write": [], "read": []}
+    errors = []
+    lock = threading.Lock()
+
+    def record(kind, secs):
+        with lock:
+            lat[kind].append(secs)
+
+    def writer(i):
+        k = 0
+        try:
+            while not stop.is_set():
+                row = _future_rows(first, 1, k * writers + i)[0]
+                t0 = time.perf_counter()
+                ingest.wait(ingest.submit(row), timeout=30)
+                record("write", time.perf_counter() - t0)
+                k += 1
+        except Exception as e:
+            errors.append(f"writer: {type(e).__name__}: {e}")
+
+    def reader(_):
+        try:
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                _reader_direct()
+                record("read", time.perf_counter() - t0)
+        except Exception as e:
+            errors.append(f"reader: {type(e).__name__}: {e}")
+
+    def sessions():
+        # AppTest يُنشئ Runtime عامًا لكل تشغيل فلا يعمل من عدة خيوط معًا:
+        # الجلسات تتناوب على خيط واحد والكتّاب يعملون بالتوازي معها
+        from streamlit.testing.v1 import AppTest
+
+        apps = []
+        for _ in range(readers):
+            at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=300)
+            at.secrets["bench"] = "1"
+            at.session_state["page"] = PAGE_DASH
+            apps.append(at)
+        try:
+            while not stop.is_set():
+                for at in apps:
+                    t0 = time.perf_counter()
+                    at.run()
+                    record("read", time.perf_counter() - t0)
+                    if at.exception:
+                        errors.append(f"app: {at.exception[0].message}")
+                        return
+        except Exception as e:
+            errors.append(f"app: {type(e).__name__}: {e}")
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    if apptest:
+        threads.append(threading.Thread(target=sessions))
+    else:
+        threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    ingest.stop()
+    out = {"mode": "apptest" if apptest else "direct", "writers": writers, "readers": readers,
+           "seconds": elapsed, "errors": errors[:10]}
+    for kind, samples in lat.items():
+        if samples:
+            out[kind] = {**_stats(samples), "ops_per_s": len(samples) / elapsed}
+    return out
+
+
+# # ============== التشغيل # ==============
+
+def worker(args) -> dict:
+    """داخل العملية الفرعية: DB_DIR مضبوط مسبقًا على مجلد مؤقت فارغ."""
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, HERE)
+    import synth
+
+    seed = synth.populate(args.scale, seed=args.seed)
+    paths, first = run_paths(args.repeat)
+    result = {"branch_years": args.scale, "branches": len(seed["branches"]), "days": seed["days"],
+              "rows": seed["rows"], "seed_s": seed["seconds"], "paths": paths}
+    if args.seconds > 0:
+        result["concurrent"] = run_concurrent(first, args.seconds, args.writers, args.readers, args.apptest)
+    return result
+
+
+def _git(*cmd) -> str:
+    try:
+        return subprocess.run(["git", *cmd], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> dict:
+    result = {
+        "meta": {
+            "commit": _git("rev-parse", "--short", "HEAD"),
+            "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+            "python": sys.version.split()[0], "platform": platform.platform(), "cpus": os.cpu_count(),
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S"), "repeat": args.repeat, "seed": args.seed,
+        },
+        "scales": {},
+    }
+    for scale in args.scales:
+        env = dict(os.environ, DB_DIR=tempfile.mkdtemp(prefix="bakery_bench_"))
+        env.pop("BAKERY_CPROFILE", None)
+        env.pop("BAKERY_BRANCH", None)
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker", "--scale", str(scale),
+               "--repeat", str(args.repeat), "--seed", str(args.seed), "--seconds", str(args.seconds),
+               "--writers", str(args.writers), "--readers", str(args.readers)]
+        if args.apptest:
+            cmd.append("--apptest")
+        out = subprocess.run(cmd, env=env, cwd=ROOT, capture_output=True, text=True)
+        if out.returncode:
+            raise RuntimeError(f"فشل حجم {scale}:\n{out.stderr[-2000:]}")
+        result["scales"][f"{scale:g}"] = json.loads(out.stdout.strip().splitlines()[-1])
+    return result
+
+
+def _flat(result: dict) -> dict:
+    """{(حجم، مسار): الوسيط ms} للمقارنة (مع زمن القراءة/الكتابة المتزامنة)."""
+    flat = {}
+    for scale, res in result["scales"].items():
+        for name, m in res["paths"].items():
+            flat[(scale, name)] = m["median_ms"]
+        conc = res.get("concurrent", {})
+        for kind in ("write", "read"):
+            if kind in conc:
+                flat[(scale, f"concurrent.{conc['mode']}.{kind}")] = conc[kind]["median_ms"]
+    return flat
+
+
+def compare(base: dict, new: dict, threshold: float) -> int:
+    """يطبع النسبة new/base لكل مسار. يرجّع عدد المسارات الأبطأ من threshold."""
+    a, b = _flat(base), _flat(new)
+    print(f"{base['meta'].get('commit')} → {new['meta'].get('commit')}")
+    slower = 0
+    for key in sorted(a.keys() & b.keys()):
+        ratio = b[key] / a[key] if a[key] else float("inf")
+        worse = ratio > threshold and b[key] - a[key] > NOISE_MS
+        mark = "  ⚠" if worse else ""
+        slower += worse
+        print(f"{key[0]:>6} {key[1]:<32} {a[key]:>10.2f} → {b[key]:>10.2f} ms  ×{ratio:.2f}{mark}")
+    return slower
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="قياس الأداء على بيانات مُولّدة")
+    ap.add_argument("--scales", default="1,10,50", help="أحجام بالسنة-فرع مفصولة بفواصل")
+    ap.add_argument("--repeat", type=int, default=5, help="تكرارات كل مسار (الوسيط)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--seconds", type=float, default=5, help="مدة اختبار التزامن (0 = بدون)")
+    ap.add_argument("--writers", type=int, default=2)
+    ap.add_argument("--readers", type=int, default=4)
+    ap.add_argument("--apptest", action="store_true", help="القرّاء جلسات AppTest للوحة المتابعة")
+    ap.add_argument("--json", default=None, help="حفظ النتيجة في ملف")
+    ap.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="مقارنة ملفي نتائج")
+    ap.add_argument("--threshold", type=float, default=1.2, help="نسبة التباطؤ التي تُعدّ تراجعًا")
+    ap.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--scale", type=float, default=1, help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f1, open(args.compare[1], encoding="utf-8") as f2:
+            return 1 if compare(json.load(f1), json.load(f2), args.threshold) else 0
+    if args.worker:
+        print(json.dumps(worker(args), ensure_ascii=False))
+        return 0
+
+    args.scales = [float(s) for s in args.scales.split(",") if s.strip()]
+    result = run(args)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            fh.write(text)
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""مولّد بيانات تجريبية واقعية (daily / monthly بنفس SCHEMA_DAILY / SCHEMA_MONTHLY).
+
+    DB_DIR=/tmp/bench python benchmarks/synth.py --branch-years 10 [--branches 2] [--seed 0]
+
+الحجم بوحدة "سنة-فرع" (1 إلى 50): 10 = فرع واحد لعشر سنين، 50 = خمسة فروع × 10 سنين
+(أقصى MAX_YEARS سنة للفرع ما لم تُحدد --branches). كل فرع له حجم إنتاج وأسعار خاصة:
+موسمية أسبوعية (الجمعة أعلى) وسنوية، أسعار تتغير على درجات (u1000 ينزل وسعر الجوال
+يصعد)، فواتير كهرباء/مياه شهرية، رواتب أسبوعية، ثلج صيفًا فقط، وخانات فارغة (NULL)
+كما يتركها الإدخال الفعلي. الشهر الحالي مفتوح (بدون قيد غاز/إيجار).
+
+نفس seed ⇒ نفس البيانات بالضبط، فالقياسات قابلة للمقارنة بين النسخ.
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MAX_YEARS = 10        # أقصى سنين للفرع الواحد في التقسيم الافتراضي
+CHUNK_ROWS = 5_000    # صفوف في كل insert_daily_many
+
+
+def layout(branch_years: float, branches: int = None) -> list:
+    """[(اسم الفرع، عدد الأيام)] — الفرع الأول هو الرئيسي."""
+    if branch_years <= 0:
+        raise ValueError("branch_years يجب أن يكون موجبًا")
+    branches = branches or max(1, math.ceil(branch_years / MAX_YEARS))
+    days = max(1, round(branch_years / branches * 365.25))
+    names = ["main"] + [f"bench-{i:02d}" for i in range(2, branches + 1)]
+    return [(name, days) for name in names]
+
+
+def _steps(n: int, rng, start: int, every: int, delta: int, floor: int = 1) -> np.ndarray:
+    """قيمة تتغير على درجات كل ~every يوم (تغيّر الأسعار)."""
+    out = np.empty(n, dtype=np.int64)
+    value, i = start, 0
+    while i < n:
+        span = max(1, int(rng.normal(every, every / 4)))
+        out[i:i + span] = value
+        value = max(floor, value + delta + int(rng.integers(-abs(delta) // 2, abs(delta) // 2 + 1)))
+        i += span
+    return out
+
+
+def _sparse(values: np.ndarray, keep: np.ndarray) -> pd.array:
+    """قيم مع NULL حيث keep خطأ (خانة تُركت فارغة)."""
+    out = pd.array(np.asarray(values, dtype=np.int64), dtype="Int64")
+    out[~np.asarray(keep)] = pd.NA
+    return out
+
+
+def daily_frame(days: int, end: date = None, seed: int = 0) -> pd.DataFrame:
+    """days يومًا متتالية تنتهي في end (الافتراضي اليوم) — أعمدة SCHEMA_DAILY بدون id."""
+    rng = np.random.default_rng(seed)
+    end = end or date.today()
+    dte = pd.date_range(end=pd.Timestamp(end), periods=days, freq="D")
+    n = len(dte)
+    wd = dte.weekday.to_numpy()
+    doy = dte.dayofyear.to_numpy()
+    month = dte.month.to_numpy()
+
+    # الإنتاج: حجم الفرع × الأسبوع × الموسم × ضوضاء
+    base = rng.integers(300, 900)
+    week = np.where(wd == 4, 1.3, np.where(wd == 5, 1.1, 1.0))
+    season = 1 + 0.1 * np.sin(2 * np.pi * doy / 365.25)
+    units_baton = np.maximum(0, base * week * season * rng.normal(1, 0.08, n)).astype(np.int64)
+    units_round = np.maximum(0, base * 0.4 * week * season * rng.normal(1, 0.12, n)).astype(np.int64)
+
+    # الأسعار (وحدات لكل 1000، وسعر الجوال) تتغير على درجات
+    u1000_baton = _steps(n, rng, int(rng.integers(28, 36)), 150, -1, floor=8)
+    u1000_round = _steps(n, rng, int(rng.integers(18, 24)), 150, -1, floor=5)
+    bag_price = _steps(n, rng, int(rng.integers(8, 12)) * 1000, 150, 900, floor=1000)
+    bags = np.ceil((units_baton + units_round) / rng.integers(500, 600)).astype(np.int64)
+
+    unit = bags * bag_price // 100  # المستهلكات تتبع كمية الدقيق وسعره (التضخم)
+    bill_day = rng.integers(1, 28)
+    df = pd.DataFrame({
+        "dte": dte.strftime("%Y-%m-%d"),
+        "units_baton": units_baton,
+        "units_round": units_round,
+        "u1000_baton": u1000_baton,
+        "u1000_round": u1000_round,
+        "flour_bags": bags,
+        "flour_bag_price": bag_price,
+        "returns": _sparse(rng.integers(0, 3000, n), rng.random(n) < 0.3),
+        "discounts": _sparse(rng.integers(500, 5000, n), rng.random(n) < 0.05),
+        "flour_extra": _sparse(bag_price // 2, rng.random(n) < 0.02),
+        "yeast": unit * rng.integers(14, 17, n),
+        "salt": unit * 2,
+        "oil": unit * rng.integers(7, 10, n),
+        "electricity": _sparse(rng.integers(20, 60, n) * 1000, dte.day.to_numpy() == bill_day),
+        "water": _sparse(rng.integers(5, 20, n) * 1000, dte.day.to_numpy() == bill_day),
+        "salaries": _sparse(np.full(n, int(rng.integers(2, 5)) * 10_000), wd == 3),
+        "maintenance": _sparse(rng.integers(1, 50, n) * 1000, rng.random(n) < 0.03),
+        "petty": _sparse(rng.integers(1, 20, n) * 100, rng.random(n) < 0.6),
+        "other_exp": _sparse(rng.integers(1, 30, n) * 1000, rng.random(n) < 0.05),
+        "ice": _sparse(rng.integers(1, 6, n) * 500, (month >= 5) & (month <= 9)),
+        "breakfast": rng.integers(10, 30, n) * 100,
+        "daily_wage": _sparse(rng.integers(1, 4, n) * 1000, wd != 4),
+        "funding": _sparse(rng.integers(5, 50, n) * 10_000, rng.random(n) < 0.01),
+    })
+    return df
+
+
+def monthly_frame(daily: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    """قيد غاز/إيجار لكل شهر مغلق في daily (الشهر الحالي يبقى مفتوحًا)."""
+    rng = np.random.default_rng(seed + 1)
+    current = date.today().strftime("%Y-%m-01")
+    months = sorted({d[:7] + "-01" for d in daily["dte"]} - {current})
+    n = len(months)
+    rent = _steps(n, rng, int(rng.integers(20, 60)) * 1000, 12, 5000) if n else np.empty(0, dtype=np.int64)
+    return pd.DataFrame({
+        "month": months,
+        "gas": rng.integers(30, 90, n) * 1000,
+        "rent": rent,
+    })
+
+
+def _records(df: pd.DataFrame) -> list:
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def populate(branch_years: float, branches: int = None, seed: int = 0, end: date = None) -> dict:
+    """يملأ قواعد الفروع في DB_DIR الحالي. يرجّع {branches, days, rows, seconds}."""
+    import db
+    import rollups
+
+    t0 = time.perf_counter()
+    plan = layout(branch_years, branches)
+    rows = 0
+    for i, (name, days) in enumerate(plan):
+        daily = daily_frame(days, end, seed + i)
+        monthly = monthly_frame(daily, seed + i)
+        with db.use_branch(name):
+            db.init_db()
+            for m in monthly.itertuples(index=False):
+                db.upsert_monthly(m.month, int(m.gas), int(m.rent))
+            records = _records(daily)
+            for j in range(0, len(records), CHUNK_ROWS):
+                rows += db.insert_daily_many(records[j:j + CHUNK_ROWS], refresh_rollups=False)
+            with db.connection() as conn:
+                rollups.rebuild(conn)
+    return {"branches": [n for n, _ in plan], "days": plan[0][1], "rows": rows,
+            "seconds": time.perf_counter() - t0}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="توليد بيانات تجريبية في DB_DIR")
+    ap.add_argument("--branch-years", type=float, default=1, help="الحجم بالسنة-فرع (1 إلى 50)")
+    ap.add_argument("--branches", type=int, default=None, help="عدد الفروع (الافتراضي: ≤ 10 سنين للفرع)")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    if not os.environ.get("DB_DIR"):
+        ap.error("اضبط DB_DIR لمجلد القواعد التجريبية (حتى لا تُكتب في بيانات حقيقية)")
+    out = populate(args.branch_years, args.branches, args.seed)
+    print(f"{out['rows']:,} سجل في {len(out['branches'])} فرع ({out['seconds']:.1f} ث).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""قياس نواة توزيع الغاز/الإيجار (metrics.split_monthly_costs) على بيانات مُولّدة.
+
+    pip install -r requirements-dev.txt
+    pytest benchmarks/test_allocation.py --benchmark-group-by=param:rows
+
+كل حجم يُقاس مرتين: النواة، والطريقة القديمة (merge + groupby) كمرجع للمقارنة،
+وقبل القياس نتأكد أن النتيجتين متطابقتان رقمًا برقم.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import WORKING_DAYS_PER_MONTH, split_monthly_costs  # noqa: E402
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+
+def synthetic(rows: int, seed: int = 0):
+    """صفوف يومية مرتبة بالتاريخ (عدة سجلات لليوم) + قيد شهري لمعظم الشهور."""
+    rng = np.random.default_rng(seed)
+    days = max(min(rows // 3, 40 * 365), 1)  # حتى 40 سنة (حد datetime64[ns])
+    dte = np.sort(np.datetime64("2000-01-01") + rng.integers(0, days, rows).astype("timedelta64[D]"))
+    dte = dte.astype("datetime64[ns]")
+    month = dte.astype("datetime64[M]").astype("datetime64[ns]")
+    keys = np.unique(month)
+    keys = keys[rng.random(len(keys)) < 0.9]  # بعض الشهور بدون غاز/إيجار
+    gas = rng.integers(0, 200_000, len(keys))
+    rent = rng.integers(0, 200_000, len(keys))
+    return month, dte, keys, gas, rent
+
+
+def legacy_split(month, dte, keys, gas, rent):
+    """الطريقة السابقة في allocate_months (merge + transform("max") + .loc)."""
+    df = pd.DataFrame({"month": month, "dte": dte})
+    m = pd.DataFrame({"month": keys, "gas": gas, "rent": rent})
+    m["per_day_gas"] = (m["gas"].fillna(0).astype(int) // WORKING_DAYS_PER_MONTH).astype(int)
+    m["per_day_rent"] = (m["rent"].fillna(0).astype(int) // WORKING_DAYS_PER_MONTH).astype(int)
+    m["rem_gas"] = (m["gas"].fillna(0).astype(int) % WORKING_DAYS_PER_MONTH).astype(int)
+    m["rem_rent"] = (m["rent"].fillna(0).astype(int) % WORKING_DAYS_PER_MONTH).astype(int)
+    alloc = df.merge(
+        m[["month", "per_day_gas", "per_day_rent", "rem_gas", "rem_rent"]], on="month", how="left"
+    ).fillna({"per_day_gas": 0, "per_day_rent": 0, "rem_gas": 0, "rem_rent": 0})
+    is_last = alloc["dte"].eq(alloc.groupby("month")["dte"].transform("max"))
+    alloc.loc[is_last, "per_day_gas"] = alloc.loc[is_last, "per_day_gas"] + alloc.loc[is_last, "rem_gas"]
+    alloc.loc[is_last, "per_day_rent"] = alloc.loc[is_last, "per_day_rent"] + alloc.loc[is_last, "rem_rent"]
+    return alloc["per_day_gas"].to_numpy().astype(int), alloc["per_day_rent"].to_numpy().astype(int)
+
+
+@pytest.fixture(scope="module", params=SIZES, ids=lambda n: f"{n:_}")
+def data(request):
+    return synthetic(request.param)
+
+
+def test_kernel_matches_legacy(data):
+    got = split_monthly_costs(*data)
+    want = legacy_split(*data)
+    for g, w in zip(got, want):
+        assert g.dtype == w.dtype
+        np.testing.assert_array_equal(g, w)
+
+
+def test_kernel_unsorted_rows():
+    month, dte, keys, gas, rent = synthetic(10_000, seed=1)
+    perm = np.random.default_rng(2).permutation(len(month))
+    got = split_monthly_costs(month[perm], dte[perm], keys, gas, rent)
+    want = legacy_split(month[perm], dte[perm], keys, gas, rent)
+    for g, w in zip(got, want):
+        np.testing.assert_array_equal(g, w)
+
+
+def test_bench_kernel(benchmark, data):
+    benchmark.group = f"allocation {len(data[0]):_} rows"
+    benchmark(split_monthly_costs, *data)
+
+
+def test_bench_legacy(benchmark, data):
+    benchmark.group = f"allocation {len(data[0]):_} rows"
+    benchmark.pedantic(legacy_split, args=data, rounds=3, iterations=1)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""بيانات الرسوم البيانية: تجميع يومي/أسبوعي/شهري + تقليص النقاط (LTTB).
+
+السلسلة الكاملة تُقرأ مرة واحدة لكل إصدار بيانات من daily_rollup (O(أيام)) أو من
+الكاش المشترك بين العمليات (shared_cache)،
+والتجميعات الأسبوعية/الشهرية تُحفظ لكل دقة. التكبير (مدى start/end) يقص من
+النسخة المحفوظة بدون أي استعلام، ثم يُقلَّص الناتج إلى MAX_POINTS نقطة على
+الأكثر حتى يبقى JSON الرسم خفيفًا على الموبايل.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+import db
+import profiling
+import rollups
+import shared_cache
+
+MAX_POINTS = 400  # ميزانية النقاط في الرسم الواحد
+GRANULARITIES = ("day", "week", "month")
+
+_lock = threading.Lock()
+_cache = {}  # (قاعدة الفرع، granularity, metric) → DataFrame(dte, value)
+_cache_version = None
+
+
+def _bucket(dte: pd.Series, granularity: str) -> pd.Series:
+    if granularity == "week":
+        # أسبوع العمل يبدأ السبت (الجمعة عطلة) → فترات تنتهي الجمعة
+        return dte.dt.to_period("W-FRI").dt.start_time
+    if granularity == "month":
+        return dte.dt.to_period("M").dt.start_time
+    return dte
+
+
+def _day_series(metric: str) -> pd.DataFrame:
+    raw = rollups.daily_series(metrics=(metric,))
+    return pd.DataFrame({"dte": raw["dte"], "value": raw[metric].to_numpy(dtype=np.int64)})
+
+
+@profiling.timed
+def aggregate(granularity: str = "day", metric: str = "profit") -> pd.DataFrame:
+    """السلسلة الكاملة (dte, value) بالدقة المطلوبة، محفوظة حتى تتغير البيانات."""
+    global _cache_version
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"دقة غير معروفة: {granularity}")
+    with _lock:
+        version = db.data_version()
+        if _cache_version != version:
+            _cache.clear()
+            _cache_version = version
+        path = db.current_path()
+        key = (path, granularity, metric)
+        if key not in _cache:
+            daily = _cache.get((path, "day", metric))
+            if daily is None:
+                daily = shared_cache.frame(f"series.{metric}", lambda: _day_series(metric), path=path)
+                _cache[(path, "day", metric)] = daily
+            if granularity != "day":
+                _cache[key] = (
+                    daily.groupby(_bucket(daily["dte"], granularity), sort=True)["value"].sum()
+                    .rename_axis("dte").reset_index()
+                )
+        return _cache[key]
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int):
+    """Largest-Triangle-Three-Buckets: يرجّع فهارس النقاط المحفوظة (أول وآخر نقطة دائمًا)."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)  # حدود threshold-2 دلو
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # متوسط الدلو التالي (أو آخر نقطة)
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < len(edges) else n)
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        # أكبر مثلث بين النقطة المختارة سابقًا، نقاط الدلو الحالي، ومتوسط التالي
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+@profiling.timed
+def series(granularity="day", metric="profit", start=None, end=None, cumulative=False, max_points=MAX_POINTS):
+    """نقاط الرسم بين start و end (شاملين). يرجّع (DataFrame(dte, value)، عدد النقاط قبل التقليص)."""
+    df = aggregate(granularity, metric)
+    if start is not None or end is not None:
+        d = df["dte"].to_numpy()
+        lo = 0 if start is None else np.searchsorted(d, np.datetime64(pd.Timestamp(start)), "left")
+        hi = len(d) if end is None else np.searchsorted(d, np.datetime64(pd.Timestamp(end)), "right")
+        df = df.iloc[lo:hi]
+    values = df["value"].to_numpy()
+    if cumulative:
+        values = values.cumsum()
+    total = len(df)
+    keep = lttb(df["dte"].to_numpy().astype("datetime64[s]").astype(np.int64), values, max_points)
+    return pd.DataFrame({"dte": df["dte"].to_numpy()[keep], "value": values[keep]}), total
@@ -0,0 +1,922 @@
+# -*- coding: utf-8 -*-
+"""طبقة التخزين: مسار القاعدة، المخطط، وعمليات القراءة/الكتابة على SQLite."""
+import glob
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+import profiling
+
+# مسار قاعدة البيانات — نحاول مسارات متعددة لضمان العمل على السحابة/المحلي
+
+
+def _resolve_db_path():
+    candidates = []
+    # 1) متغير بيئة اختياري
+    env_dir = os.environ.get("DB_DIR")
+    if env_dir:
+        candidates.append(env_dir)
+    # 2) مجلد محلي (قد يكون للقراءة فقط على بعض المنصات)
+    candidates.append(os.path.join(os.getcwd(), "data"))
+    # 3) مجلد /data لو متاح
+    candidates.append("/data")
+    # 4) مجلد مؤقت (دوام مؤقت فقط)
+    candidates.append("/tmp/bakery_data")
+
+    for d in candidates:
+        try:
+            os.makedirs(d, exist_ok=True)
+            testfile = os.path.join(d, ".__wtest__")
+            with open(testfile, "w") as f:
+                f.write("ok")
+            os.remove(testfile)
+            return os.path.join(d, "bakery_tracker.db"), (d not in ["/tmp/bakery_data"])  # True = دائم غالبًا
+        except Exception:
+            continue
+    # fallback أخير: ذاكرة فقط
+    return ":memory:", False
+
+
+DB_FILE, DB_PERSISTENT = _resolve_db_path()  # محاولة حفظ دائم
+
+# # ============== الفروع # ==============
+# كل فرع (مخبز) في ملف SQLite مستقل بجانب الملف الرئيسي: bakery_tracker.<الفرع>.db.
+# الفرع الحالي لكل خيط (جلسة Streamlit / عامل مهام) → connection() بدون مسار
+# يفتح قاعدة الفرع الحالي، فبقية الموديولات لا تحتاج تمرير الفرع.
+MAIN_BRANCH = "main"
+_BRANCH_RE = re.compile(r"[\w\-]{1,40}")
+_local = threading.local()
+
+
+def branch_path(name: str = None) -> str:
+    name = name or MAIN_BRANCH
+    if name == MAIN_BRANCH:
+        return DB_FILE
+    if not _BRANCH_RE.fullmatch(name):
+        raise ValueError(f"اسم فرع غير صالح: {name!r} (حروف/أرقام/- فقط)")
+    if DB_FILE == ":memory:":
+        raise RuntimeError("الفروع تحتاج قاعدة على ملف (اضبط DB_DIR).")
+    base, ext = os.path.splitext(DB_FILE)
+    return f"{base}.{name}{ext}"
+
+
+def branches() -> list:
+    """الفرع الرئيسي + كل ملفات الفروع الموجودة في مجلد القاعدة."""
+    names = [MAIN_BRANCH]
+    if DB_FILE != ":memory:":
+        base, ext = os.path.splitext(DB_FILE)
+        for p in sorted(glob.glob(f"{glob.escape(base)}.*{ext}")):
+            name = p[len(base) + 1:len(p) - len(ext)]
+            if _BRANCH_RE.fullmatch(name) and name != MAIN_BRANCH:
+                names.append(name)
+    return names
+
+
+def current_branch() -> str:
+    return getattr(_local, "branch", None) or os.environ.get("BAKERY_BRANCH") or MAIN_BRANCH
+
+
+def current_path() -> str:
+    return branch_path(current_branch())
+
+
+def set_branch(name: str = None):
+    """يثبّت فرع الخيط الحالي (بداية كل تشغيل للسكربت)."""
+    branch_path(name)  # تحقق من الاسم
+    _local.branch = name or None
+
+
+@contextmanager
+def use_branch(name: str = None):
+    """فرع مؤقت للخيط الحالي (عمّال المهام، التجميع المتوازي للفروع)."""
+    prev = getattr(_local, "branch", None)
+    set_branch(name)
+    try:
+        yield branch_path(name)
+    finally:
+        _local.branch = prev
+
+# # ============== قاعدة البيانات # ==============
+SCHEMA_DAILY = {
+    "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
+    "dte": "TEXT",
+    # الإنتاج حسب النوع
+    "units_baton": "INTEGER",   # بسطونة (صامولي)
+    "units_round": "INTEGER",   # مدور (بيرغر)
+    # التسعير: كم وحدة لكل 1000 جنيه
+    "u1000_baton": "INTEGER",
+    "u1000_round": "INTEGER",
+    # استهلاك الدقيق وسعر الجوال
+    "flour_bags": "INTEGER",
+    "flour_bag_price": "INTEGER",  # سعر الجوال (بدون كسور)
+    # مصاريف يومية (بدون غاز/إيجار الآن)
+    "returns": "INTEGER",
+    "discounts": "INTEGER",
+    "flour_extra": "INTEGER",
+    "yeast": "INTEGER",
+    "salt": "INTEGER",
+    "oil": "INTEGER",
+    "electricity": "INTEGER",
+    "water": "INTEGER",
+    "salaries": "INTEGER",
+    "maintenance": "INTEGER",
+    "petty": "INTEGER",
+    "other_exp": "INTEGER",
+    # إضافات جديدة
+    "ice": "INTEGER",         # ثلج
+    "breakfast": "INTEGER",   # فطور
+    "daily_wage": "INTEGER",  # يومية
+    # تمويل
+    "funding": "INTEGER"
+}
+
+SCHEMA_MONTHLY = {
+    # مفتاح الشهر بشكل YYYY-MM (مثلاً 2025-09)
+    "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
+    "month": "TEXT",         # أول يوم في الشهر للتوحيد (YYYY-MM-01)
+    "gas": "INTEGER",        # غاز شهري
+    "rent": "INTEGER"        # إيجار شهري
+}
+
+# عناوين الأعمدة بالعربي (ملف Excel المُصدَّر يستخدمها، والاستيراد يعكسها)
+DAILY_LABELS = {
+    "dte":"التاريخ",
+    "units_baton":"إنتاج البسطونة (عدد)",
+    "units_round":"إنتاج المدور (عدد)",
+    "u1000_baton":"وحدات/ألف — بسطونة",
+    "u1000_round":"وحدات/ألف — مدور",
+    "flour_bags":"جوالات الدقيق المستهلكة",
+    "flour_bag_price":"سعر جوال الدقيق",
+    "returns":"مرتجع/هالك",
+    "discounts":"خصومات/عروض",
+    "flour_extra":"مصاريف دقيق إضافية",
+    "yeast":"خميرة","salt":"ملح","oil":"زيت/سمن","electricity":"كهرباء","water":"مياه",
+    "salaries":"رواتب","maintenance":"صيانة","petty":"نثريات","other_exp":"مصاريف أخرى",
+    "ice":"ثلج","breakfast":"فطور","daily_wage":"يومية",
+    "funding":"تمويل (تحويلات)",
+}
+
+# أنواع pandas المضغوطة لليومية: كل INTEGER → Int32 (يقبل الفراغ بدون float64)،
+# و dte يُقرأ datetime64 عبر parse_dates. لا أعمدة object.
+DAILY_DTYPES = {c: "Int32" for c, decl in SCHEMA_DAILY.items() if decl.startswith("INTEGER")}
+READ_CHUNK_ROWS = 20_000
+
+# # ============== إصدار البيانات # ==============
+# كل كتابة ترفع رقم الإصدار وتسجّل ما لمسته (جدول + id/شهر) حتى تعيد
+# الطبقات المشتقة حساب الصفوف المتأثرة فقط بدل إعادة الحساب الكامل.
+_CHANGE_LOG_SIZE = 1024
+_version_lock = threading.Lock()
+_data_version = 0
+_changes = deque(maxlen=_CHANGE_LOG_SIZE)  # عناصر بالشكل (version, path, table, key)
+RESET = "*"  # جدول وهمي: تغيير واسع (استيراد جماعي) → إعادة بناء كاملة
+
+
+def data_version() -> int:
+    return _data_version
+
+
+def _bump_version(table: str, key, path: str = None):
+    global _data_version
+    with _version_lock:
+        _data_version += 1
+        _changes.append((_data_version, path or current_path(), table, key))
+        return _data_version
+
+
+def changes_since(version: int, path: str = None):
+    """تغييرات قاعدة path (الافتراضي: الفرع الحالي) بعد version كقائمة (table, key)،
+    أو None لو السجل لم يعد يغطيها."""
+    path = path or current_path()
+    with _version_lock:
+        if version == _data_version:
+            return []
+        if version > _data_version or not _changes or _changes[0][0] > version + 1:
+            return None
+        out = [(t, k) for v, p, t, k in _changes if v > version and p == path]
+        return None if any(t == RESET for t, _ in out) else out
+
+
+# # ============== عدّاد الكتابات المشترك # ==============
+# data_version أعلاه خاص بالعملية. عدة عمليات (خوادم Streamlit خلف موازن حمل) على
+# نفس الملفات تعرف كتابات بعضها من write_counter: صف واحد يُزاد داخل معاملة كل كتابة
+# على daily/monthly. sync_writes يقارنه بآخر قيمة رأتها العملية، ولو كتبت عملية
+# أخرى يسجّل RESET فتعيد الطبقات المشتقة البناء (من الكاش المشترك غالبًا).
+_seen = {}  # مسار → قيمة العدّاد التي تطابقها كاشات هذه العملية
+
+
+def _mark_write(conn) -> int:
+    """يزيد العدّاد داخل معاملة الكتابة ويرجّع قيمته الجديدة."""
+    return conn.execute("UPDATE write_counter SET n = n + 1 WHERE id = 1 RETURNING n").fetchone()[0]
+
+
+def _wrote(n: int, path: str = None):
+    """بعد commit: لو لم يكتب أحد غيرنا منذ آخر فحص نتقدم بدون إعادة بناء."""
+    path = path or current_path()
+    with _version_lock:
+        if _seen.get(path) == n - 1:
+            _seen[path] = n
+
+
+def write_counter(path: str = None) -> int:
+    with connection(path) as conn:
+        return conn.execute("SELECT n FROM write_counter WHERE id = 1").fetchone()[0]
+
+
+def sync_writes(path: str = None) -> int:
+    """يقرأ العدّاد؛ لو غيّرته عملية أخرى تُعلَّم كاشات الفرع كقديمة. يرجّع العدّاد."""
+    path = path or current_path()
+    n = write_counter(path)
+    with _version_lock:
+        seen = _seen.get(path)
+        _seen[path] = n
+    if seen is not None and seen != n:
+        _bump_version(RESET, None, path)
+    return n
+
+
+# # ============== الاتصالات # ==============
+# اتصالات مشتركة بدل connect/close في كل دالة. للملف: عدة اتصالات بوضع WAL
+# (قرّاء متزامنون + كاتب واحد). لـ :memory: اتصال واحد فقط وإلا تضيع البيانات.
+# connection() متداخل في نفس الخيط يرجع نفس الاتصال (نفس المعاملة) بدل حجز ثانٍ.
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "4"))
+POOL_TIMEOUT_S = float(os.environ.get("DB_POOL_TIMEOUT", "30"))  # انتظار اتصال حر قبل الخطأ
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KB = 16000
+ATTACH_LIMIT = 10  # حد SQLite الافتراضي للقواعد المُلحقة (SQLITE_MAX_ATTACHED)
+
+
+class ConnectionPool:
+    def __init__(self, path: str, size: int = POOL_SIZE):
+        self.path = path
+        self.memory = path == ":memory:"
+        self.size = 1 if self.memory else max(1, size)
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._held = threading.local()  # الاتصال الذي يحجزه هذا الخيط الآن
+        self._created = 0
+        self.stats = {"hits": 0, "opens": 0, "waits": 0, "errors": 0,
+                      "wait_s": 0.0, "busy_s": 0.0, "max_busy_s": 0.0}
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False,
+                               factory=profiling.TimedConnection)  # زمن وصفوف كل استعلام
+        cur = conn.cursor()
+        if not self.memory:
+            cur.execute("PRAGMA journal_mode=WAL")
+            cur.execute("PRAGMA synchronous=NORMAL")  # آمن مع WAL وأسرع من FULL
+        cur.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        cur.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.close()
+        return conn
+
+    def _acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self.stats["hits"] += 1
+            return conn
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._created < self.size
+            if can_open:
+                self._created += 1
+        if can_open:
+            try:
+                conn = self._open()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+            with self._lock:
+                self.stats["opens"] += 1
+            return conn
+        t0 = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=POOL_TIMEOUT_S)
+        except queue.Empty:
+            with self._lock:
+                self.stats["errors"] += 1
+            raise TimeoutError(
+                f"لا اتصال حر بـ {self.path} خلال {POOL_TIMEOUT_S:g} ث "
+                f"(كل الـ {self.size} مشغولة؛ DB_POOL_SIZE / DB_POOL_TIMEOUT)"
+            ) from None
+        with self._lock:
+            self.stats["waits"] += 1
+            self.stats["wait_s"] += time.perf_counter() - t0
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """اتصال من المجمّع؛ commit عند النجاح و rollback عند الخطأ.
+
+        داخل connection() آخر في نفس الخيط: نفس الاتصال، والـ commit/rollback للخارجي.
+        """
+        held = getattr(self._held, "conn", None)
+        if held is not None:
+            yield held
+            return
+        conn = self._acquire()
+        self._held.conn = conn
+        t0 = time.perf_counter()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            with self._lock:
+                self.stats["errors"] += 1
+            raise
+        finally:
+            busy = time.perf_counter() - t0
+            with self._lock:
+                self.stats["busy_s"] += busy
+                self.stats["max_busy_s"] = max(self.stats["max_busy_s"], busy)
+            self._held.conn = None
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._created = 0
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path: str = None) -> ConnectionPool:
+    path = path or current_path()
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path)
+        return pool
+
+
+def connection(path: str = None):
+    return get_pool(path).connection()
+
+
+def pool_stats() -> dict:
+    """عدّادات كل المجمّعات (للتشخيص)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    out = {}
+    for p in pools:
+        st_ = dict(p.stats)
+        calls = st_["hits"] + st_["opens"] + st_["waits"]
+        st_["calls"] = calls
+        st_["hit_rate"] = (st_["hits"] / calls) if calls else 0.0
+        st_["avg_busy_ms"] = (st_["busy_s"] / calls * 1000) if calls else 0.0
+        out[p.path] = st_
+    return out
+
+
+def _ensure_table(conn, name: str, schema: dict):
+    cur = conn.cursor()
+    cols_sql = ",".join([f"{k} {v}" for k, v in schema.items()])
+    cur.execute(f"CREATE TABLE IF NOT EXISTS {name} ({cols_sql})")
+    cur.execute(f"PRAGMA table_info({name})")
+    existing = {row[1] for row in cur.fetchall()}
+    for col, decl in schema.items():
+        if col not in existing:
+            cur.execute(f"ALTER TABLE {name} ADD COLUMN {col} {decl.split()[0]}")
+
+
+# # ============== الترحيلات (Migrations) # ==============
+# رقم إصدار المخطط محفوظ في PRAGMA user_version. أي تعديل على SCHEMA_DAILY أو
+# SCHEMA_MONTHLY أو الفهارس يحتاج خطوة جديدة في آخر MIGRATIONS (لا نعدّل القديمة).
+
+
+def _m001_tables(conn):
+    _ensure_table(conn, "daily", SCHEMA_DAILY)
+    _ensure_table(conn, "monthly", SCHEMA_MONTHLY)
+
+
+def _move_duplicates(conn, table, schema, key) -> list:
+    """ينقل كل السجلات إلا الأحدث (MAX(id)) لكل قيمة key من table إلى <table>_duplicates
+    (بكامل قيمها + kept_id) ويحذفها. يرجّع قيم key التي كانت مكررة."""
+    cols = ", ".join(schema)
+    decls = ", ".join(f"{c} {'INTEGER' if c == 'id' else schema[c]}" for c in schema)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {table}_duplicates ({decls}, kept_id INTEGER, removed_at REAL)")
+    dups = [r[0] for r in conn.execute(f"SELECT {key} FROM {table} GROUP BY {key} HAVING COUNT(*) > 1")]
+    if dups:
+        conn.execute(
+            f"INSERT INTO {table}_duplicates ({cols}, kept_id, removed_at) "
+            f"SELECT {', '.join('d.' + c for c in schema)}, k.id, ? FROM {table} d "
+            f"JOIN (SELECT {key}, MAX(id) AS id FROM {table} GROUP BY {key} HAVING COUNT(*) > 1) k "
+            f"ON d.{key} = k.{key} AND d.id <> k.id",
+            (time.time(),),
+        )
+        conn.execute(f"DELETE FROM {table} WHERE id NOT IN (SELECT MAX(id) FROM {table} GROUP BY {key})")
+    return dups
+
+
+def _m002_indexes(conn):
+    # تكرارات الشهر (لو وُجدت من نسخ قديمة) → نبقي أحدث قيد قبل الفهرس الفريد، والأقدم
+    # يُنقل إلى monthly_duplicates (duplicate_rows(table="monthly")) بدل حذفه بصمت
+    _move_duplicates(conn, "monthly", SCHEMA_MONTHLY, "month")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_monthly_month ON monthly(month)")
+    # ORDER BY dte, id + فلاتر المدى الزمني (اليوم، الشهر الحالي، آخر 30 يوم)
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_daily_dte ON daily(dte, id)")
+
+
+def _m003_rollups(conn):
+    import rollups  # rollups يعتمد على db؛ الاستيراد هنا يتجنب الدوران
+
+    rollups.create_tables(conn)
+    rollups.rebuild(conn)
+
+
+def _m004_sync_state(conn):
+    import sheets_sync
+
+    sheets_sync.create_tables(conn)
+
+
+def _m005_jobs(conn):
+    import jobs
+
+    jobs.create_tables(conn)
+
+
+def _m006_ingest_log(conn):
+    import ingest
+
+    ingest.create_tables(conn)
+
+
+def _m007_daily_unique_dte(conn):
+    # يوم واحد = سجل واحد: نوحّد صيغة التاريخ، نبقي أحدث سجل لكل يوم كما هو، وننقل
+    # الأقدم (بكامل قيمه) إلى daily_duplicates بدل حذفها بصمت، ثم فهرس فريد يعتمد
+    # عليه ON CONFLICT(dte). duplicate_rows() تعرضها للمراجعة/الإدخال اليدوي.
+    conn.execute("UPDATE daily SET dte = date(dte) WHERE date(dte) IS NOT NULL AND dte <> date(dte)")
+    dups = _move_duplicates(conn, "daily", SCHEMA_DAILY, "dte")
+    if dups:
+        _refresh_rollups(conn, dups)
+    conn.execute("DROP INDEX IF EXISTS ix_daily_dte")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_daily_dte ON daily(dte)")
+
+
+def duplicate_rows(path: str = None, table: str = "daily") -> pd.DataFrame:
+    """السجلات المكررة التي أزالها ترحيل المفتاح الفريد (kept_id = السجل الذي بقي لليوم/الشهر).
+
+    table = "daily" (ترحيل 7، حسب dte) أو "monthly" (ترحيل 2، حسب month).
+    """
+    schema, key = {"daily": (SCHEMA_DAILY, "dte"), "monthly": (SCHEMA_MONTHLY, "month")}[table]
+    with connection(path) as conn:
+        if not conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (f"{table}_duplicates",)
+        ).fetchone():
+            return pd.DataFrame(columns=[*schema, "kept_id", "removed_at"])
+        return pd.read_sql_query(f"SELECT * FROM {table}_duplicates ORDER BY {key}, id", conn)
+
+
+def _m008_archive(conn):
+    import archive
+
+    archive.create_tables(conn)
+
+
+def _m009_write_counter(conn):
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS write_counter (id INTEGER PRIMARY KEY CHECK (id = 1), n INTEGER NOT NULL)"
+    )
+    conn.execute("INSERT OR IGNORE INTO write_counter (id, n) VALUES (1, 0)")
+
+
+MIGRATIONS = [
+    (1, "إنشاء الجداول من SCHEMA_DAILY/SCHEMA_MONTHLY", _m001_tables),
+    (2, "فهارس التاريخ والشهر", _m002_indexes),
+    (3, "جداول الملخصات اليومية/الشهرية", _m003_rollups),
+    (4, "حالة مزامنة Google Sheets", _m004_sync_state),
+    (5, "طابور المهام الخلفية", _m005_jobs),
+    (6, "سجل طابور الإدخال", _m006_ingest_log),
+    (7, "تاريخ فريد لليومية (المكرر يُنقل إلى daily_duplicates)", _m007_daily_unique_dte),
+    (8, "فهرس أرشيف الشهور المغلقة (Parquet)", _m008_archive),
+    (9, "عدّاد الكتابات المشترك بين العمليات", _m009_write_counter),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+_init_result = {}       # مسار → نتيجة init_db (تحقق مرة واحدة لكل عملية)
+_migration_log = []     # (path, version, name, seconds)
+
+
+def schema_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(path: str = None) -> list:
+    """يطبّق الخطوات الناقصة ويرجّع [(version, name, seconds)] لما تم تطبيقه."""
+    path = path or current_path()
+    applied = []
+    with connection(path) as conn:
+        if schema_version(conn) >= SCHEMA_VERSION:
+            return applied
+        # BEGIN IMMEDIATE يمنع عمليتين من الترحيل في نفس الوقت
+        conn.execute("BEGIN IMMEDIATE")
+        current = schema_version(conn)
+        for version, name, step in MIGRATIONS:
+            if version <= current:
+                continue
+            t0 = time.perf_counter()
+            step(conn)
+            conn.execute(f"PRAGMA user_version={version}")
+            applied.append((version, name, time.perf_counter() - t0))
+    for version, name, secs in applied:
+        _migration_log.append((path, version, name, secs))
+    return applied
+
+
+def migration_log() -> list:
+    return list(_migration_log)
+
+
+@profiling.timed
+def init_db(path: str = None) -> bool:
+    """يجهّز المخطط (للفرع الحالي افتراضيًا). يرجّع False لو فشل المسار الرئيسي
+    واشتغلنا على ذاكرة مؤقتة."""
+    global DB_FILE, DB_PERSISTENT
+    path = path or current_path()
+    if path in _init_result:
+        return _init_result[path]
+    try:
+        migrate(path)
+        sync_writes(path)
+        _init_result[path] = True
+    except Exception:
+        if path != DB_FILE:
+            raise  # فرع إضافي: لا نخفي الخطأ بقاعدة مؤقتة
+        # فشل فتح القاعدة في المسار الحالي → نستخدم in-memory ونكمّل التشغيل
+        DB_FILE = ":memory:"
+        DB_PERSISTENT = False
+        migrate(DB_FILE)
+        sync_writes(DB_FILE)
+        # المسار الفاشل أيضًا: init_db(المسار القديم) لاحقًا لا يعيد محاولة الفتح كل مرة
+        _init_result[path] = _init_result[DB_FILE] = False
+    return _init_result[path]
+
+
+def create_branch(name: str) -> str:
+    """ينشئ ملف فرع جديد بالمخطط الحالي ويرجّع مساره."""
+    path = branch_path(name)
+    init_db(path)
+    return path
+
+
+@contextmanager
+def attached(names):
+    """اتصال واحد مع كل قواعد الفروع المعطاة مُلحقة (ATTACH) بالأسماء b0, b1, ...
+
+    للاستعلامات العابرة للفروع في SQL واحد (UNION ALL). الحد الأقصى ATTACH_LIMIT.
+    """
+    names = list(names)
+    if len(names) > ATTACH_LIMIT:
+        raise ValueError(f"أقصى عدد فروع في استعلام واحد: {ATTACH_LIMIT}")
+    aliases = [f"b{i}" for i in range(len(names))]
+    for name in names:
+        init_db(branch_path(name))
+    # اتصال مؤقت خارج المجمّعات حتى لا تبقى قواعد مُلحقة على اتصال مشترك
+    conn = sqlite3.connect(":memory:", timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False,
+                           factory=profiling.TimedConnection)
+    try:
+        for alias, name in zip(aliases, names):
+            conn.execute(f"ATTACH DATABASE ? AS {alias}", (branch_path(name),))
+        yield conn, aliases
+    finally:
+        conn.close()
+
+
+def _refresh_rollups(conn, dtes):
+    """تحديث ملخصات شهور التواريخ المعطاة داخل نفس المعاملة."""
+    import rollups
+
+    rollups.refresh_months(conn, {rollups.month_key(d) for d in dtes if d})
+
+
+def _thaw(conn, dtes):
+    """الشهور المؤرشفة التي تلمسها كتابة تعود إلى SQLite أولًا (داخل نفس المعاملة)."""
+    import archive
+
+    archive.thaw(conn, dtes)
+
+
+def _thaw_ids(conn, ids):
+    """السجلات المؤرشفة بهذه الـ ids تعود إلى SQLite قبل حذفها/تعديلها."""
+    import archive
+
+    archive.thaw_ids(conn, ids)
+
+
+def _upsert_sql(cols, merge: bool = False) -> str:
+    """INSERT بمفتاح التاريخ: اليوم الموجود تُستبدل قيم أعمدته المعطاة (id يبقى كما هو).
+
+    merge=True: القيمة الفارغة (NULL) في الجديد لا تمسح القيمة المحفوظة.
+    """
+    new = "COALESCE(excluded.{c}, daily.{c})" if merge else "excluded.{c}"
+    sets = ", ".join(f"{c}={new.format(c=c)}" for c in cols if c != "dte")
+    return (f"INSERT INTO daily ({','.join(cols)}) VALUES ({','.join(['?'] * len(cols))}) "
+            f"ON CONFLICT(dte) DO UPDATE SET {sets}")
+
+
+@profiling.timed
+def insert_daily(row: dict):
+    """حفظ سجل يوم (إدخال أو تحديث نفس التاريخ). يرجّع id السجل."""
+    cols = list(row)
+    with connection() as conn:
+        _thaw(conn, [row.get("dte")])
+        conn.execute(_upsert_sql(cols), list(row.values()))
+        row_id = conn.execute("SELECT id FROM daily WHERE dte=?", (row.get("dte"),)).fetchone()[0]
+        _refresh_rollups(conn, [row.get("dte")])
+        n = _mark_write(conn)
+    _wrote(n)
+    _bump_version("daily", row_id)
+    return row_id
+
+
+def refresh_rollups(dtes):
+    """تحديث ملخصات شهور التواريخ المعطاة في معاملة مستقلة (بعد إدخال بدون تحديث)."""
+    with connection() as conn:
+        _refresh_rollups(conn, dtes)
+        n = _mark_write(conn)  # قارئ الملخصات (api) يرى نسخة جديدة
+    _wrote(n)
+    _bump_version("rollups", None)
+
+
+@profiling.timed
+def insert_daily_many(rows: list, refresh_rollups: bool = True) -> int:
+    """حفظ دفعة صفوف (قواميس بنفس مفاتيح insert_daily) في معاملة واحدة.
+
+    تاريخ موجود يُدمج فيه الجديد بدل صف ثانٍ (إعادة استيراد نفس الملف لا تكرر الأيام،
+    وعمود غائب من الملف لا يمسح القيمة المحفوظة).
+    refresh_rollups=False للاستيراد على دفعات: المستدعي يستدعي refresh_rollups مرة في النهاية.
+    """
+    if not rows:
+        return 0
+    cols = [c for c in SCHEMA_DAILY if c != "id"]
+    with connection() as conn:
+        _thaw(conn, {r.get("dte") for r in rows})
+        conn.executemany(_upsert_sql(cols, merge=True), [[r.get(c) for c in cols] for r in rows])
+        if refresh_rollups:
+            _refresh_rollups(conn, {r.get("dte") for r in rows})
+        n = _mark_write(conn)
+    _wrote(n)
+    _bump_version(RESET, None)
+    return len(rows)
+
+
+@profiling.timed
+def insert_daily_queued(entries: list) -> list:
+    """يطبّق دفعة من طابور الإدخال [(ticket, row, queued_at, replace)] في معاملة واحدة.
+
+    التذكرة المطبّقة سابقًا (إعادة تشغيل بعد commit وقبل حذف الملف) تُتخطى.
+    تاريخ موجود (أو مكرر داخل الدفعة): مع replace يُحدَّث (updated)، وبدونه لا يُلمس
+    ويُسجّل duplicate مع id الصف الموجود. يرجّع [(ticket, status, row_id, dte)] لما طُبّق الآن.
+    """
+    if not entries:
+        return []
+    cols = [c for c in SCHEMA_DAILY if c != "id"]
+    upsert = _upsert_sql(cols)
+    tickets = [e[0] for e in entries]
+    dtes = sorted({e[1].get("dte") for e in entries})
+    out = []
+    with connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _thaw(conn, dtes)
+        done = {t for (t,) in conn.execute(
+            f"SELECT ticket FROM ingest_log WHERE ticket IN ({','.join('?' * len(tickets))})", tickets)}
+        seen = dict(conn.execute(
+            f"SELECT dte, id FROM daily WHERE dte IN ({','.join('?' * len(dtes))})", dtes))
+        now = time.time()
+        for ticket, row, queued_at, replace in entries:
+            if ticket in done:
+                continue
+            done.add(ticket)
+            dte = row.get("dte")
+            if dte in seen and not replace:
+                status, row_id = "duplicate", seen[dte]
+            else:
+                status = "updated" if dte in seen else "inserted"
+                conn.execute(upsert, [row.get(c) for c in cols])
+                row_id = seen[dte] = conn.execute("SELECT id FROM daily WHERE dte=?", (dte,)).fetchone()[0]
+            conn.execute(
+                "INSERT INTO ingest_log (ticket, status, row_id, dte, queued_at, applied_at) VALUES (?,?,?,?,?,?)",
+                (ticket, status, row_id, dte, queued_at, now),
+            )
+            out.append((ticket, status, row_id, dte))
+        written = [(row_id, dte) for _, status, row_id, dte in out if status != "duplicate"]
+        _refresh_rollups(conn, {dte for _, dte in written})
+        n = _mark_write(conn) if written else None
+    if n is not None:
+        _wrote(n)
+    for row_id in dict(written):
+        _bump_version("daily", row_id)
+    return out
+
+
+@profiling.timed
+def upsert_monthly(month_key: str, gas: int, rent: int):
+    """month_key بصيغة YYYY-MM-01."""
+    with connection() as conn:
+        _thaw(conn, [month_key])
+        conn.execute(
+            "INSERT INTO monthly (month, gas, rent) VALUES (?,?,?) "
+            "ON CONFLICT(month) DO UPDATE SET gas=excluded.gas, rent=excluded.rent",
+            (month_key, int(gas), int(rent)),
+        )
+        _refresh_rollups(conn, [month_key])
+        n = _mark_write(conn)
+    _wrote(n)
+    _bump_version("monthly", month_key)
+
+
+_INT32_MIN, _INT32_MAX = -2**31, 2**31 - 1
+
+
+def _fit_int32(df: pd.DataFrame) -> pd.DataFrame:
+    """Int64 → Int32 لكل عمود تسع قيمه int32 (الباقي يبقى Int64)."""
+    for c in DAILY_DTYPES:
+        values = df[c].dropna()
+        if values.empty or (values.min() >= _INT32_MIN and values.max() <= _INT32_MAX):
+            df[c] = df[c].astype("Int32")
+    return df
+
+
+def _read_typed(sql: str, params, conn=None) -> pd.DataFrame:
+    """SELECT لأعمدة SCHEMA_DAILY → إطار بأنواع DAILY_DTYPES (على conn لو أُعطي)."""
+    if conn is None:
+        with connection() as conn:
+            return _read_typed(sql, params, conn)
+    # على دفعات: صفوف بايثون (tuples) لدفعة واحدة فقط في الذاكرة بدل الجدول كله
+    try:
+        chunks = list(pd.read_sql_query(
+            sql, conn, params=params, parse_dates=["dte"], dtype=DAILY_DTYPES, chunksize=READ_CHUNK_ROWS,
+        ))
+    except (TypeError, OverflowError):
+        # قيمة خارج مدى int32 (لا حد عليها في الكتابة) → Int64 للأعمدة التي تحتاجه فقط
+        chunks = [_fit_int32(c) for c in pd.read_sql_query(
+            sql, conn, params=params, parse_dates=["dte"], dtype=dict.fromkeys(DAILY_DTYPES, "Int64"),
+            chunksize=READ_CHUNK_ROWS,
+        )]
+    if not chunks or (len(chunks) == 1 and chunks[0].empty):
+        # parse_dates لا يعمل على نتيجة فارغة → نبني الأنواع يدويًا
+        return pd.DataFrame({c: pd.Series(dtype=DAILY_DTYPES.get(c, "datetime64[ns]")) for c in SCHEMA_DAILY})
+    return chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+
+
+@profiling.timed
+def read_daily(ids=None, start: str = None, end: str = None, conn=None) -> pd.DataFrame:
+    """صفوف اليومية الخام في SQLite (كلها، أو ids محددة، أو مدى start <= dte < end) مرتبة
+    بالتاريخ ثم id. الشهور المؤرشفة ليست هنا — archive.read_enriched يقرأ الطبقتين."""
+    where, params = [], []
+    if ids is not None:
+        ids = [int(i) for i in ids]
+        where.append(f"id IN ({','.join(['?'] * len(ids))})")
+        params += ids
+    if start is not None:
+        where.append("dte >= ?")
+        params.append(start)
+    if end is not None:
+        where.append("dte < ?")
+        params.append(end)
+    sql = (
+        f"SELECT {', '.join(SCHEMA_DAILY)} FROM daily"
+        + (" WHERE " + " AND ".join(where) if where else "")
+        + " ORDER BY dte ASC, id ASC"
+    )
+    return _read_typed(sql, params, conn)
+
+
+@profiling.timed
+def page_daily(start: str = None, end: str = None, after=None, limit: int = 50):
+    """صفحة واحدة من اليومية بترقيم keyset على (dte, id) عبر فهرس ux_daily_dte، مع
+    صفوف الشهور المؤرشفة في مكانها (archive.page_rows).
+
+    after = مؤشر الصفحة السابقة كما رجع من هنا (None = أول صفحة)، end حصري.
+    يرجّع (الإطار، مؤشر الصفحة التالية أو None). التكلفة O(limit) مهما كان موضع الصفحة
+    (+ ملفات الشهور المؤرشفة اللازمة لملئها فقط).
+    """
+    where, params = [], []
+    if start is not None:
+        where.append("dte >= ?")
+        params.append(start)
+    if end is not None:
+        where.append("dte < ?")
+        params.append(end)
+    if after is not None:
+        where.append("(dte, id) > (?, ?)")
+        params += [after[0], int(after[1])]
+    sql = (
+        f"SELECT {', '.join(SCHEMA_DAILY)} FROM daily"
+        + (" WHERE " + " AND ".join(where) if where else "")
+        + " ORDER BY dte ASC, id ASC LIMIT ?"
+    )
+    df = _read_typed(sql, params + [int(limit) + 1])  # صف زائد = توجد صفحة تالية
+    import archive
+
+    cold = archive.page_rows(start, end, after, int(limit) + 1)
+    if cold is not None:  # الشهور المؤرشفة: نفس الترتيب، نأخذ أول limit+1 من الطبقتين
+        cold = cold.astype(df.dtypes.to_dict())
+        df = pd.concat([df, cold], ignore_index=True) if not df.empty else cold
+        df = df.sort_values(["dte", "id"], kind="stable", ignore_index=True).head(int(limit) + 1)
+    if len(df) <= limit:
+        return df, None
+    df = df.iloc[:limit]
+    last = int(df["id"].iloc[-1])
+    with connection() as conn:
+        # المؤشر بنص dte المخزّن كما هو (لا نعيد تنسيقه من datetime)
+        raw = conn.execute("SELECT dte FROM daily WHERE id=?", (last,)).fetchone()
+    return df, (raw[0] if raw else df["dte"].iloc[-1].strftime("%Y-%m-%d"), last)
+
+
+@profiling.timed
+def fetch_monthly_df(conn=None) -> pd.DataFrame:
+    """قيود الغاز/الإيجار الشهرية (على conn لو أُعطي: داخل معاملة قائمة)."""
+    if conn is None:
+        with connection() as conn:
+            return fetch_monthly_df(conn)
+    return pd.read_sql_query("SELECT * FROM monthly ORDER BY month ASC, id ASC", conn)
+
+
+@profiling.timed
+def delete_row(row_id: int) -> int:
+    """حذف سجل واحد. يرجّع عدد المحذوف (0 لو غير موجود)."""
+    with connection() as conn:
+        _thaw_ids(conn, [row_id])
+        found = conn.execute("SELECT dte FROM daily WHERE id=?", (row_id,)).fetchone()
+        deleted = conn.execute("DELETE FROM daily WHERE id=?", (row_id,)).rowcount
+        if found:
+            _refresh_rollups(conn, [found[0]])
+        n = _mark_write(conn)
+    _wrote(n)
+    _bump_version("daily", int(row_id))
+    return deleted
+
+
+@profiling.timed
+def delete_rows(ids) -> int:
+    """حذف مجموعة سجلات في معاملة واحدة (مع تحديث ملخصات شهورها). يرجّع عدد المحذوف."""
+    ids = [int(i) for i in ids]
+    if not ids:
+        return 0
+    qmarks = ",".join(["?"] * len(ids))
+    with connection() as conn:
+        _thaw_ids(conn, ids)
+        dtes = [r[0] for r in conn.execute(f"SELECT dte FROM daily WHERE id IN ({qmarks})", ids)]
+        deleted = conn.execute(f"DELETE FROM daily WHERE id IN ({qmarks})", ids).rowcount
+        _refresh_rollups(conn, dtes)
+        n = _mark_write(conn)
+    _wrote(n)
+    for i in ids:
+        _bump_version("daily", i)
+    return deleted
+
+
+@profiling.timed
+def update_daily_rows(changes: dict) -> int:
+    """تعديل سجلات موجودة في معاملة واحدة: {id: {عمود: قيمة}}. يرجّع عدد السجلات المعدّلة
+    فعلًا (id غير موجود لا يُحسب).
+
+    لو تغيّر التاريخ تُحدَّث ملخصات الشهر القديم والجديد معًا.
+    """
+    changes = {int(i): vals for i, vals in changes.items() if vals}
+    bad = {c for vals in changes.values() for c in vals} - (set(SCHEMA_DAILY) - {"id"})
+    if bad:
+        raise ValueError(f"أعمدة غير معروفة: {sorted(bad)}")
+    ids = list(changes)
+    if not ids:
+        return 0
+    qmarks = ",".join(["?"] * len(ids))
+    updated = 0
+    with connection() as conn:
+        _thaw_ids(conn, ids)
+        _thaw(conn, [vals["dte"] for vals in changes.values() if vals.get("dte")])
+        dtes = [r[0] for r in conn.execute(f"SELECT dte FROM daily WHERE id IN ({qmarks})", ids)]
+        for row_id in ids:
+            vals = changes[row_id]
+            sets = ", ".join(f"{c}=?" for c in vals)
+            try:
+                updated += conn.execute(f"UPDATE daily SET {sets} WHERE id=?", [*vals.values(), row_id]).rowcount
+            except sqlite3.IntegrityError:
+                raise ValueError(f"يوجد سجل آخر بتاريخ {vals.get('dte')} — عدّل ذلك السجل بدل تكرار اليوم") from None
+            if "dte" in vals:
+                dtes.append(vals["dte"])
+        _refresh_rollups(conn, dtes)
+        n = _mark_write(conn)
+    _wrote(n)
+    for i in ids:
+        _bump_version("daily", i)
+    return updated
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""تصدير Excel متدفق: شهر واحد في الذاكرة في أي لحظة.
+
+نقرأ اليومية شهرًا بشهر من SQLite أو أرشيف Parquet (التوزيع الشهري للغاز/الإيجار يعتمد على الشهر
+وحده)، نحسب الأعمدة المشتقة لهذا الشهر، ونكتب الصفوف في Workbook بوضع write_only
+الذي يفرّغها على القرص أولًا بأول. الناتج في ملف مؤقت أو buffer وليس بجانب التطبيق.
+"""
+import io
+import os
+import tempfile
+from datetime import date, timedelta
+
+import archive
+import db
+import profiling
+import reports
+
+DAILY_SHEET = "يومي"
+MONTHLY_SHEET = "شهري"
+MAX_SHEET_ROWS = 1_048_575  # حد Excel ناقص سطر العناوين
+
+# أعمدة الورقة اليومية: (العنوان، العمود في الإطار المشتق)
+DAILY_COLUMNS = [
+    ("التاريخ", "dte"),
+    (db.DAILY_LABELS["units_baton"], "units_baton"), (db.DAILY_LABELS["units_round"], "units_round"),
+    (db.DAILY_LABELS["u1000_baton"], "u1000_baton"), (db.DAILY_LABELS["u1000_round"], "u1000_round"),
+    ("سعر الوحدة — بسطونة", "سعر الوحدة — بسطونة"), ("سعر الوحدة — مدور", "سعر الوحدة — مدور"),
+    ("مبيعات البسطونة", "مبيعات البسطونة"), ("مبيعات المدور", "مبيعات المدور"),
+    ("إجمالي المبيعات", "إجمالي المبيعات"),
+    *[(db.DAILY_LABELS[c], c) for c in (
+        "flour_bags", "flour_bag_price", "flour_extra",
+        "yeast", "salt", "oil", "electricity", "water", "salaries", "maintenance",
+        "petty", "other_exp", "ice", "breakfast", "daily_wage",
+        "returns", "discounts",
+    )],
+    ("الإجمالي اليومي للمصروفات", "الإجمالي اليومي للمصروفات (بدون الغاز والإيجار)"),
+    ("الربح الصافي لليوم", "الربح الصافي لليوم"),
+    (db.DAILY_LABELS["funding"], "funding"),
+]
+MONTHLY_COLUMNS = [("الشهر", "month"), ("غاز شهري", "gas"), ("إيجار شهري", "rent")]
+
+
+def _months(start, end):
+    """مفاتيح الشهور (YYYY-MM-01) التي فيها سجلات ضمن المدى."""
+    params = []
+    where = reports.range_where("dte", reports.iso_day(start), reports.end_exclusive(end), params)
+    with db.connection() as conn:
+        rows = conn.execute(f"SELECT DISTINCT month FROM daily_rollup{where} ORDER BY month", params).fetchall()
+    return [r[0] for r in rows]
+
+
+def iter_month_frames(start=None, end=None, monthly=None):
+    """(مفتاح الشهر، إطار مشتق) لكل شهر في المدى، مقصوص على start/end."""
+    monthly = db.fetch_monthly_df() if monthly is None else monthly
+    lo = reports.iso_day(start)
+    hi = reports.end_exclusive(end)
+    for key in _months(start, end):
+        nxt = reports.iso_day(reports.next_month(date.fromisoformat(key)))
+        # read_enriched يشتق الشهر كاملًا (آخر يوم مُسجّل والبواقي صحيحة) ثم يقص،
+        # والشهر المؤرشف يأتي مشتقًا جاهزًا من Parquet
+        last = date.fromisoformat(min(hi or nxt, nxt)) - timedelta(days=1)
+        df = archive.read_enriched(max(lo or key, key), last, monthly)
+        if not df.empty:
+            yield key, df
+
+
+def _rows(df):
+    out = df.reindex(columns=[c for _, c in DAILY_COLUMNS])
+    out["dte"] = out["dte"].dt.date
+    out = out.astype(object).where(out.notna(), None)
+    return out.itertuples(index=False, name=None)
+
+
+@profiling.timed
+def write_workbook(dest, start=None, end=None, split_by_month=False) -> dict:
+    """يكتب الملف إلى dest (مسار أو كائن ملف). يرجّع {"rows", "sheets"}."""
+    from openpyxl import Workbook  # ثقيل: يُحمَّل عند أول تصدير فقط
+
+    wb = Workbook(write_only=True)
+    header = [h for h, _ in DAILY_COLUMNS]
+    monthly = db.fetch_monthly_df()
+    stats = {"rows": 0, "sheets": []}
+    ws, ws_rows = None, 0
+
+    def new_sheet(title):
+        sheet = wb.create_sheet(title=title)
+        sheet.append(header)
+        stats["sheets"].append(title)
+        return sheet
+
+    for key, df in iter_month_frames(start, end, monthly):
+        if split_by_month:
+            ws, ws_rows = new_sheet(key[:7]), 0
+        elif ws is None:
+            ws, ws_rows = new_sheet(DAILY_SHEET), 0
+        for row in _rows(df):
+            if ws_rows >= MAX_SHEET_ROWS:
+                ws, ws_rows = new_sheet(f"{DAILY_SHEET} {len(stats['sheets']) + 1}"), 0
+            ws.append(row)
+            ws_rows += 1
+        stats["rows"] += len(df)
+    if ws is None:
+        new_sheet(DAILY_SHEET)
+
+    # ورقة شهرية
+    if monthly is not None and not monthly.empty:
+        m = monthly
+        if start is not None:
+            m = m[m["month"] >= reports.iso_day(start)[:7] + "-01"]
+        if end is not None:
+            m = m[m["month"] <= reports.iso_day(end)]
+        if not m.empty:
+            ws = wb.create_sheet(title=MONTHLY_SHEET)
+            ws.append([h for h, _ in MONTHLY_COLUMNS])
+            for row in m[[c for _, c in MONTHLY_COLUMNS]].itertuples(index=False, name=None):
+                ws.append(row)
+            stats["sheets"].append(MONTHLY_SHEET)
+
+    wb.save(dest)
+    return stats
+
+
+def export_bytes(start=None, end=None, split_by_month=False) -> bytes:
+    """للزر st.download_button: الملف كاملًا كـ bytes (الكتابة نفسها متدفقة)."""
+    buf = io.BytesIO()
+    write_workbook(buf, start, end, split_by_month)
+    return buf.getvalue()
+
+
+def export_tempfile(start=None, end=None, split_by_month=False) -> str:
+    """يكتب إلى ملف مؤقت فريد (لا يتصادم بين المستخدمين) ويرجّع مساره."""
+    fd, path = tempfile.mkstemp(prefix="bakery_export_", suffix=".xlsx")
+    os.close(fd)
+    write_workbook(path, start, end, split_by_month)
+    return path
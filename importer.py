@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""استيراد جماعي لسجلات اليومية من CSV / Excel / Parquet.
+
+يقرأ الملف على دفعات (بدون تحميله كاملًا)، يحوّل العناوين العربية (نفس ملف
+التصدير) لأسماء الأعمدة، يتحقق من القيم حسب SCHEMA_DAILY، ثم يُدخل كل دفعة في
+معاملة واحدة عبر executemany (اليوم الموجود يُحدَّث ولا يتكرر). الأعمدة المشتقة في
+ملف التصدير تُهمل وتُحسب من جديد. في Excel تُقرأ كل أوراق اليومية (يومي، يومي 2،
+أوراق الشهور) وتُتجاوز الورقة الشهرية.
+
+    python importer.py ledger.xlsx [--batch-size 5000] [--dry-run] [--branch NAME]
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+import db
+import profiling
+
+BATCH_SIZE = 5000
+DATA_COLS = [c for c in db.SCHEMA_DAILY if c not in ("id", "dte")]
+PRICING_COLS = ("u1000_baton", "u1000_round")  # تُقسم عليها 1000 → لازم ≥ 1
+_HEADER_MAP = {**{v: k for k, v in db.DAILY_LABELS.items()}, **{c: c for c in db.SCHEMA_DAILY}}
+
+
+def _kind(name: str) -> str:
+    ext = os.path.splitext(name)[1].lower()
+    if ext in (".xlsx", ".xlsm"):
+        return "xlsx"
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    if ext in (".csv", ".txt"):
+        return "csv"
+    raise ValueError(f"صيغة غير مدعومة: {ext or name}")
+
+
+def _iter_csv(src, size):
+    for chunk in pd.read_csv(src, chunksize=size, dtype=str, keep_default_na=False, na_values=[""]):
+        yield None, chunk
+
+
+def _daily_header(header) -> bool:
+    """ورقة بشكل اليومية: في عناوينها عمود التاريخ (يومي، يومي 2، YYYY-MM...)."""
+    return any(_HEADER_MAP.get(h) == "dte" for h in header)
+
+
+def _iter_xlsx(src, size):
+    """كل أوراق اليومية بالترتيب: التصدير يقسم على أوراق الشهور أو «يومي 2...» بعد
+    حد Excel. الأوراق الأخرى (الشهري مثلًا) تُتجاوز حسب سطر العناوين."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(src, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            rows = ws.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            header = [str(h).strip() if h is not None else "" for h in header]
+            if not _daily_header(header):
+                continue
+            buf = []
+            for r in rows:
+                if r is None or all(v is None for v in r):
+                    continue
+                buf.append(r)
+                if len(buf) >= size:
+                    yield ws.title, pd.DataFrame(buf, columns=header)
+                    buf = []
+            if buf:
+                yield ws.title, pd.DataFrame(buf, columns=header)
+    finally:
+        wb.close()
+
+
+def _iter_parquet(src, size):
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(src).iter_batches(batch_size=size):
+        yield None, batch.to_pandas()
+
+
+_READERS = {"csv": _iter_csv, "xlsx": _iter_xlsx, "parquet": _iter_parquet}
+
+
+def validate_chunk(chunk: pd.DataFrame, first_line: int = 2):
+    """يرجّع (صفوف صالحة كقواميس، [(رقم السطر، السبب)])."""
+    chunk = chunk.rename(columns=lambda h: _HEADER_MAP.get(str(h).strip(), None))
+    chunk = chunk.loc[:, [c for c in chunk.columns if c is not None]]
+    chunk = chunk.loc[:, ~chunk.columns.duplicated()]
+    if "dte" not in chunk.columns:
+        raise ValueError("عمود التاريخ (dte / التاريخ) غير موجود في الملف")
+    n = len(chunk)
+    reason = pd.Series([None] * n, index=chunk.index, dtype=object)
+
+    dte = pd.to_datetime(chunk["dte"], errors="coerce")
+    reason[dte.isna()] = "تاريخ غير صالح"
+
+    values = {}
+    for col in DATA_COLS:
+        if col not in chunk.columns:
+            continue
+        raw = chunk[col]
+        num = pd.to_numeric(raw, errors="coerce")
+        bad = reason.isna() & raw.notna() & num.isna()
+        if bad.any():
+            # خانات فيها مسافات فقط تُعامل كفارغة
+            bad &= raw.astype(str).str.strip() != ""
+        reason[bad] = f"{col}: قيمة غير رقمية"
+        bad = reason.isna() & num.notna() & (num != num.round())
+        reason[bad] = f"{col}: كسور غير مسموحة"
+        bad = reason.isna() & (num < 0)
+        reason[bad] = f"{col}: قيمة سالبة"
+        if col in PRICING_COLS:
+            bad = reason.isna() & (num < 1)
+            reason[bad] = f"{col}: يجب أن يكون 1 أو أكثر"
+        values[col] = num
+
+    ok = reason.isna().to_numpy()
+    cols = ["dte", *values]
+    lists = [dte[ok].dt.strftime("%Y-%m-%d").tolist()]
+    for num in values.values():
+        v = num[ok].astype("Int64").astype(object)
+        lists.append(v.where(v.notna(), None).tolist())
+    records = [dict(zip(cols, t)) for t in zip(*lists)]
+    bad_pos = (~ok).nonzero()[0]
+    rejected = list(zip((first_line + bad_pos).tolist(), reason.iloc[bad_pos].tolist()))
+    return records, rejected
+
+
+@profiling.timed
+def import_file(src, name: str = None, batch_size: int = BATCH_SIZE, dry_run: bool = False, progress=None) -> dict:
+    """يستورد ملفًا (مسار أو كائن ملف مع name). يرجّع تقريرًا بالأعداد والسرعة والمرفوض.
+
+    المرفوض [(السطر، السبب)]؛ في Excel السطر بالشكل «الورقة!رقم».
+    rows_per_sec = المُدخل فعلًا/ث، و scanned_per_sec = المقروء (شامل المرفوض)/ث."""
+    name = name or getattr(src, "name", None) or str(src)
+    reader = _READERS[_kind(name)]
+    db.init_db()
+    report = {"read": 0, "inserted": 0, "rejected": [], "seconds": 0.0, "rows_per_sec": 0.0, "scanned_per_sec": 0.0}
+    t0 = time.perf_counter()
+    line, current = 2, None  # السطر 1 = العناوين (في كل ورقة)
+    touched = set()
+    try:
+        for sheet, chunk in reader(src, batch_size):
+            if sheet != current:
+                line, current = 2, sheet
+            records, rejected = validate_chunk(chunk, line)
+            if sheet is not None:  # Excel: السطر مع اسم الورقة
+                rejected = [(f"{sheet}!{ln}", why) for ln, why in rejected]
+            line += len(chunk)
+            report["read"] += len(chunk)
+            report["rejected"].extend(rejected)
+            if records and not dry_run:
+                # الملخصات تُحدّث مرة واحدة في النهاية بدل كل دفعة
+                report["inserted"] += db.insert_daily_many(records, refresh_rollups=False)
+                touched.update(r["dte"] for r in records)
+            if progress:
+                progress(report)
+    finally:
+        if touched:
+            db.refresh_rollups(touched)
+    report["seconds"] = time.perf_counter() - t0
+    if report["seconds"] > 0:
+        report["rows_per_sec"] = report["inserted"] / report["seconds"]
+        report["scanned_per_sec"] = report["read"] / report["seconds"]
+    return report
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="استيراد سجلات يومية جماعيًا")
+    ap.add_argument("path", help="ملف CSV أو XLSX أو Parquet")
+    ap.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    ap.add_argument("--dry-run", action="store_true", help="تحقق فقط بدون إدخال")
+    ap.add_argument("--branch", default=None, help="الفرع (يُنشأ لو غير موجود)")
+    args = ap.parse_args(argv)
+    db.set_branch(args.branch)
+    rep = import_file(args.path, batch_size=args.batch_size, dry_run=args.dry_run)
+    for ln, why in rep["rejected"][:50]:
+        print(f"سطر {ln}: {why}")
+    if len(rep["rejected"]) > 50:
+        print(f"... و {len(rep['rejected']) - 50} أخرى")
+    print(
+        f"قُرئ {rep['read']:,} — أُدخل {rep['inserted']:,} — مرفوض {len(rep['rejected']):,} — "
+        f"{rep['rows_per_sec']:,.0f} مُدخل/ث، {rep['scanned_per_sec']:,.0f} مقروء/ث ({rep['seconds']:.2f} ث)"
+    )
+    return 1 if rep["rejected"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""طابور إدخال (write-ahead) لحفظ السجلات اليومية على دفعات.
+
+زر الحفظ لا يكتب في SQLite مباشرة: السطر يُلحق بملف journal بجانب قاعدة الفرع
+(<القاعدة>.inbox، JSON سطر لكل سجل) مع fsync ثم يُرجَع رقم تذكرة فورًا. كاتب واحد
+(thread) يجمع ما تراكم ويطبّقه في معاملة واحدة كل FLUSH_ROWS سجل أو FLUSH_S ثانية،
+فتتشارك أجهزة نهاية الوردية قفل الكتابة مرة واحدة بدل commit لكل ضغطة.
+
+- المتانة: ما أُقرّ (رجعت تذكرته) موجود على القرص؛ بعد إعادة التشغيل يطبّقه الكاتب.
+- مرة واحدة فقط: التذاكر المطبّقة في جدول ingest_log داخل نفس المعاملة، فلو توقفت
+  العملية بعد commit وقبل حذف الملف لا يتكرر الإدخال.
+- التكرار: تاريخ موجود مسبقًا (أو مكرر داخل الدفعة) يُكتشف عند التطبيق ويُسجّل
+  duplicate بدل إدخال صف ثانٍ لنفس اليوم، إلا لو أُرسل بـ replace فيُحدَّث.
+- عدة عمليات: الإلحاق بقفل مشترك (flock) والتدوير بقفل حصري، وتطبيق الدفعات بقفل
+  ملف منفصل حتى لا يطبّق كاتبان نفس المقطع.
+
+    python ingest.py            # تطبيق كل المنتظر ثم الخروج
+"""
+import glob
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import db
+
+try:
+    import fcntl
+except ImportError:  # ويندوز: أقفال الخيوط داخل العملية فقط
+    fcntl = None
+
+FLUSH_ROWS = 200      # أقصى سجلات في المعاملة الواحدة
+FLUSH_S = 0.25        # أقصى انتظار لأقدم سجل قبل التطبيق
+POLL_S = 2.0          # فحص دوري لملفات عمليات أخرى/بقايا إعادة التشغيل
+KEEP_LOG = 10_000     # عدد التذاكر المحفوظة في ingest_log
+_RECENT = 1000        # نتائج التذاكر الأخيرة في الذاكرة (لـ wait)
+
+_lock = threading.Lock()
+_cond = threading.Condition(_lock)
+_flush_lock = threading.Lock()
+_stop = threading.Event()
+_writer = None
+_pending = 0          # مُقرّة في هذه العملية ولم تُطبّق بعد
+_oldest = None        # وقت أقدمها
+_recent = OrderedDict()  # ticket → (status, row_id, dte)
+_stats = {"submitted": 0, "applied": 0, "duplicates": 0, "batches": 0, "last_batch_rows": 0,
+          "commit_s": 0.0, "last_commit_ms": 0.0, "max_commit_ms": 0.0,
+          "last_lag_ms": 0.0, "max_lag_ms": 0.0, "errors": 0, "last_error": None}
+
+
+def create_tables(conn):
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS ingest_log ("
+        "ticket TEXT PRIMARY KEY, status TEXT NOT NULL, row_id INTEGER, dte TEXT, "
+        "queued_at REAL NOT NULL, applied_at REAL NOT NULL)"
+    )
+
+
+def _journal(path: str) -> str:
+    return path + ".inbox"
+
+
+@contextmanager
+def _flock(lock_path: str, mode):
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, mode)
+        yield
+    finally:
+        os.close(fd)  # يحرر القفل
+
+
+# # ============== الواجهة # ==============
+
+def submit(row: dict, replace: bool = False) -> str:
+    """يُقرّ سجلًا يوميًا (مكتوبًا على القرص) ويرجّع رقم تذكرته قبل تطبيقه على SQLite.
+
+    replace=True: لو اليوم محفوظ تُستبدل قيمه (upsert) بدل تسجيله duplicate.
+    """
+    global _pending, _oldest
+    path = db.current_path()
+    ticket = uuid.uuid4().hex
+    if not db.DB_PERSISTENT or path == ":memory:":
+        # لا ملف نكتب بجانبه → إدخال مباشر (نفس مسار الدفعات بدفعة من سجل واحد)
+        with _lock:
+            _stats["submitted"] += 1
+        _apply([(ticket, row, time.time(), replace)])
+        return ticket
+    item = {"ticket": ticket, "row": row, "ts": time.time(), "replace": replace}
+    line = (json.dumps(item, ensure_ascii=False) + "\n").encode("utf-8")
+    journal = _journal(path)
+    lock = fcntl.LOCK_SH if fcntl else None
+    with _flock(journal + ".lock", lock):
+        # كتابة واحدة بـ O_APPEND: السطر لا يتداخل مع كتابات أخرى
+        fd = os.open(journal, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    with _cond:
+        _pending += 1
+        _stats["submitted"] += 1
+        if _oldest is None:
+            _oldest = time.monotonic()
+        _cond.notify_all()
+    start()
+    return ticket
+
+
+def status(ticket: str):
+    """(status, row_id, dte) للتذكرة المطبّقة، أو None لو ما زالت في الطابور."""
+    with _lock:
+        if ticket in _recent:
+            return _recent[ticket]
+    with db.connection() as conn:
+        row = conn.execute("SELECT status, row_id, dte FROM ingest_log WHERE ticket=?", (ticket,)).fetchone()
+    return tuple(row) if row else None
+
+
+def wait(ticket: str, timeout: float = 2.0):
+    """ينتظر تطبيق التذكرة حتى timeout ثانية. يرجّع status(ticket)."""
+    deadline = time.monotonic() + timeout
+    with _cond:
+        while ticket not in _recent:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            _cond.wait(remaining)
+    return status(ticket)
+
+
+def queue_depth(path: str = None) -> int:
+    """عدد السجلات المُقرّة وغير المطبّقة في ملفات الفرع (كل العمليات)."""
+    path = path or db.current_path()
+    n = 0
+    for f in [_journal(path), *_segments(path)]:
+        try:
+            with open(f, "rb") as fh:
+                n += fh.read().count(b"\n")
+        except OSError:
+            pass
+    return n
+
+
+def stats() -> dict:
+    with _lock:
+        out = dict(_stats)
+        out["pending"] = _pending
+    out["avg_commit_ms"] = (out["commit_s"] / out["batches"] * 1000) if out["batches"] else 0.0
+    out["queue_depth"] = queue_depth() if db.DB_PERSISTENT else 0
+    return out
+
+
+def _remember(results):
+    with _cond:
+        for ticket, status_, row_id, dte in results:
+            _recent[ticket] = (status_, row_id, dte)
+            _recent.move_to_end(ticket)
+        while len(_recent) > _RECENT:
+            _recent.popitem(last=False)
+        _cond.notify_all()
+
+
+# # ============== التطبيق # ==============
+
+def _segments(path: str) -> list:
+    return sorted(glob.glob(glob.escape(_journal(path)) + ".*.seg"))
+
+
+def _rotate(path: str):
+    """يحوّل الـ journal الحالي إلى مقطع ثابت (الإلحاقات الجديدة تبدأ ملفًا جديدًا)."""
+    journal = _journal(path)
+    if not os.path.exists(journal):
+        return
+    with _flock(journal + ".lock", fcntl.LOCK_EX if fcntl else None):
+        if os.path.getsize(journal):
+            os.replace(journal, f"{journal}.{time.time_ns():020d}.seg")
+
+
+def _read_segment(seg: str) -> list:
+    entries = []
+    with open(seg, "rb") as fh:
+        for line in fh:
+            if not line.endswith(b"\n"):
+                break  # كتابة ناقصة (توقف قبل fsync) — لم تُقَر أصلًا
+            item = json.loads(line)
+            entries.append((item["ticket"], item["row"], item["ts"], item.get("replace", False)))
+    return entries
+
+
+def _apply(entries: list) -> list:
+    t0 = time.perf_counter()
+    results = db.insert_daily_queued(entries)
+    secs = time.perf_counter() - t0
+    now = time.time()
+    lag = max((now - e[2] for e in entries), default=0.0) * 1000
+    with _lock:
+        _stats["batches"] += 1
+        _stats["last_batch_rows"] = len(entries)
+        _stats["applied"] += sum(1 for r in results if r[1] != "duplicate")
+        _stats["duplicates"] += sum(1 for r in results if r[1] == "duplicate")
+        _stats["commit_s"] += secs
+        _stats["last_commit_ms"] = secs * 1000
+        _stats["max_commit_ms"] = max(_stats["max_commit_ms"], secs * 1000)
+        _stats["last_lag_ms"] = lag
+        _stats["max_lag_ms"] = max(_stats["max_lag_ms"], lag)
+    _remember(results)
+    return results
+
+
+def _prune():
+    with db.connection() as conn:
+        conn.execute(
+            "DELETE FROM ingest_log WHERE rowid <= (SELECT MAX(rowid) FROM ingest_log) - ?", (KEEP_LOG,)
+        )
+
+
+def flush() -> int:
+    """يطبّق كل ما في طابور الفرع الحالي. يرجّع عدد السجلات المطبّقة."""
+    path = db.current_path()
+    journal = _journal(path)
+    n = 0
+    with _flush_lock, _flock(journal + ".flush", fcntl.LOCK_EX if fcntl else None):
+        _rotate(path)
+        for seg in _segments(path):
+            entries = _read_segment(seg)
+            for i in range(0, len(entries), FLUSH_ROWS):
+                n += len(_apply(entries[i:i + FLUSH_ROWS]))
+            os.remove(seg)  # بعد commit كل دفعاته؛ لو توقفنا قبلها ingest_log يمنع التكرار
+        if n:
+            _prune()
+    return n
+
+
+def flush_all() -> int:
+    """يطبّق طوابير كل الفروع التي لها ملفات منتظرة."""
+    global _pending, _oldest
+    with _lock:
+        taken = _pending
+        _pending, _oldest = 0, None
+    n = 0
+    try:
+        for name in db.branches():
+            path = db.branch_path(name)
+            if not (os.path.exists(_journal(path)) or _segments(path)):
+                continue
+            with db.use_branch(name):
+                db.init_db()
+                n += flush()
+    except Exception:
+        with _lock:
+            _pending += taken  # تبقى على القرص؛ نعيد المحاولة في الدورة التالية
+            _oldest = _oldest or time.monotonic()
+        raise
+    return n
+
+
+def _run():
+    while not _stop.is_set():
+        with _cond:
+            # ننتظر أول سجل (أو الفحص الدوري)، ثم حتى تمتلئ الدفعة أو يمر FLUSH_S على أقدم سجل
+            if not _pending:
+                _cond.wait(POLL_S)
+            while _pending and _pending < FLUSH_ROWS and not _stop.is_set():
+                remaining = _oldest + FLUSH_S - time.monotonic()
+                if remaining <= 0:
+                    break
+                _cond.wait(remaining)
+        try:
+            flush_all()
+        except Exception as e:
+            with _lock:
+                _stats["errors"] += 1
+                _stats["last_error"] = f"{type(e).__name__}: {e}"
+            _stop.wait(FLUSH_S)
+
+
+def start():
+    """يشغّل الكاتب مرة واحدة لكل عملية؛ أول دورة تطبّق بقايا ما قبل إعادة التشغيل."""
+    global _writer
+    with _lock:
+        if _writer is not None and _writer.is_alive():
+            return
+        _stop.clear()
+        _writer = threading.Thread(target=_run, name="bakery-ingest", daemon=True)
+        _writer.start()
+
+
+def stop(timeout: float = 5.0):
+    """يوقف الكاتب بعد تطبيق ما تبقى."""
+    global _writer
+    _stop.set()
+    with _cond:
+        _cond.notify_all()
+    if _writer is not None:
+        _writer.join(timeout)
+        _writer = None
+    flush_all()
+
+
+def main():
+    db.init_db(db.DB_FILE)
+    n = flush_all()
+    print(f"طُبّق {n} سجل من الطابور.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
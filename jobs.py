@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""مهام خلفية (مزامنة Google Sheets / تصدير Excel) بطابور محفوظ في SQLite.
+
+الواجهة تضيف مهمة (submit) وترجع فورًا برقمها، وعمّال (threads) داخل نفس
+العملية يسحبون المهام من جدول jobs وينفّذونها، والواجهة تستعلم الحالة (get).
+
+- الطابور في SQLite: المهام المنتظرة لا تضيع لو أُعيد تشغيل التطبيق، والمهام
+  العالقة في running (عملية ماتت) تعود للطابور بعد STALE_S.
+- دمج الطلبات: طلب مطابق (نفس النوع والمعاملات) لمهمة ما زالت queued يرجّع نفس
+  الرقم بدل مهمة جديدة. المهمة الجارية لا تُدمج لأنها قرأت البيانات قبل الطلب.
+- مهمة واحدة جارية لكل نوع (مزامنتان معًا تتصادمان على sync_state).
+
+    python jobs.py            # تنفيذ المهام المنتظرة ثم الخروج
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+import db
+
+MAX_WORKERS = 2
+POLL_S = 1.0            # انتظار العامل لو الطابور فاضي (submit يوقظه فورًا)
+STALE_S = 15 * 60       # running أقدم من هذا بدون انتهاء → تُعاد للطابور
+KEEP_FINISHED = 200     # عدد المهام المنتهية التي نحتفظ بها
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+_HANDLERS = {}
+_lock = threading.Lock()
+_wake = threading.Event()
+_stop = threading.Event()
+_workers = []
+
+
+def create_tables(conn):
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS jobs ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, params TEXT NOT NULL, "
+        "status TEXT NOT NULL, requests INTEGER NOT NULL DEFAULT 1, result TEXT, error TEXT, "
+        "created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs(status, id)")
+
+
+def handler(kind: str):
+    """يسجّل دالة تنفيذ لنوع مهمة: fn(**params) → نتيجة قابلة لـ JSON."""
+    def wrap(fn):
+        _HANDLERS[kind] = fn
+        return fn
+    return wrap
+
+
+def _params_key(params) -> str:
+    return json.dumps(params or {}, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _row_dict(row) -> dict:
+    keys = ("id", "kind", "params", "status", "requests", "result", "error",
+            "created_at", "started_at", "finished_at")
+    job = dict(zip(keys, row))
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+_COLS = "id, kind, params, status, requests, result, error, created_at, started_at, finished_at"
+
+
+def _connection():
+    # الطابور دائمًا في القاعدة الرئيسية (عامل واحد يخدم كل الفروع)؛ الفرع ضمن المعاملات
+    return db.connection(db.DB_FILE)
+
+
+# # ============== الواجهة # ==============
+
+def submit(kind: str, params: dict = None, start_workers: bool = True) -> int:
+    """يضيف مهمة لفرع الخيط الحالي (أو يدمجها مع مطابقة منتظرة) ويرجّع رقمها."""
+    if kind not in _HANDLERS:
+        raise ValueError(f"نوع مهمة غير معروف: {kind}")
+    key = _params_key({**(params or {}), "branch": db.current_branch()})
+    with _connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT id FROM jobs WHERE kind=? AND params=? AND status=? ORDER BY id LIMIT 1",
+            (kind, key, QUEUED),
+        ).fetchone()
+        if row:
+            job_id = row[0]
+            conn.execute("UPDATE jobs SET requests = requests + 1 WHERE id=?", (job_id,))
+        else:
+            cur = conn.execute(
+                "INSERT INTO jobs (kind, params, status, created_at) VALUES (?,?,?,?)",
+                (kind, key, QUEUED, time.time()),
+            )
+            job_id = cur.lastrowid
+    if start_workers:
+        start()
+    _wake.set()
+    return job_id
+
+
+def get(job_id: int):
+    with _connection() as conn:
+        row = conn.execute(f"SELECT {_COLS} FROM jobs WHERE id=?", (job_id,)).fetchone()
+    return _row_dict(row) if row else None
+
+
+def recent(limit: int = 10, kind: str = None) -> list:
+    params = []
+    where = ""
+    if kind:
+        where = " WHERE kind=?"
+        params.append(kind)
+    with _connection() as conn:
+        rows = conn.execute(f"SELECT {_COLS} FROM jobs{where} ORDER BY id DESC LIMIT ?", (*params, limit)).fetchall()
+    return [_row_dict(r) for r in rows]
+
+
+def pending_count() -> int:
+    with _connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchone()[0]
+
+
+# # ============== التنفيذ # ==============
+
+def _claim():
+    """يحجز أقدم مهمة منتظرة لا يوجد من نوعها مهمة جارية. يرجّع (id, kind, params) أو None."""
+    with _connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT id, kind, params FROM jobs WHERE status=? "
+            "AND kind NOT IN (SELECT kind FROM jobs WHERE status=?) ORDER BY id LIMIT 1",
+            (QUEUED, RUNNING),
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE jobs SET status=?, started_at=? WHERE id=?", (RUNNING, time.time(), row[0]))
+    return row
+
+
+def _run(job_id: int, kind: str, params: str):
+    params = json.loads(params)
+    try:
+        with db.use_branch(params.pop("branch", None)):
+            db.init_db()
+            result = _HANDLERS[kind](**params)
+        status, error = DONE, None
+    except Exception as e:
+        status, result, error = FAILED, None, f"{type(e).__name__}: {e}"
+    with _connection() as conn:
+        conn.execute(
+            "UPDATE jobs SET status=?, result=?, error=?, finished_at=? WHERE id=?",
+            (status, json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+             error, time.time(), job_id),
+        )
+    _prune()
+    return status
+
+
+def _prune():
+    """يحذف المهام المنتهية الأقدم من آخر KEEP_FINISHED (ومعها ملفات التصدير)."""
+    with _connection() as conn:
+        old = conn.execute(
+            "SELECT id, result FROM jobs WHERE status IN (?, ?) ORDER BY id DESC LIMIT -1 OFFSET ?",
+            (DONE, FAILED, KEEP_FINISHED),
+        ).fetchall()
+        if not old:
+            return
+        conn.executemany("DELETE FROM jobs WHERE id=?", [(r[0],) for r in old])
+    for _, result in old:
+        path = (json.loads(result) or {}).get("path") if result else None
+        if isinstance(path, str) and os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def requeue_stale(max_age_s: float = STALE_S) -> int:
+    """المهام الجارية منذ أكثر من max_age_s (عملية توقفت) → queued من جديد."""
+    with _connection() as conn:
+        cur = conn.execute(
+            "UPDATE jobs SET status=?, started_at=NULL WHERE status=? AND started_at < ?",
+            (QUEUED, RUNNING, time.time() - max_age_s),
+        )
+        return cur.rowcount
+
+
+def run_pending() -> int:
+    """ينفّذ كل المهام المنتظرة في الخيط الحالي (سطر الأوامر). يرجّع عددها."""
+    n = 0
+    while True:
+        job = _claim()
+        if job is None:
+            return n
+        _run(*job)
+        n += 1
+
+
+def _worker():
+    while not _stop.is_set():
+        try:
+            job = _claim()
+        except Exception:
+            job = None  # القاعدة مشغولة مثلًا — نحاول في الدورة التالية
+        if job is None:
+            _wake.wait(POLL_S)
+            _wake.clear()
+            continue
+        _run(*job)
+
+
+def start(workers: int = MAX_WORKERS):
+    """يشغّل العمّال مرة واحدة لكل عملية (daemon: لا يمنعون إغلاق البرنامج)."""
+    with _lock:
+        alive = [t for t in _workers if t.is_alive()]
+        if alive:
+            return
+        db.init_db(db.DB_FILE)
+        requeue_stale()
+        _stop.clear()
+        _workers[:] = [
+            threading.Thread(target=_worker, name=f"bakery-job-{i}", daemon=True) for i in range(workers)
+        ]
+        for t in _workers:
+            t.start()
+
+
+def stop(timeout: float = 5.0):
+    _stop.set()
+    _wake.set()
+    for t in _workers:
+        t.join(timeout)
+    _workers.clear()
+
+
+# # ============== أنواع المهام # ==============
+
+@handler("sheets_sync")
+def _sheets_sync(full: bool = False):
+    import sheets_sync
+    from metrics import get_daily_df, get_monthly_df
+
+    try:
+        sh = sheets_sync.spreadsheet()
+        return sheets_sync.sync_all(sh, get_daily_df(), get_monthly_df(), full=full)
+    except Exception:
+        sheets_sync.forget_client()  # اعتماد منتهي/ملف محذوف → نبنيه من جديد المرة القادمة
+        raise
+
+
+@handler("export")
+def _export(start=None, end=None, split_by_month: bool = False):
+    import exporter
+
+    path = exporter.export_tempfile(start, end, split_by_month)
+    return {"path": path, "bytes": os.path.getsize(path)}
+
+
+def main():
+    db.init_db(db.DB_FILE)
+    requeue_stale()
+    n = run_pending()
+    print(f"نُفّذت {n} مهمة.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
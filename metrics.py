@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""الحسابات المشتقة لليومية (أسعار، مبيعات، مصروفات، توزيع الغاز/الإيجار، ربح).
+
+المحرك DerivedMetrics يحتفظ بالنتيجة في ذاكرة العملية (الموديول يبقى محمّلًا
+بين إعادات تشغيل Streamlit) ويعيد حساب الصفوف والشهور التي لمستها الكتابات فقط.
+إعادة البناء الكاملة تمر عبر shared_cache فتُقرأ من عملية أخرى بنتها لنفس العدّاد.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+import db
+import profiling
+
+THOUSAND = 1000  # أساس التسعير
+WORKING_DAYS_PER_MONTH = 26  # عدد أيام التشغيل في الشهر (لا نعمل الجمعة)
+
+# مصاريف يومية (بدون غاز/إيجار)
+EXPENSE_COLS = [
+    "yeast","salt","oil","electricity","water","salaries",
+    "maintenance","petty","other_exp","ice","breakfast","daily_wage"
+]
+
+# الأعمدة التي تعتمد على الشهر كله (التوزيع + ما بعده)
+MONTH_COLS = [
+    "per_day_gas", "per_day_rent",
+    "تكلفة يومية مُوزعة (غاز + إيجار)",
+    "الإجمالي اليومي للمصروفات (شامل الموزع)",
+    "الربح الصافي لليوم",
+]
+
+
+_INT32 = np.iinfo(np.int32)
+
+
+def _ints(df: pd.DataFrame, col: str) -> np.ndarray:
+    """عمود عددي كـ int64 (الفارغ = 0) بتحويل واحد بدل fillna().astype()."""
+    return df[col].to_numpy(dtype=np.int64, na_value=0)
+
+
+def _compact(values: np.ndarray) -> np.ndarray:
+    """int32 لو القيم تسعها (الحالة العادية)، وإلا تبقى int64 بدل الالتفاف الصامت."""
+    if len(values) and (values.min() < _INT32.min or values.max() > _INT32.max):
+        return values
+    return values.astype(np.int32)
+
+
+def _unit_price(u1000: np.ndarray) -> np.ndarray:
+    """THOUSAND // عدد الوحدات لكل 1000 (صفر لو القيمة 0/فارغة)."""
+    out = np.zeros_like(u1000)
+    np.floor_divide(THOUSAND, u1000, out=out, where=u1000 != 0)
+    return out
+
+
+def derive_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """يضيف الأعمدة المعتمدة على الصف فقط (in-place) ويرجّع نفس الإطار."""
+    # السعر للوحدة (عدد الوحدات لكل 1000 -> سعر للوحدة) بدون كسور
+    price_baton = _unit_price(_ints(df, "u1000_baton"))
+    price_round = _unit_price(_ints(df, "u1000_round"))
+
+    # المبيعات لكل نوع
+    sales_baton = _ints(df, "units_baton") * price_baton
+    sales_round = _ints(df, "units_round") * price_round
+
+    # تكلفة الدقيق + المصاريف اليومية في مخزن واحد
+    daily_core = _ints(df, "flour_bags") * _ints(df, "flour_bag_price")
+    daily_core += _ints(df, "flour_extra")
+    for col in EXPENSE_COLS:
+        daily_core += _ints(df, col)
+
+    df["سعر الوحدة — بسطونة"] = _compact(price_baton)
+    df["سعر الوحدة — مدور"] = _compact(price_round)
+    df["مبيعات البسطونة"] = _compact(sales_baton)
+    df["مبيعات المدور"] = _compact(sales_round)
+    df["إجمالي المبيعات"] = _compact(sales_baton + sales_round)
+    df["الإجمالي اليومي للمصروفات (بدون الغاز والإيجار)"] = _compact(daily_core)
+
+    df["month"] = df["dte"].dt.to_period("M")
+    return df
+
+
+def _month_ordinals(months) -> np.ndarray:
+    """مفاتيح الشهور (period[M] أو نص YYYY-MM-01) كأرقام ترتيبية int64."""
+    if isinstance(getattr(months, "dtype", None), pd.PeriodDtype):
+        return months.array.asi8
+    return pd.to_datetime(months).dt.to_period("M").array.asi8
+
+
+def split_monthly_costs(row_month, row_dte, month_keys, gas, rent, days=WORKING_DAYS_PER_MONTH):
+    """نواة التوزيع (مصفوفات داخل/خارج، بدون pandas).
+
+    row_month/row_dte: مفتاح الشهر وتاريخ كل صف (أي نوع مرتب: int64 أو datetime64).
+    month_keys/gas/rent: جدول الشهور (مفاتيح فريدة، القيم الفارغة = 0 مسبقًا).
+    يرجّع (per_day_gas, per_day_rent) كـ int64: gas // days لكل صف، + gas % days
+    لكل صفوف آخر تاريخ مُسجّل في شهرها. شهر بدون قيد → صفر.
+    """
+    row_month = np.asarray(row_month)
+    row_dte = np.asarray(row_dte)
+    n = len(row_month)
+    if n == 0 or len(month_keys) == 0:
+        return np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64)
+
+    # الشهور المميزة في الصفوف + آخر تاريخ لكل منها. الصفوف عادة مرتبة بالتاريخ
+    # → حدود المجموعات خطيًا و reduceat؛ وإلا np.unique + ufunc.at
+    if n == 1 or bool((row_month[1:] >= row_month[:-1]).all()):
+        starts = np.flatnonzero(np.r_[True, row_month[1:] != row_month[:-1]])
+        uniq = row_month[starts]
+        last = np.maximum.reduceat(row_dte, starts)
+        counts = np.diff(np.r_[starts, n])
+        expand = lambda v: np.repeat(v, counts)  # noqa: E731
+    else:
+        uniq, inv = np.unique(row_month, return_inverse=True)
+        last = np.full(len(uniq), row_dte.min(), dtype=row_dte.dtype)
+        np.maximum.at(last, inv, row_dte)
+        expand = lambda v: v[inv]  # noqa: E731
+
+    # قيم كل شهر عبر بحث ثنائي (بدل merge) ثم القسمة على مستوى الشهر لا الصف
+    month_keys = np.asarray(month_keys)
+    order = np.argsort(month_keys, kind="stable")
+    keys = month_keys[order]
+    pos = np.minimum(np.searchsorted(keys, uniq), len(keys) - 1)
+    found = keys[pos] == uniq
+    g = np.where(found, np.asarray(gas, dtype=np.int64)[order][pos], 0)
+    r = np.where(found, np.asarray(rent, dtype=np.int64)[order][pos], 0)
+    per_gas, rem_gas = np.divmod(g, days)
+    per_rent, rem_rent = np.divmod(r, days)
+
+    is_last = row_dte == expand(last)
+    per_gas = expand(per_gas) + np.where(is_last, expand(rem_gas), 0)
+    per_rent = expand(per_rent) + np.where(is_last, expand(rem_rent), 0)
+    return per_gas, per_rent
+
+
+def allocate_months(df: pd.DataFrame, dfm: pd.DataFrame) -> pd.DataFrame:
+    """يحسب التوزيع اليومي للغاز/الإيجار والربح لصفوف df (شهور كاملة) in-place."""
+    if dfm is not None and not dfm.empty:
+        # تقسيم ثابت على 26 يوم + البواقي على آخر يوم مُسجّل في الشهر (split_monthly_costs)
+        per_gas, per_rent = split_monthly_costs(
+            _month_ordinals(df["month"]),
+            df["dte"].to_numpy(),
+            _month_ordinals(dfm["month"]),
+            _ints(dfm, "gas"),
+            _ints(dfm, "rent"),
+        )
+    else:
+        per_gas = np.zeros(len(df), dtype=np.int64)
+        per_rent = np.zeros(len(df), dtype=np.int64)
+
+    allocated = per_gas + per_rent
+    expenses = _ints(df, "الإجمالي اليومي للمصروفات (بدون الغاز والإيجار)") + allocated
+    # الربح الصافي اليومي (شامل توزيع الغاز/الإيجار)
+    profit = _ints(df, "إجمالي المبيعات") - expenses
+
+    df["per_day_gas"] = _compact(per_gas)
+    df["per_day_rent"] = _compact(per_rent)
+    df["تكلفة يومية مُوزعة (غاز + إيجار)"] = _compact(allocated)
+    df["الإجمالي اليومي للمصروفات (شامل الموزع)"] = _compact(expenses)
+    df["الربح الصافي لليوم"] = _compact(profit)
+    return df
+
+
+@profiling.timed
+def enrich(df: pd.DataFrame, dfm: pd.DataFrame) -> pd.DataFrame:
+    if df.empty:
+        return df
+    return allocate_months(derive_rows(df), dfm)
+
+
+@profiling.timed
+def fetch_daily_df() -> pd.DataFrame:
+    """إعادة حساب كاملة من القاعدة (المرجع الذي يطابقه المحرك التزايدي)؛ الشهور
+    المؤرشفة تأتي مشتقة جاهزة من Parquet."""
+    import archive
+
+    return archive.read_enriched()
+
+
+class DerivedMetrics:
+    """نسخة مشتقة من اليومية مرتبطة بإصدار البيانات في db."""
+
+    def __init__(self, path: str = None):
+        self.path = path or db.current_path()
+        self._lock = threading.Lock()
+        self._version = None
+        self._daily = None
+        self._monthly = None
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+
+    def _rebuild(self, version):
+        import archive
+        import shared_cache
+
+        # كل القراءات على self.path لا الفرع الحالي للخيط (engine(path) لفرع آخر)
+        with db.connection(self.path) as conn:
+            # العدّاد قبل monthly: كتابة بينهما تمنع تخزين الإطار تحت عدّاد أحدث من بياناته
+            counter = db.write_counter(self.path)
+            self._monthly = db.fetch_monthly_df(conn=conn)
+        # عملية أخرى بنفس العدّاد بنت الإطار غالبًا: قراءة mmap بدل الحساب
+        self._daily = shared_cache.frame(
+            "daily", lambda: archive.read_enriched(monthly=self._monthly, path=self.path),
+            path=self.path, counter=counter,
+        )
+        self._version = version
+
+    def _apply(self, changes, version):
+        ids = {k for t, k in changes if t == "daily"}
+        months = set()
+        if any(t == "monthly" for t, _ in changes):
+            with db.connection(self.path) as conn:
+                self._monthly = db.fetch_monthly_df(conn=conn)
+            months |= {pd.Period(k, "M") for t, k in changes if t == "monthly"}
+
+        df = self._daily
+        if ids:
+            old = df["id"].isin(ids) if not df.empty else None
+            if old is not None and old.any():
+                months |= set(df.loc[old, "month"])
+                df = df.loc[~old]
+            with db.connection(self.path) as conn:
+                fresh = db.read_daily(ids, conn=conn)
+            if not fresh.empty:
+                fresh = derive_rows(fresh)
+                months |= set(fresh["month"])
+                df = fresh if df.empty else pd.concat([df, fresh], ignore_index=True)
+                df = df.sort_values(["dte", "id"], kind="stable")
+            df = df.reset_index(drop=True)
+        if df.empty:
+            self._daily = df
+            self._version = version
+            return
+
+        touched = df["month"].isin(months)
+        if touched.any():
+            part = allocate_months(df.loc[touched, :].reset_index(drop=True), self._monthly)
+            if df is self._daily:
+                # النسخة القديمة قد تكون بيد جلسة أخرى
+                df = df.copy()
+            mask = touched.to_numpy()
+            for col in MONTH_COLS:
+                # نسخة جديدة (لا تمس إطارًا مشتركًا)؛ العمود غائب لو بدأ الكاش فاضيًا
+                if col in df.columns:
+                    values = df[col].to_numpy(dtype=np.int64, na_value=0, copy=True)  # قد يكون mmap
+                else:
+                    values = np.zeros(len(df), dtype=np.int64)
+                values[mask] = part[col].to_numpy()
+                df[col] = _compact(values)
+        self._daily = df
+        self._version = version
+
+    def daily(self) -> pd.DataFrame:
+        """الإطار المشتق الحالي. مشترك بين الجلسات — لا تعدّله، انسخه أولًا."""
+        with self._lock:
+            version = db.data_version()
+            if self._version == version:
+                return self._daily
+            changes = None if self._version is None else db.changes_since(self._version, self.path)
+            if changes is None:
+                self._rebuild(version)
+            else:
+                self._apply(changes, version)
+            return self._daily
+
+    def monthly(self) -> pd.DataFrame:
+        self.daily()
+        return self._monthly
+
+
+_engines = {}  # مسار القاعدة (الفرع) → DerivedMetrics
+_engines_lock = threading.Lock()
+
+
+def engine(path: str = None) -> DerivedMetrics:
+    """محرك الفرع الحالي (واحد لكل قاعدة في العملية)."""
+    path = path or db.current_path()
+    with _engines_lock:
+        eng = _engines.get(path)
+        if eng is None:
+            eng = _engines[path] = DerivedMetrics(path)
+        return eng
+
+
+def legacy_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """نفس الإطار بالأنواع التي كان يرجعها read_sql_query بدون dtype ثم astype(int):
+    عمود صحيح فيه فراغ → float64، وبدونه → int64، والشهر datetime64 (للمقارنة فقط)."""
+    out = {}
+    for c in df.columns:
+        col = df[c]
+        if isinstance(col.dtype, pd.PeriodDtype):
+            out[c] = col.dt.to_timestamp()
+        elif pd.api.types.is_integer_dtype(col.dtype):
+            out[c] = col.astype("float64") if col.hasnans else col.astype("int64")
+        else:
+            out[c] = col
+    return pd.DataFrame(out)
+
+
+def memory_report(df: pd.DataFrame = None) -> pd.DataFrame:
+    """ذاكرة الإطار المشتق لكل عمود (memory_usage deep) بالأنواع الحالية مقابل legacy_frame."""
+    df = get_daily_df() if df is None else df
+    now = df.memory_usage(index=False, deep=True)
+    before = legacy_frame(df).memory_usage(index=False, deep=True)
+    return pd.DataFrame({
+        "column": now.index,
+        "dtype": [str(df[c].dtype) for c in now.index],
+        "bytes": now.to_numpy(),
+        "legacy_bytes": before.reindex(now.index).to_numpy(),
+    })
+
+
+@profiling.timed
+def get_daily_df() -> pd.DataFrame:
+    return engine().daily()
+
+
+@profiling.timed
+def get_monthly_df() -> pd.DataFrame:
+    return engine().monthly()
@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""قياس زمن التشغيل: فترات (spans) لدوال البيانات وخطوات الرسم، وزمن استعلامات SQL
+وعدد الصفوف المقروءة.
+
+- span(name) / @timed: فترة مسمّاة تُضاف لتشغيل الصفحة الحالي (لو يوجد) ولمجاميع
+  العملية كلها (عدد، إجمالي، أقصى).
+- begin_run / step / end_run: التطبيق يبدأ تشغيلًا في أول السكربت، step("dashboard")
+  تقفل خطوة الرسم السابقة وتفتح التالية (بدون إعادة مسافات كتل الصفحات)، و end_run
+  يرجّع ملخص التشغيل. unit(name) لجزء يعيد التشغيل وحده: تشغيله المنفرد تشغيل مستقل
+  بعنوان unit:<name> (المجاميع باسم العنوان، فتكلفة كل تفاعل تُقارن بالتشغيل الكامل).
+- SQL: الاتصالات تُفتح بـ TimedConnection (db يمررها factory)، فكل execute يُسجَّل
+  بزمنه وعدد الصفوف التي قُرئت منه.
+- التصدير: snapshot() كـ JSON و prometheus() بصيغة Prometheus النصية.
+- BAKERY_CPROFILE=<مجلد>: كل تشغيل يُسجَّل بـ cProfile في ملف .prof داخل المجلد
+  (python -m pstats <ملف> أو snakeviz لقراءته).
+"""
+import cProfile
+import functools
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+CPROFILE_DIR = os.environ.get("BAKERY_CPROFILE", "").strip()
+KEEP_RUNS = 20          # آخر التشغيلات المحفوظة في الذاكرة
+SQL_KEY_CHARS = 120     # طول مفتاح الاستعلام بعد ضغط المسافات
+
+_lock = threading.Lock()
+_local = threading.local()  # التشغيل الحالي لخيط الجلسة
+_spans = {}     # name → [calls, total_s, max_s]
+_sql = {}       # statement → [calls, total_s, max_s, rows]
+_runs = deque(maxlen=KEEP_RUNS)
+
+
+def _add(table, key, secs, rows=None):
+    with _lock:
+        agg = table.get(key)
+        if agg is None:
+            agg = table[key] = [0, 0.0, 0.0] if rows is None else [0, 0.0, 0.0, 0]
+        agg[0] += 1
+        agg[1] += secs
+        agg[2] = max(agg[2], secs)
+        if rows is not None:
+            agg[3] += rows
+
+
+# # ============== الفترات # ==============
+
+def _record(name, secs):
+    _add(_spans, name, secs)
+    run = getattr(_local, "run", None)
+    if run is not None:
+        run["spans"].append((name, secs))
+
+
+@contextmanager
+def span(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - t0)
+
+
+def timed(fn=None, name: str = None):
+    """مزخرف: كل استدعاء للدالة فترة باسم module.function (أو name)."""
+    if fn is None:
+        return lambda f: timed(f, name)
+    label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with span(label):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+# # ============== تشغيل الصفحة # ==============
+
+def begin_run(label: str = "rerun"):
+    """يبدأ تشغيلًا جديدًا لهذا الخيط (تشغيل سابق لم يُقفل يُهمل)."""
+    run = {"label": label, "started": time.time(), "t0": time.perf_counter(), "spans": [],
+           "sql_calls": 0, "sql_s": 0.0, "rows": 0, "step": None, "profiler": None}
+    if CPROFILE_DIR:
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+            run["profiler"] = prof
+        except ValueError:
+            pass  # أداة قياس أخرى تعمل في هذا الخيط
+    _local.run = run
+
+
+def step(name: str):
+    """يقفل خطوة الرسم السابقة ويفتح render:<name>."""
+    run = getattr(_local, "run", None)
+    if run is None:
+        return
+    now = time.perf_counter()
+    if run["step"] is not None:
+        prev, t0 = run["step"]
+        _record(f"render:{prev}", now - t0)
+    run["step"] = (name, now)
+
+
+def end_run():
+    """يقفل التشغيل الحالي ويرجّع ملخصه (أو None لو لا يوجد)."""
+    step(None)
+    run = getattr(_local, "run", None)
+    _local.run = None
+    if run is None:
+        return None
+    total = time.perf_counter() - run["t0"]
+    prof_path = None
+    if run["profiler"] is not None:
+        run["profiler"].disable()
+        os.makedirs(CPROFILE_DIR, exist_ok=True)
+        prof_path = os.path.join(CPROFILE_DIR, f"run-{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09d}.prof")
+        run["profiler"].dump_stats(prof_path)
+    out = {
+        "label": run["label"], "started": run["started"], "total_ms": total * 1000,
+        "spans": [{"name": n, "ms": s * 1000} for n, s in run["spans"]],
+        "sql_calls": run["sql_calls"], "sql_ms": run["sql_s"] * 1000, "rows_read": run["rows"],
+        "cprofile": prof_path,
+    }
+    _add(_spans, run["label"], total)
+    with _lock:
+        _runs.append(out)
+    return out
+
+
+@contextmanager
+def unit(name: str):
+    """جزء يعيد التشغيل وحده (st.fragment). داخل تشغيل كامل: فترة unit:<name>؛ وحده:
+    تشغيل مستقل بعنوان unit:<name> يُملأ ملخصه في القاموس المُرجَع عند الخروج."""
+    out = {}
+    if getattr(_local, "run", None) is not None:
+        with span(f"unit:{name}"):
+            yield out
+        return
+    begin_run(f"unit:{name}")
+    try:
+        yield out
+    finally:
+        out.update(end_run() or {})
+
+
+# # ============== SQL # ==============
+
+def _sql_key(sql: str) -> str:
+    return re.sub(r"\s+", " ", sql).strip()[:SQL_KEY_CHARS]
+
+
+def _record_sql(sql, secs, rows):
+    _add(_sql, _sql_key(sql), secs, rows)
+    run = getattr(_local, "run", None)
+    if run is not None:
+        run["sql_calls"] += 1
+        run["sql_s"] += secs
+        run["rows"] += rows
+
+
+class TimedCursor(sqlite3.Cursor):
+    """يقيس execute (حتى أول صف) و fetch* ويعدّ الصفوف المقروءة لكل استعلام."""
+
+    _sql = None
+    _secs = 0.0
+    _rows = 0
+
+    def _flush(self):
+        if self._sql is not None:
+            _record_sql(self._sql, self._secs, self._rows)
+            self._sql = None
+
+    def execute(self, sql, parameters=()):
+        self._flush()
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._sql, self._secs, self._rows = sql, time.perf_counter() - t0, 0
+
+    def executemany(self, sql, seq_of_parameters):
+        self._flush()
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._sql, self._secs, self._rows = sql, time.perf_counter() - t0, 0
+
+    def _fetched(self, t0, n):
+        self._secs += time.perf_counter() - t0
+        self._rows += n
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(t0, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        t0 = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(t0, len(rows))
+        return rows
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(t0, len(rows))
+        self._flush()
+        return rows
+
+    def __next__(self):
+        t0 = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._flush()
+            raise
+        self._fetched(t0, 1)
+        return row
+
+    def close(self):
+        self._flush()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._flush()
+        except Exception:
+            pass  # إغلاق المفسّر
+
+
+class TimedConnection(sqlite3.Connection):
+    """اتصال كل مؤشراته TimedCursor (بما فيها conn.execute المختصرة)."""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# # ============== التصدير # ==============
+
+def snapshot() -> dict:
+    """كل المجاميع وآخر التشغيلات كقاموس قابل لـ JSON."""
+    with _lock:
+        spans = {k: {"calls": c, "total_ms": t * 1000, "max_ms": m * 1000} for k, (c, t, m) in _spans.items()}
+        sql = {k: {"calls": c, "total_ms": t * 1000, "max_ms": m * 1000, "rows": r}
+               for k, (c, t, m, r) in _sql.items()}
+        runs = list(_runs)
+    return {"spans": spans, "sql": sql, "runs": runs}
+
+
+def to_json() -> str:
+    return json.dumps(snapshot(), ensure_ascii=False, indent=2)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def prometheus() -> str:
+    """المجاميع بصيغة Prometheus النصية (عدّادات + أقصى زمن).
+
+    العدّ يُكتب عددًا صحيحًا والثواني repr(float) من المجاميع الخام (بدون تقريب ‎:.6g
+    الذي كان يحوّل 1234567 إلى 1.23457e+06 فيبدو العدّاد ثابتًا)."""
+    with _lock:
+        spans = sorted((k, list(v)) for k, v in _spans.items())
+        sql = sorted((k, list(v)) for k, v in _sql.items())
+    lines = []
+
+    def family(name, kind, help_, label, items, field, seconds=False):
+        lines.append(f"# HELP {name} {help_}")
+        lines.append(f"# TYPE {name} {kind}")
+        for key, agg in items:
+            value = repr(float(agg[field])) if seconds else str(int(agg[field]))
+            lines.append(f'{name}{{{label}="{_label(key)}"}} {value}')
+
+    # الحقول: 0 عدد، 1 إجمالي الثواني، 2 أقصى زمن، 3 صفوف (SQL)
+    family("bakery_span_calls_total", "counter", "Calls per span.", "span", spans, 0)
+    family("bakery_span_seconds_total", "counter", "Total seconds per span.", "span", spans, 1, True)
+    family("bakery_span_seconds_max", "gauge", "Slowest call per span.", "span", spans, 2, True)
+    family("bakery_sql_calls_total", "counter", "Executions per SQL statement.", "statement", sql, 0)
+    family("bakery_sql_seconds_total", "counter", "Total seconds per SQL statement.", "statement", sql, 1, True)
+    family("bakery_sql_rows_total", "counter", "Rows read per SQL statement.", "statement", sql, 3)
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _sql.clear()
+        _runs.clear()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""بناء استعلامات تجميع اليومية داخل SQL مع فلترة المدى الزمني.
+
+نفس منطق metrics.enrich (تسعير بالقسمة الصحيحة + توزيع الغاز/الإيجار على
+WORKING_DAYS_PER_MONTH مع البواقي على آخر يوم مُسجّل في الشهر) لكن بدون تحميل
+الصفوف إلى pandas. الاستعلام يقرأ جدول daily الساخن فقط، فيستخدمه rollups لإعادة
+حساب الشهور؛ القراءة (تشمل الشهور المؤرشفة) من rollups.summary / daily_series /
+latest_day.
+"""
+from datetime import date, timedelta
+
+from metrics import EXPENSE_COLS, THOUSAND, WORKING_DAYS_PER_MONTH
+
+# المقاييس المتاحة → تعبير التجميع
+METRICS = {
+    "sales": "SUM(sales)",
+    "core_expenses": "SUM(core)",
+    "allocated": "SUM(allocated)",
+    "expenses": "SUM(core + allocated)",
+    "profit": "SUM(sales - core - allocated)",
+    "funding": "SUM(funding)",
+    "rows": "COUNT(*)",
+    "days": "COUNT(DISTINCT dte)",
+}
+_NEEDS_ALLOC = {"allocated", "expenses", "profit"}
+
+
+def _price(col):
+    return f"(CASE WHEN IFNULL({col}, 0) > 0 THEN {THOUSAND} / {col} ELSE 0 END)"
+
+
+_SALES_SQL = (
+    f"IFNULL(units_baton, 0) * {_price('u1000_baton')} + "
+    f"IFNULL(units_round, 0) * {_price('u1000_round')}"
+)
+_CORE_SQL = " + ".join(
+    ["IFNULL(flour_bags, 0) * IFNULL(flour_bag_price, 0)", "IFNULL(flour_extra, 0)"]
+    + [f"IFNULL({c}, 0)" for c in EXPENSE_COLS]
+)
+
+
+def iso_day(d):
+    """YYYY-MM-DD من date/Timestamp/نص (None يبقى None)."""
+    if d is None:
+        return None
+    return d.isoformat()[:10] if hasattr(d, "isoformat") else str(d)[:10]
+
+
+def next_month(d: date) -> date:
+    return date(d.year + (d.month == 12), d.month % 12 + 1, 1)
+
+
+def end_exclusive(end):
+    """نهاية مدى شاملة → أول يوم بعدها (للمقارنة بـ <)."""
+    if end is None:
+        return None
+    return iso_day(date.fromisoformat(iso_day(end)) + timedelta(days=1))
+
+
+def range_where(col, start, end, params):
+    """WHERE col >= start AND col < end (end حصري) مع إضافة القيم إلى params."""
+    conds = []
+    if start is not None:
+        conds.append(f"{col} >= ?")
+        params.append(start)
+    if end is not None:
+        conds.append(f"{col} < ?")
+        params.append(end)
+    return (" WHERE " + " AND ".join(conds)) if conds else ""
+
+
+def build_query(start, end, metrics, by_day):
+    """SQL + params لمقاييس المدى؛ by_day=True يجمّع لكل تاريخ."""
+    unknown = set(metrics) - set(METRICS)
+    if unknown:
+        raise ValueError(f"مقاييس غير معروفة: {sorted(unknown)}")
+    start = iso_day(start)
+    params = []
+    rows_where = range_where("dte", start, end_exclusive(end), params)
+    sql = (
+        "WITH r AS (SELECT id, dte, substr(dte, 1, 7) || '-01' AS month, "
+        f"{_SALES_SQL} AS sales, {_CORE_SQL} AS core, IFNULL(funding, 0) AS funding "
+        f"FROM daily{rows_where})"
+    )
+    if _NEEDS_ALLOC & set(metrics):
+        # آخر يوم مُسجّل في كل شهر يُحسب على الشهر كاملًا حتى لو المدى جزئي
+        m_start = iso_day(date.fromisoformat(start).replace(day=1)) if start else None
+        m_end = iso_day(next_month(date.fromisoformat(iso_day(end)))) if end is not None else None
+        last_where = range_where("dte", m_start, m_end, params)
+        w = WORKING_DAYS_PER_MONTH
+        sql += (
+            ", l AS (SELECT substr(dte, 1, 7) || '-01' AS month, MAX(dte) AS last_dte "
+            f"FROM daily{last_where} GROUP BY 1), "
+            "a AS (SELECT r.*, "
+            f"IFNULL(m.gas, 0) / {w} + IFNULL(m.rent, 0) / {w} + "
+            f"CASE WHEN r.dte = l.last_dte THEN IFNULL(m.gas, 0) % {w} + IFNULL(m.rent, 0) % {w} ELSE 0 END "
+            "AS allocated FROM r LEFT JOIN monthly m ON m.month = r.month "
+            "LEFT JOIN l ON l.month = r.month)"
+        )
+        src = "a"
+    else:
+        src = "r"
+    cols = ", ".join(f"IFNULL({METRICS[k]}, 0) AS {k}" for k in metrics)
+    if by_day:
+        sql += f" SELECT dte, {cols} FROM {src} GROUP BY dte ORDER BY dte"
+    else:
+        sql += f" SELECT {cols} FROM {src}"
+    return sql, params
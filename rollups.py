@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""ملخصات يومية/شهرية محفوظة (daily_rollup / monthly_rollup) تُحدَّث مع كل كتابة.
+
+أي كتابة تعيد حساب شهرها كاملًا داخل نفس المعاملة، لأن تغيير الغاز/الإيجار أو
+آخر يوم مُسجّل في الشهر يغيّر توزيع كل أيامه. القراءة بعدها O(أيام) أو O(شهور).
+
+الاستخدام من سطر الأوامر:
+    python rollups.py --verify     # مقارنة مع إعادة حساب كاملة عبر pandas
+    python rollups.py --rebuild    # إعادة بناء الجداول من اليومية
+"""
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import pandas as pd
+
+import db
+import profiling
+import reports
+
+# الأعمدة المخزنة لكل يوم (بنفس أسماء مقاييس reports)
+ROLLUP_METRICS = ("rows", "sales", "core_expenses", "allocated", "expenses", "profit", "funding")
+
+
+def create_tables(conn):
+    cols = ", ".join(f"{k} INTEGER NOT NULL DEFAULT 0" for k in ROLLUP_METRICS)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS daily_rollup (dte TEXT PRIMARY KEY, month TEXT NOT NULL, {cols})")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_daily_rollup_month ON daily_rollup(month)")
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS monthly_rollup (month TEXT PRIMARY KEY, days INTEGER NOT NULL DEFAULT 0, {cols})"
+    )
+
+
+def month_key(dte) -> str:
+    """YYYY-MM-01 لأي تاريخ (نص ISO أو date/Timestamp)."""
+    return reports.iso_day(dte)[:7] + "-01"
+
+
+def _month_end(key: str) -> date:
+    return reports.next_month(date.fromisoformat(key)) - timedelta(days=1)
+
+
+def _store_days(conn, rows):
+    names = ", ".join(ROLLUP_METRICS)
+    qmarks = ",".join(["?"] * (len(ROLLUP_METRICS) + 2))
+    conn.executemany(
+        f"INSERT INTO daily_rollup (dte, month, {names}) VALUES ({qmarks})",
+        [(r[0][:10], month_key(r[0]), *r[1:]) for r in rows],
+    )
+
+
+def _sum_months(conn, where="", params=()):
+    sums = ", ".join(f"SUM({k})" for k in ROLLUP_METRICS)
+    conn.execute(
+        f"INSERT INTO monthly_rollup (month, days, {', '.join(ROLLUP_METRICS)}) "
+        f"SELECT month, COUNT(*), {sums} FROM daily_rollup{where} GROUP BY month",
+        params,
+    )
+
+
+def refresh_months(conn, months):
+    """يعيد حساب أيام الشهور المعطاة (مفاتيح YYYY-MM-01) داخل معاملة conn."""
+    keys = sorted(set(months))
+    if not keys:
+        return
+    # استعلام واحد يغطي المدى كله ثم نحتفظ بأيام الشهور المطلوبة فقط
+    sql, params = reports.build_query(keys[0], _month_end(keys[-1]), ROLLUP_METRICS, by_day=True)
+    wanted = set(keys)
+    rows = [r for r in conn.execute(sql, params).fetchall() if month_key(r[0]) in wanted]
+    qmarks = ",".join(["?"] * len(keys))
+    conn.execute(f"DELETE FROM daily_rollup WHERE month IN ({qmarks})", keys)
+    conn.execute(f"DELETE FROM monthly_rollup WHERE month IN ({qmarks})", keys)
+    _store_days(conn, rows)
+    _sum_months(conn, f" WHERE month IN ({qmarks})", keys)
+
+
+def _frozen_months(conn) -> list:
+    """الشهور المؤرشفة (صفوفها ليست في daily فتبقى ملخصاتها كما هي)."""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='archive_months'").fetchone():
+        return []
+    return [r[0] for r in conn.execute("SELECT month FROM archive_months")]
+
+
+def rebuild(conn):
+    """إعادة بناء كاملة بمرور واحد على اليومية (عدا الشهور المؤرشفة)."""
+    sql, params = reports.build_query(None, None, ROLLUP_METRICS, by_day=True)
+    rows = conn.execute(sql, params).fetchall()
+    frozen = _frozen_months(conn)
+    where, params = "", []
+    if frozen:
+        where, params = f" WHERE month NOT IN ({','.join('?' * len(frozen))})", frozen
+    conn.execute(f"DELETE FROM daily_rollup{where}", params)
+    conn.execute(f"DELETE FROM monthly_rollup{where}", params)
+    _store_days(conn, rows)
+    _sum_months(conn, where, params)
+
+
+# # ============== القراءة # ==============
+
+@profiling.timed
+def summary(start=None, end=None, metrics=("sales", "expenses", "profit")) -> dict:
+    """مجاميع المقاييس بين start و end (شاملين، None = بلا حد) من الملخصات، فتشمل
+    الشهور المؤرشفة."""
+    metrics = list(metrics)
+    cols = ", ".join(f"IFNULL(SUM({k}), 0)" for k in metrics)
+    with db.connection() as conn:
+        if start is None and end is None:
+            row = conn.execute(f"SELECT {cols} FROM monthly_rollup").fetchone()
+        else:
+            params = []
+            where = reports.range_where("dte", reports.iso_day(start), reports.end_exclusive(end), params)
+            row = conn.execute(f"SELECT {cols} FROM daily_rollup{where}", params).fetchone()
+    return {k: int(v) for k, v in zip(metrics, row)}
+
+
+@profiling.timed
+def daily_series(start=None, end=None, metrics=("profit",)) -> pd.DataFrame:
+    metrics = list(metrics)
+    params = []
+    where = reports.range_where("dte", reports.iso_day(start), reports.end_exclusive(end), params)
+    with db.connection() as conn:
+        return pd.read_sql_query(
+            f"SELECT dte, {', '.join(metrics)} FROM daily_rollup{where} ORDER BY dte",
+            conn, params=params, parse_dates=["dte"],
+        )
+
+
+@profiling.timed
+def monthly_totals(start=None, end=None, metrics=("sales", "expenses", "profit", "funding")) -> pd.DataFrame:
+    """صف لكل شهر (month, days, المقاييس) للشهور التي تتقاطع مع المدى."""
+    metrics = list(metrics)
+    params = []
+    where = reports.range_where(
+        "month", month_key(start) if start is not None else None, reports.end_exclusive(end), params
+    )
+    with db.connection() as conn:
+        return pd.read_sql_query(
+            f"SELECT month, days, {', '.join(metrics)} FROM monthly_rollup{where} ORDER BY month",
+            conn, params=params,
+        )
+
+
+@profiling.timed
+def latest_day():
+    with db.connection() as conn:
+        row = conn.execute("SELECT MAX(dte) FROM daily_rollup").fetchone()
+    return date.fromisoformat(row[0]) if row and row[0] else None
+
+
+# # ============== عبر الفروع # ==============
+BRANCH_WORKERS = 4
+
+
+def _branch_summary(name, start, end, metrics):
+    with db.use_branch(name):
+        db.init_db()
+        return summary(start, end, metrics)
+
+
+@profiling.timed
+def summary_by_branch(names=None, start=None, end=None, metrics=("sales", "expenses", "profit")) -> dict:
+    """{فرع: ملخص} محسوب بالتوازي (خيط لكل فرع؛ sqlite3 يحرر الـ GIL أثناء الاستعلام)."""
+    names = list(names or db.branches())
+    with ThreadPoolExecutor(max_workers=max(1, min(BRANCH_WORKERS, len(names)))) as ex:
+        results = list(ex.map(lambda n: _branch_summary(n, start, end, metrics), names))
+    return dict(zip(names, results))
+
+
+def combine(per_branch: dict) -> dict:
+    """مجموع ملخصات الفروع (كل المقاييس قابلة للجمع)."""
+    total = {}
+    for res in per_branch.values():
+        for k, v in res.items():
+            total[k] = total.get(k, 0) + v
+    return total
+
+
+@profiling.timed
+def daily_series_all(names=None, start=None, end=None, metrics=("profit",)) -> pd.DataFrame:
+    """السلسلة اليومية لكل الفروع مجمّعة في SQL واحد عبر ATTACH (دفعات بحد ATTACH_LIMIT)."""
+    names = list(names or db.branches())
+    metrics = list(metrics)
+    p = []
+    where = reports.range_where("dte", reports.iso_day(start), reports.end_exclusive(end), p)
+    parts = []
+    for i in range(0, len(names), db.ATTACH_LIMIT):
+        with db.attached(names[i:i + db.ATTACH_LIMIT]) as (conn, aliases):
+            union = " UNION ALL ".join(
+                f"SELECT dte, {', '.join(metrics)} FROM {a}.daily_rollup{where}" for a in aliases
+            )
+            sums = ", ".join(f"SUM({k}) AS {k}" for k in metrics)
+            parts.append(pd.read_sql_query(
+                f"SELECT dte, {sums} FROM ({union}) GROUP BY dte ORDER BY dte",
+                conn, params=p * len(aliases), parse_dates=["dte"],
+            ))
+    if len(parts) == 1:
+        return parts[0]
+    return pd.concat(parts).groupby("dte", as_index=False).sum()
+
+
+# # ============== التحقق # ==============
+
+def verify() -> list:
+    """يقارن الملخصات بإعادة حساب كاملة (metrics.fetch_daily_df). يرجّع قائمة الفروقات."""
+    from metrics import fetch_daily_df
+
+    df = fetch_daily_df()
+    if df.empty:
+        expected = pd.DataFrame(columns=["dte", *ROLLUP_METRICS])
+    else:
+        g = pd.DataFrame({
+            "dte": df["dte"].dt.strftime("%Y-%m-%d"),
+            "rows": 1,
+            "sales": df["إجمالي المبيعات"],
+            "core_expenses": df["الإجمالي اليومي للمصروفات (بدون الغاز والإيجار)"],
+            "allocated": df["تكلفة يومية مُوزعة (غاز + إيجار)"],
+            "expenses": df["الإجمالي اليومي للمصروفات (شامل الموزع)"],
+            "profit": df["الربح الصافي لليوم"],
+            "funding": df["funding"].fillna(0).astype(int),
+        })
+        expected = g.groupby("dte", as_index=False).sum()
+    with db.connection() as conn:
+        actual = pd.read_sql_query(f"SELECT dte, {', '.join(ROLLUP_METRICS)} FROM daily_rollup", conn)
+        monthly = pd.read_sql_query(f"SELECT month, {', '.join(ROLLUP_METRICS)} FROM monthly_rollup", conn)
+
+    problems = []
+    both = expected.merge(actual, on="dte", how="outer", suffixes=("_exp", "_got"), indicator=True)
+    for _, r in both.iterrows():
+        if r["_merge"] != "both":
+            problems.append(f"{r['dte']}: موجود في {'الحساب الكامل' if r['_merge'] == 'left_only' else 'الملخص'} فقط")
+            continue
+        for k in ROLLUP_METRICS:
+            if int(r[f"{k}_exp"]) != int(r[f"{k}_got"]):
+                problems.append(f"{r['dte']} {k}: متوقع {int(r[f'{k}_exp'])} / مخزن {int(r[f'{k}_got'])}")
+    actual["month"] = actual["dte"].str[:7] + "-01"
+    by_month = actual.groupby("month", as_index=False)[list(ROLLUP_METRICS)].sum()
+    mm = by_month.merge(monthly, on="month", how="outer", suffixes=("_exp", "_got")).fillna(0)
+    for _, r in mm.iterrows():
+        for k in ROLLUP_METRICS:
+            if int(r[f"{k}_exp"]) != int(r[f"{k}_got"]):
+                problems.append(f"شهر {r['month']} {k}: مجموع الأيام {int(r[f'{k}_exp'])} / مخزن {int(r[f'{k}_got'])}")
+    return problems
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="صيانة ملخصات المخبز")
+    ap.add_argument("--rebuild", action="store_true", help="إعادة بناء الملخصات من اليومية")
+    ap.add_argument("--verify", action="store_true", help="مقارنة الملخصات بإعادة حساب كاملة")
+    ap.add_argument("--branch", default=None, help="الفرع (الافتراضي: الرئيسي)")
+    args = ap.parse_args(argv)
+    db.set_branch(args.branch)
+    db.init_db()
+    if args.rebuild:
+        with db.connection() as conn:
+            rebuild(conn)
+        print("تمت إعادة البناء.")
+    if args.verify or not args.rebuild:
+        problems = verify()
+        for p in problems:
+            print(p)
+        print("مطابق ✅" if not problems else f"{len(problems)} فرق ❌")
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
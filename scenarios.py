@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""سيناريوهات "ماذا لو": الربح على التاريخ الفعلي بتسعير وسعر دقيق مختلفين.
+
+الربح يتفكك إلى أجزاء مستقلة عن بعضها:
+    الربح = مبيعات البسطونة(Δ) + مبيعات المدور(Δ) − الدقيق(٪) − ثابت
+الثابت (بقية المصاريف + توزيع الغاز/الإيجار) لا يتغير بالسيناريو، فالتوزيع نفسه
+(26 يوم + البواقي على آخر يوم مُسجّل) يأتي من الإطار المشتق كما هو.
+
+كل جزء يُحسب مرة لكل محور: الصفوف تُجمع حسب القيمة الفعلية (u1000 أو تكلفة الدقيق
+لليوم) ثم تُبث مصفوفة (قيم مميزة × نقاط المحور) بنفس القسمة الصحيحة
+THOUSAND // u1000، والشبكة كلها (آلاف التركيبات) جمع خارجي للأجزاء.
+
+- Δ الوحدات لكل 1000 يُضاف لقيمة كل يوم (0 = الفعلي)؛ أقل من 1 يصبح 1، واليوم
+  بدون تسعير (0/فارغ) يبقى بدون مبيعات كما في الحساب الأصلي.
+- ٪ سعر الدقيق: تكلفة دقيق اليوم × (100 + ٪) // 100 (بدون كسور).
+- النتائج محفوظة لكل إصدار بيانات (مثل charts) وتُمسح عند أي كتابة.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import db
+import profiling
+from metrics import THOUSAND, get_daily_df
+
+KEEP_SURFACES = 32  # أسطح محفوظة لكل إصدار بيانات
+
+_lock = threading.Lock()
+_bases = {}                   # (قاعدة الفرع، start, end) → الأجزاء المجمّعة
+_surfaces = OrderedDict()     # (قاعدة الفرع، start, end، المحاور) → ناتج
+_cache_version = None
+
+
+def _grouped(keys: np.ndarray, weights: np.ndarray):
+    """(قيم مميزة، مجموع الأوزان لكل قيمة)."""
+    uniq, inv = np.unique(keys, return_inverse=True)
+    sums = np.zeros(len(uniq), dtype=np.int64)
+    np.add.at(sums, inv, weights)
+    return uniq, sums
+
+
+def _base(start, end) -> dict:
+    """الأجزاء المجمّعة للمدى من الإطار المشتق (محفوظ لكل إصدار بيانات)."""
+    key = (db.current_path(), start, end)
+    base = _bases.get(key)
+    if base is not None:
+        return base
+    df = get_daily_df()
+    if start is not None:
+        df = df[df["dte"] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df["dte"] <= pd.Timestamp(end)]
+
+    def col(name):
+        return df[name].to_numpy(dtype=np.int64, na_value=0)
+
+    flour = col("flour_bags") * col("flour_bag_price")
+    fixed = col("الإجمالي اليومي للمصروفات (شامل الموزع)") - flour
+    base = {
+        "baton": _grouped(col("u1000_baton"), col("units_baton")),
+        "round": _grouped(col("u1000_round"), col("units_round")),
+        "flour": _grouped(flour, np.ones(len(df), dtype=np.int64)),
+        "fixed": int(fixed.sum()),
+    }
+    _bases[key] = base
+    return base
+
+
+def _sales(part, deltas: np.ndarray) -> np.ndarray:
+    """مجموع المبيعات لكل Δ: Σ الوحدات × (THOUSAND // max(u + Δ, 1)) للأيام المسعّرة."""
+    u1000, units = part
+    priced = u1000 > 0
+    u1000, units = u1000[priced], units[priced]
+    shifted = np.maximum(u1000[:, None] + deltas[None, :], 1)
+    return (units[:, None] * (THOUSAND // shifted)).sum(axis=0)
+
+
+def _flour(part, pcts: np.ndarray) -> np.ndarray:
+    """مجموع تكلفة الدقيق لكل ٪: Σ عدد الأيام × (تكلفة اليوم × (100 + ٪) // 100)."""
+    cost, days = part
+    return (days[:, None] * (cost[:, None] * (100 + pcts[None, :]) // 100)).sum(axis=0)
+
+
+def _axis(values, name) -> np.ndarray:
+    arr = np.asarray(list(values), dtype=np.int64)
+    if arr.ndim != 1 or not len(arr):
+        raise ValueError(f"محور {name} فارغ")
+    return arr
+
+
+def _cached(key, compute):
+    global _cache_version
+    with _lock:
+        version = db.data_version()
+        if _cache_version != version:
+            _bases.clear()
+            _surfaces.clear()
+            _cache_version = version
+        key = (db.current_path(), *key)
+        if key in _surfaces:
+            _surfaces.move_to_end(key)
+            return _surfaces[key]
+        out = _surfaces[key] = compute()
+        while len(_surfaces) > KEEP_SURFACES:
+            _surfaces.popitem(last=False)
+        return out
+
+
+@profiling.timed
+def profit_grid(baton_deltas=(0,), round_deltas=(0,), flour_pcts=(0,), start=None, end=None) -> np.ndarray:
+    """الربح الكلي للمدى لكل تركيبة: مصفوفة int64 بالشكل (Δ بسطونة، Δ مدور، ٪ دقيق).
+
+    النقطة (0, 0, 0) تساوي الربح الفعلي للمدى (rollups.summary).
+    """
+    b = _axis(baton_deltas, "البسطونة")
+    r = _axis(round_deltas, "المدور")
+    f = _axis(flour_pcts, "الدقيق")
+    if (f < -100).any():
+        raise ValueError("نسبة سعر الدقيق لا تقل عن -100٪")
+
+    def compute():
+        base = _base(start, end)
+        grid = (_sales(base["baton"], b)[:, None, None] + _sales(base["round"], r)[None, :, None]
+                - _flour(base["flour"], f)[None, None, :] - base["fixed"])
+        grid.setflags(write=False)  # مشترك بين الجلسات
+        return grid
+
+    return _cached(("grid", start, end, b.tobytes(), r.tobytes(), f.tobytes()), compute)
+
+
+@profiling.timed
+def profit_surface(deltas=range(-5, 6), flour_pcts=range(-20, 25, 5), start=None, end=None) -> pd.DataFrame:
+    """سطح الربح للوحة: صفوف = ٪ سعر الدقيق، أعمدة = Δ الوحدات لكل 1000 (للنوعين معًا)."""
+    d = _axis(deltas, "الوحدات لكل 1000")
+    f = _axis(flour_pcts, "الدقيق")
+    if (f < -100).any():
+        raise ValueError("نسبة سعر الدقيق لا تقل عن -100٪")
+
+    def compute():
+        base = _base(start, end)
+        sales = _sales(base["baton"], d) + _sales(base["round"], d)
+        values = sales[None, :] - _flour(base["flour"], f)[:, None] - base["fixed"]
+        return pd.DataFrame(values, index=pd.Index(f, name="flour_pct"), columns=pd.Index(d, name="delta"))
+
+    return _cached(("surface", start, end, d.tobytes(), f.tobytes()), compute)
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""كاش مشترك بين عمليات الخادم: إطارات مشتقة محفوظة كملفات Arrow IPC بجانب القواعد.
+
+عدة عمليات Streamlit على نفس DB_DIR تبني نفس الإطار المشتق ونفس سلاسل اللوحة. أول
+عملية تبني النتيجة تكتبها في <مجلد القاعدة>/.bakery_cache/<ملف القاعدة>/<الاسم>.<عدّاد>.arrow
+(مجلد لكل فرع: لا تتداخل أسماء الفروع والإطارات)، والبقية تقرأها بـ memory map (الأعمدة
+الرقمية بدون نسخ، للقراءة فقط).
+
+- المفتاح هو db.write_counter: كل كتابة من أي عملية تزيده، فالملف القديم لا يُقرأ
+  بعدها أبدًا (ويُحذف عند تخزين الأحدث أو بالإزاحة). العدّاد يُقرأ قبل أي قراءة يعتمد
+  عليها البناء (أو يُمرَّر counter مقروءًا مسبقًا).
+- لا نخزن لو تغيّر العدّاد أثناء البناء (النتيجة قد تخلط قبل/بعد الكتابة).
+- الحجم الكلي محدود بـ BAKERY_CACHE_MB (الافتراضي 256)؛ الأقدم استخدامًا يُحذف أولًا.
+- قاعدة الذاكرة (:memory:) لا تُشارك، فالبناء يتم مباشرة.
+"""
+import os
+import threading
+import uuid
+
+import pyarrow as pa
+
+import db
+import profiling
+
+CACHE_DIR = ".bakery_cache"
+SUFFIX = ".arrow"
+MAX_BYTES = int(float(os.environ.get("BAKERY_CACHE_MB", "256")) * 1024 * 1024)
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+
+def cache_dir(path: str = None) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(path or db.current_path())), CACHE_DIR)
+
+
+def _branch_dir(path: str) -> str:
+    return os.path.join(cache_dir(path), os.path.basename(path))
+
+
+def _version_of(entry: str, name: str):
+    """عدّاد الملف لو كان entry نسخة من name بالضبط (<name>.<رقم>.arrow)، وإلا None."""
+    if not (entry.startswith(name + ".") and entry.endswith(SUFFIX)):
+        return None
+    n = entry[len(name) + 1:-len(SUFFIX)]
+    return int(n) if n.isdigit() else None
+
+
+def _files(folder: str):
+    """ملفات الكاش في كل مجلدات الفروع تحت folder (ومباشرة فيه: التخطيط القديم،
+    حتى تشملها الإزاحة والمسح)."""
+    if not os.path.isdir(folder):
+        return
+    for sub in os.scandir(folder):
+        if sub.is_dir():
+            yield from (e for e in os.scandir(sub.path) if e.name.endswith(SUFFIX))
+        elif sub.name.endswith(SUFFIX):
+            yield sub
+
+
+def _count(key: str, n: int = 1):
+    with _lock:
+        _stats[key] += n
+
+
+def _read(file: str):
+    with pa.memory_map(file, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    # split_blocks: عمود لكل block فيبقى العمود الرقمي view على الملف بدل نسخة مجمّعة
+    return table.to_pandas(split_blocks=True)
+
+
+def _write(file: str, df):
+    tmp = f"{file}.{uuid.uuid4().hex}.tmp"
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    try:
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, file)  # القارئ يرى الملف كاملًا أو لا يراه
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _drop_older(folder: str, name: str, keep: str):
+    for entry in os.listdir(folder):
+        if entry != keep and _version_of(entry, name) is not None:
+            try:
+                os.remove(os.path.join(folder, entry))
+            except OSError:
+                pass
+
+
+def _evict(folder: str, limit: int = None):
+    """يحذف الأقدم استخدامًا (mtime) حتى يصبح الحجم ≤ limit."""
+    limit = MAX_BYTES if limit is None else limit
+    files = []
+    for entry in _files(folder):
+        try:
+            st = entry.stat()
+        except OSError:
+            continue
+        files.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+    for _, size, file in sorted(files):
+        if total <= limit:
+            break
+        try:
+            os.remove(file)  # عملية تقرأه الآن تحتفظ بالـ mmap حتى تنتهي
+        except OSError:
+            continue
+        total -= size
+        _count("evictions")
+
+
+@profiling.timed
+def frame(name: str, build, path: str = None, counter: int = None):
+    """الإطار المحفوظ لـ name عند العدّاد الحالي، أو build() ثم تخزينه للعمليات الأخرى.
+
+    counter: العدّاد مقروءًا قبل قراءات سبقت build (مثل monthly الممرَّر له)، حتى لا
+    يُخزَّن ناتج بيانات أقدم تحت عدّاد أحدث.
+    الناتج مشترك (وأعمدته قد تكون للقراءة فقط) — لا تعدّله، انسخه أولًا.
+    """
+    path = path or db.current_path()
+    if path == ":memory:":
+        return build()
+    n = db.write_counter(path) if counter is None else counter
+    folder = _branch_dir(path)
+    entry = f"{name}.{n}{SUFFIX}"
+    file = os.path.join(folder, entry)
+    try:
+        df = _read(file)
+        os.utime(file)  # آخر استخدام (ترتيب الإزاحة)
+        _count("hits")
+        return df
+    except (OSError, pa.ArrowInvalid):
+        pass
+    _count("misses")
+    df = build()
+    if db.write_counter(path) != n:
+        return df
+    try:
+        os.makedirs(folder, exist_ok=True)
+        _write(file, df)
+        _count("stores")
+        _drop_older(folder, name, entry)
+        _evict(cache_dir(path))
+    except (OSError, pa.ArrowException):
+        pass  # الكاش اختياري: القرص ممتلئ/للقراءة فقط لا يوقف الصفحة
+    return df
+
+
+def clear(path: str = None) -> int:
+    """يحذف كل ملفات الكاش (كل الفروع) في مجلد القاعدة. يرجّع عدد الملفات."""
+    removed = 0
+    for entry in list(_files(cache_dir(path))):
+        os.remove(entry.path)
+        removed += 1
+    return removed
+
+
+def stats(path: str = None) -> dict:
+    """عدّادات هذه العملية + حجم الملفات الحالي على القرص."""
+    files = size = 0
+    for entry in _files(cache_dir(path)):
+        files += 1
+        size += entry.stat().st_size
+    with _lock:
+        return {**_stats, "files": files, "bytes": size, "limit_bytes": MAX_BYTES}
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""إعداد الاختبارات: قاعدة مؤقتة (DB_DIR) قبل استيراد db، وجذر المشروع في sys.path."""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["DB_DIR"] = tempfile.mkdtemp(prefix="bakery_tests_")
+os.environ.pop("BAKERY_BRANCH", None)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""محاكاة محلية لواجهة gspread (الدوال التي يستخدمها sheets_sync فقط)."""
+
+
+def _parse_a1(rng: str):
+    a, b = rng.split(":")
+
+    def split(ref):
+        letters = "".join(ch for ch in ref if ch.isalpha())
+        col = 0
+        for ch in letters:
+            col = col * 26 + ord(ch) - 64
+        return int(ref[len(letters):]), col
+
+    return split(a), split(b)
+
+
+class FakeWorksheet:
+    """ورقة في الذاكرة بنفس توقيعات gspread.Worksheet المستخدمة هنا."""
+
+    def __init__(self, title, rows=1000, cols=26):
+        self.title = title
+        self.row_count = rows
+        self.col_count = cols
+        self.cells = []  # قائمة صفوف
+        self.calls = []  # سجل النداءات (للاختبار)
+        self.fail_next = []  # استثناءات تُرمى في النداءات التالية
+
+    def _call(self, name):
+        self.calls.append(name)
+        if self.fail_next:
+            raise self.fail_next.pop(0)
+
+    def _put(self, rng, values):
+        (r0, c0), _ = _parse_a1(rng)
+        for i, row in enumerate(values):
+            r = r0 - 1 + i
+            while len(self.cells) <= r:
+                self.cells.append([])
+            line = self.cells[r]
+            while len(line) < c0 - 1 + len(row):
+                line.append("")
+            line[c0 - 1:c0 - 1 + len(row)] = list(row)
+
+    def get_all_values(self):
+        last = len(self.cells)
+        while last and not any(v != "" for v in self.cells[last - 1]):
+            last -= 1
+        return [list(r) for r in self.cells[:last]]
+
+    def update(self, values=None, range_name=None, value_input_option=None):
+        self._call("update")
+        self._put(range_name, values)
+
+    def batch_update(self, data, value_input_option=None):
+        self._call("batch_update")
+        for item in data:
+            self._put(item["range"], item["values"])
+
+    def append_rows(self, values, value_input_option=None):
+        self._call("append_rows")
+        self.cells = self.get_all_values() + [list(v) for v in values]
+        self.row_count = max(self.row_count, len(self.cells))
+
+    def delete_rows(self, start_index, end_index=None):
+        self._call("delete_rows")
+        end_index = end_index or start_index
+        del self.cells[start_index - 1:end_index]
+        self.row_count -= end_index - start_index + 1
+
+    def resize(self, rows=None, cols=None):
+        self._call("resize")
+        if rows is not None:
+            self.row_count = rows
+            del self.cells[rows:]
+        if cols is not None:
+            self.col_count = cols
+            self.cells = [r[:cols] for r in self.cells]
+
+    def clear(self):
+        self._call("clear")
+        self.cells = []
+
+
+class FakeSpreadsheet:
+    def __init__(self):
+        self._sheets = []
+
+    def worksheets(self):
+        return list(self._sheets)
+
+    def add_worksheet(self, title, rows, cols):
+        ws = FakeWorksheet(title, rows, cols)
+        self._sheets.append(ws)
+        return ws
+
+    def worksheet(self, title):
+        for ws in self._sheets:
+            if ws.title == title:
+                return ws
+        raise KeyError(title)
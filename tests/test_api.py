@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""خادم api: الأخطاء قبل وبعد إرسال العناوين."""
+import http.client
+import json
+import socket
+import threading
+
+import pandas as pd
+import pytest
+
+import api
+import db
+
+
+@pytest.fixture
+def server():
+    db.init_db()
+    srv = api.serve(port=0)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def _get(srv, path):
+    conn = http.client.HTTPConnection("127.0.0.1", srv.server_port, timeout=10)
+    conn.request("GET", path)
+    return conn.getresponse()
+
+
+def test_unknown_report_is_404(server):
+    resp = _get(server, "/nope")
+    assert resp.status == 404 and "nope" in json.loads(resp.read())["error"]
+
+
+def test_unexpected_error_before_headers_is_500(server, monkeypatch):
+    def boom(params):
+        raise RuntimeError("x")
+
+    monkeypatch.setitem(api.REPORTS, "today", boom)
+    monkeypatch.setattr(api.Handler, "log_error", lambda self, *a: None)
+    resp = _get(server, "/today")
+    assert resp.status == 500 and json.loads(resp.read()) == {"error": "خطأ داخلي"}
+
+
+def test_error_mid_stream_truncates_instead_of_ending_the_body(server, monkeypatch):
+    def frames(params):
+        yield pd.DataFrame({"dte": ["2025-01-01"], "sales": [1]})
+        raise ValueError("الشهر الثاني")
+
+    monkeypatch.setattr(api, "iter_daily", frames)
+    monkeypatch.setattr(api.Handler, "log_error", lambda self, *a: None)
+    with socket.create_connection(("127.0.0.1", server.server_port), timeout=10) as sock:
+        sock.sendall(b"GET /daily HTTP/1.1\r\nHost: x\r\n\r\n")
+        raw = b""
+        while chunk := sock.recv(65536):  # الخادم يغلق الاتصال
+            raw += chunk
+    head, _, rest = raw.partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 200") and b"chunked" in head
+    assert b"2025-01-01" in rest
+    assert b"HTTP/1.1" not in rest  # لا رد خطأ ثانٍ داخل التدفق
+    assert not rest.endswith(b"0\r\n\r\n")  # بدون الكتلة الأخيرة: الرد ناقص
+
+
+def test_etag_follows_writes_from_other_processes(server):
+    import sqlite3
+
+    path = db.current_path()
+    first = _get(server, "/today")
+    tag = first.getheader("ETag")
+    first.read()
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=10)
+    conn.request("GET", "/today", headers={"If-None-Match": tag})
+    assert conn.getresponse().status == 304
+    # كتابة من عملية أخرى (اتصال مستقل): العدّاد يتغير حتى لو بقي stat الملفات كما هو
+    with sqlite3.connect(path) as other:
+        other.execute("UPDATE write_counter SET n = n + 1 WHERE id = 1")
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=10)
+    conn.request("GET", "/today", headers={"If-None-Match": tag})
+    resp = conn.getresponse()
+    assert resp.status == 200 and resp.getheader("ETag") != tag
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""الكتابة بالـ id والتصفح على شهور مؤرشفة."""
+import pytest
+
+import archive
+import db
+
+DAYS = ["2024-01-01", "2024-01-02", "2024-01-03", "2024-02-01", "2024-02-02"]
+
+
+@pytest.fixture
+def branch(request):
+    name = "arch-" + request.node.name[len("test_"):][:30]
+    db.create_branch(name)
+    with db.use_branch(name):
+        db.insert_daily_many([{"dte": d, "units_baton": 100 + i, "u1000_baton": 20} for i, d in enumerate(DAYS)])
+        db.upsert_monthly("2024-01-01", 3000, 6000)
+        assert archive.archive_month("2024-01-01") == 3
+        yield name
+
+
+def _ids(dtes):
+    with db.connection() as conn:
+        return [conn.execute("SELECT id FROM daily WHERE dte=?", (d,)).fetchone()[0] for d in dtes]
+
+
+def _archived_ids():
+    return archive.read_enriched("2024-01-01", "2024-01-31")["id"].tolist()
+
+
+def test_delete_rows_thaws_archived_ids(branch):
+    old = _archived_ids()
+    assert db.delete_rows([old[1]]) == 1
+    assert archive.archived() == {}
+    with db.connection() as conn:
+        assert [r[0] for r in conn.execute("SELECT dte FROM daily WHERE dte < '2024-02-01' ORDER BY dte")] == [
+            "2024-01-01", "2024-01-03"]
+
+
+def test_delete_row_returns_rowcount(branch):
+    assert db.delete_row(_archived_ids()[0]) == 1
+    assert db.delete_row(999_999) == 0
+
+
+def test_update_daily_rows_thaws_and_counts_real_rows(branch):
+    old = _archived_ids()
+    assert db.update_daily_rows({old[2]: {"units_baton": 7}, 999_999: {"units_baton": 1}}) == 1
+    assert archive.archived() == {}
+    with db.connection() as conn:
+        assert conn.execute("SELECT units_baton FROM daily WHERE id=?", (old[2],)).fetchone()[0] == 7
+
+
+def test_hot_writes_leave_archive_alone(branch):
+    assert db.delete_rows(_ids(["2024-02-01"])) == 1
+    assert archive.archived() == {"2024-01-01": 3}
+
+
+def test_page_daily_includes_archived_rows(branch):
+    seen, after = [], None
+    while True:
+        page, after = db.page_daily(after=after, limit=2)
+        seen += page["dte"].dt.strftime("%Y-%m-%d").tolist()
+        if after is None:
+            break
+    assert seen == DAYS
+    page, _ = db.page_daily(start="2024-01-02", end="2024-02-02", limit=10)
+    assert page["dte"].dt.strftime("%Y-%m-%d").tolist() == DAYS[1:4]
+    assert page["units_baton"].tolist() == [101, 102, 103]
+
+
+def test_archive_and_restore_count_as_writes(branch):
+    n, v = db.write_counter(), db.data_version()
+    assert archive.restore_month("2024-01-01")
+    assert db.write_counter() == n + 1
+    assert db.changes_since(v) is None  # RESET: المشتق يُعاد بناؤه
+    n = db.write_counter()
+    assert archive.archive_month("2024-01-01") == 3
+    assert db.write_counter() == n + 1
+    assert not archive.restore_month("2023-12-01")
+    assert db.write_counter() == n + 1
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""بيانات الرسوم: LTTB يحفظ الأطراف وعدد النقاط، والتجميع الشهري = الملخصات الشهرية."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import charts
+import db
+import rollups
+
+
+def _wave(n):
+    x = np.arange(n, dtype=np.int64) * 86400
+    return x, np.round(1000 * np.sin(np.arange(n) / 7.0)).astype(np.int64) + np.arange(n)
+
+
+@pytest.mark.parametrize("n,threshold", [(1000, 400), (401, 400), (50, 3), (10, 9)])
+def test_lttb_keeps_endpoints_and_returns_threshold_points(n, threshold):
+    x, y = _wave(n)
+    keep = charts.lttb(x, y, threshold)
+    assert len(keep) == threshold
+    assert keep[0] == 0 and keep[-1] == n - 1
+    assert (np.diff(keep) > 0).all()
+
+
+@pytest.mark.parametrize("n,threshold", [(400, 400), (10, 400), (0, 400)])
+def test_lttb_returns_input_unchanged_when_short(n, threshold):
+    x, y = _wave(n)
+    assert charts.lttb(x, y, threshold).tolist() == list(range(n))
+
+
+def test_monthly_series_totals_match_monthly_rollup(request):
+    name = "ch-" + request.node.name[len("test_"):][:30]
+    db.create_branch(name)
+    with db.use_branch(name):
+        days = pd.date_range("2024-11-20", "2025-02-10", freq="D").strftime("%Y-%m-%d")
+        db.insert_daily_many([
+            {"dte": d, "units_baton": 400 + 7 * i, "u1000_baton": 25 + i % 3, "flour_bags": 1, "flour_bag_price": 9000}
+            for i, d in enumerate(days)
+        ])
+        db.upsert_monthly("2024-12-01", 52_013, 78_001)
+        db.upsert_monthly("2025-01-01", 26_000, 0)
+        for metric in ("profit", "sales", "expenses"):
+            got, total = charts.series("month", metric)
+            want = rollups.monthly_totals(metrics=(metric,))
+            assert total == len(want) == 4
+            assert got["dte"].dt.strftime("%Y-%m-01").tolist() == want["month"].tolist()
+            assert got["value"].tolist() == want[metric].tolist()
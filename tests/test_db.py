@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""طبقة التخزين: الترحيلات وحدود القيم والقراءة والمجمّع."""
+import threading
+
+import db
+
+
+def _downgrade_to(path, version):
+    """قاعدة بمخطط كامل ثم user_version أقدم (لإعادة تشغيل ترحيل بعينه)."""
+    with db.connection(path) as conn:
+        conn.execute("DROP INDEX IF EXISTS ux_daily_dte")
+        conn.execute(f"PRAGMA user_version={version}")
+
+
+def test_unique_dte_migration_keeps_dropped_duplicates(tmp_path):
+    path = str(tmp_path / "dups.db")
+    db.migrate(path)
+    _downgrade_to(path, 6)
+    with db.connection(path) as conn:
+        conn.execute("INSERT INTO daily (dte, units_baton, u1000_baton, yeast) VALUES ('2025-03-01', 500, 20, 700)")
+        conn.execute("INSERT INTO daily (dte, units_baton, u1000_baton, yeast) VALUES ('2025-03-01', 0, 20, 0)")
+        conn.execute("INSERT INTO daily (dte, units_baton, u1000_baton) VALUES ('2025-03-02', 10, 20)")
+        older, newer = [r[0] for r in conn.execute("SELECT id FROM daily WHERE dte='2025-03-01' ORDER BY id")]
+
+    db.migrate(path)
+
+    with db.connection(path) as conn:
+        kept = conn.execute("SELECT id, units_baton, yeast FROM daily WHERE dte='2025-03-01'").fetchall()
+        assert conn.execute("SELECT COUNT(*) FROM daily").fetchone()[0] == 2
+    assert kept == [(newer, 0, 0)]
+    removed = db.duplicate_rows(path)
+    assert removed[["id", "dte", "units_baton", "yeast", "kept_id"]].values.tolist() == [
+        [older, "2025-03-01", 500, 700, newer]
+    ]
+
+
+def test_unique_dte_migration_without_duplicates(tmp_path):
+    path = str(tmp_path / "clean.db")
+    db.migrate(path)
+    _downgrade_to(path, 6)
+    db.migrate(path)
+    assert db.duplicate_rows(path).empty
+
+
+def test_unique_month_migration_keeps_dropped_duplicates(tmp_path):
+    path = str(tmp_path / "monthly-dups.db")
+    db.migrate(path)
+    with db.connection(path) as conn:
+        conn.execute("DROP INDEX ux_monthly_month")
+        conn.execute("PRAGMA user_version=1")
+        rows = [("2025-03-01", 100, 200), ("2025-03-01", 300, 400), ("2025-03-01", 500, 600), ("2025-04-01", 7, 8)]
+        ids = [conn.execute("INSERT INTO monthly (month, gas, rent) VALUES (?,?,?)", r).lastrowid for r in rows]
+
+    db.migrate(path)
+
+    with db.connection(path) as conn:
+        kept = conn.execute("SELECT id, month, gas, rent FROM monthly ORDER BY month").fetchall()
+    assert kept == [(ids[2], "2025-03-01", 500, 600), (ids[3], "2025-04-01", 7, 8)]
+    removed = db.duplicate_rows(path, table="monthly")
+    assert removed[["id", "month", "gas", "rent", "kept_id"]].values.tolist() == [
+        [ids[0], "2025-03-01", 100, 200, ids[2]], [ids[1], "2025-03-01", 300, 400, ids[2]]
+    ]
+    assert db.duplicate_rows(path).empty
+
+
+def test_read_daily_survives_values_beyond_int32(tmp_path):
+    path = str(tmp_path / "big.db")
+    with db.use_branch(None):
+        db.migrate(path)
+        with db.connection(path) as conn:
+            conn.execute("INSERT INTO daily (dte, salaries, yeast) VALUES ('2025-03-01', 3000000000, 5)")
+            conn.execute("INSERT INTO daily (dte, salaries, yeast) VALUES ('2025-03-02', NULL, 6)")
+            df = db.read_daily(conn=conn)
+    assert str(df["salaries"].dtype) == "Int64" and str(df["yeast"].dtype) == "Int32"
+    assert df["salaries"].tolist()[0] == 3_000_000_000 and df["salaries"].isna().tolist() == [False, True]
+
+
+def test_pool_is_reentrant_per_thread():
+    pool = db.ConnectionPool(":memory:")
+    with pool.connection() as outer:
+        outer.execute("CREATE TABLE t (x)")
+        with pool.connection() as inner:  # اتصال واحد فقط: بدون إعادة الدخول ينتظر للأبد
+            assert inner is outer
+            inner.execute("INSERT INTO t VALUES (1)")
+        outer.execute("INSERT INTO t VALUES (2)")
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 2
+
+
+def test_pool_wait_times_out_with_clear_error(monkeypatch):
+    monkeypatch.setattr(db, "POOL_TIMEOUT_S", 0.05)
+    pool = db.ConnectionPool(":memory:")
+    errors = []
+
+    def other():
+        try:
+            with pool.connection():
+                pass
+        except TimeoutError as e:
+            errors.append(str(e))
+
+    with pool.connection():
+        t = threading.Thread(target=other)
+        t.start()
+        t.join(5)
+    assert not t.is_alive() and len(errors) == 1 and ":memory:" in errors[0]
+    with pool.connection():  # الاتصال عاد للمجمّع
+        pass
+    assert pool.stats["errors"] == 1
+
+
+def test_init_db_fallback_caches_the_failed_path(monkeypatch, tmp_path):
+    bad = str(tmp_path / "missing" / "bakery.db")  # المجلد غير موجود → لا يُفتح
+    monkeypatch.setattr(db, "DB_FILE", bad)
+    monkeypatch.setattr(db, "DB_PERSISTENT", True)
+    monkeypatch.setattr(db, "_init_result", {})
+    calls = []
+    real = db.migrate
+    monkeypatch.setattr(db, "migrate", lambda path=None: calls.append(path) or real(path))
+    assert db.init_db(bad) is False
+    assert db.DB_FILE == ":memory:" and calls == [bad, ":memory:"]
+    assert db.init_db(bad) is False
+    assert db.init_db() is False
+    assert calls == [bad, ":memory:"]
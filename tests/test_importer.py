@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""استيراد ملف التصدير نفسه (ذهابًا وإيابًا)."""
+import pytest
+
+import db
+import exporter
+import importer
+
+COLS = ["dte", "units_baton", "units_round", "u1000_baton", "u1000_round", "flour_bags", "yeast", "funding"]
+ROWS = [
+    ("2025-01-30", 900, 100, 20, 25, 3, 40, 0),
+    ("2025-01-31", 800, 120, 20, 25, 2, 35, 500),
+    ("2025-02-01", 1000, 0, 21, 25, 3, 50, 0),
+    ("2025-02-02", 950, 80, 21, 25, 3, 45, 0),
+]
+
+
+def _daily(branch):
+    with db.use_branch(branch), db.connection() as conn:
+        return conn.execute(f"SELECT {', '.join(COLS)} FROM daily ORDER BY dte").fetchall()
+
+
+def _seed(branch):
+    db.create_branch(branch)
+    with db.use_branch(branch):
+        db.insert_daily_many([dict(zip(COLS, r)) for r in ROWS])
+
+
+@pytest.mark.parametrize("split_by_month, max_rows, sheets", [
+    (False, exporter.MAX_SHEET_ROWS, ["يومي"]),
+    (True, exporter.MAX_SHEET_ROWS, ["2025-01", "2025-02"]),
+    (False, 3, ["يومي", "يومي 2"]),
+])
+def test_export_import_round_trip(tmp_path, monkeypatch, split_by_month, max_rows, sheets):
+    monkeypatch.setattr(exporter, "MAX_SHEET_ROWS", max_rows)
+    src, dst = f"rt_src_{split_by_month}_{max_rows}", f"rt_dst_{split_by_month}_{max_rows}"
+    _seed(src)
+    file = str(tmp_path / "export.xlsx")
+    with db.use_branch(src):
+        stats = exporter.write_workbook(file, split_by_month=split_by_month)
+    assert [s for s in stats["sheets"] if s != exporter.MONTHLY_SHEET] == sheets
+
+    db.create_branch(dst)
+    with db.use_branch(dst):
+        rep = importer.import_file(file)
+    assert (rep["read"], rep["inserted"], rep["rejected"]) == (len(ROWS), len(ROWS), [])
+    assert _daily(dst) == _daily(src) == [tuple(r) for r in ROWS]
+
+
+def test_rejected_lines_name_the_sheet(tmp_path):
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    wb.active.title = "2025-01"
+    wb.active.append(["التاريخ", db.DAILY_LABELS["units_baton"]])
+    wb.active.append(["2025-01-01", 10])
+    ws = wb.create_sheet("2025-02")
+    ws.append(["التاريخ", db.DAILY_LABELS["units_baton"]])
+    ws.append(["2025-02-01", 5])
+    ws.append(["2025-02-02", -1])
+    file = str(tmp_path / "bad.xlsx")
+    wb.save(file)
+
+    db.create_branch("rt_rejected")
+    with db.use_branch("rt_rejected"):
+        rep = importer.import_file(file, dry_run=True)
+    assert rep["read"] == 3
+    assert rep["rejected"] == [("2025-02!3", "units_baton: قيمة سالبة")]
+    # السرعة للمُدخل فعلًا (لا شيء في dry_run)، والمقروء شامل المرفوض منفصل
+    assert rep["rows_per_sec"] == 0 and rep["scanned_per_sec"] == 3 / rep["seconds"]
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""طابور الإدخال: مرة واحدة فقط، تدوير المقاطع، كل الفروع، والاسترجاع بعد توقف مفاجئ."""
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+import db
+import ingest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def branch(request, monkeypatch):
+    monkeypatch.setattr(ingest, "start", lambda: None)  # بدون كاتب في الخلفية: التطبيق بـ flush صريح
+    name = "in-" + request.node.name[len("test_"):][:30]
+    db.create_branch(name)
+    with db.use_branch(name):
+        yield name
+
+
+def _rows():
+    with db.connection() as conn:
+        return conn.execute("SELECT dte, units_baton FROM daily ORDER BY dte").fetchall()
+
+
+def _logged():
+    with db.connection() as conn:
+        return conn.execute("SELECT status, COUNT(*) FROM ingest_log GROUP BY status ORDER BY status").fetchall()
+
+
+def test_segment_applied_twice_is_counted_once(branch):
+    for i in range(3):
+        ingest.submit({"dte": f"2025-05-0{i + 1}", "units_baton": i + 1}, replace=True)
+    path = db.current_path()
+    ingest._rotate(path)
+    [seg] = ingest._segments(path)
+    shutil.copy(seg, seg + ".bak")
+    assert ingest.flush() == 3
+
+    os.replace(seg + ".bak", seg)  # نفس المقطع مرة ثانية (توقف بعد commit وقبل الحذف)
+    with db.connection() as conn:
+        conn.execute("UPDATE daily SET units_baton = 99 WHERE dte = '2025-05-01'")
+    assert ingest.flush() == 0
+    assert ingest._segments(path) == []
+    assert _rows() == [("2025-05-01", 99), ("2025-05-02", 2), ("2025-05-03", 3)]  # replace لم يُطبَّق ثانية
+    assert _logged() == [("inserted", 3)]
+
+
+def test_rotation_keeps_order_and_new_appends(branch):
+    path = db.current_path()
+    first = ingest.submit({"dte": "2025-06-01", "units_baton": 1})
+    ingest._rotate(path)
+    dup = ingest.submit({"dte": "2025-06-01", "units_baton": 5})
+    ingest._rotate(path)
+    ingest.submit({"dte": "2025-06-01", "units_baton": 2}, replace=True)
+    assert len(ingest._segments(path)) == 2 and os.path.exists(ingest._journal(path))
+    assert ingest.queue_depth(path) == 3
+
+    assert ingest.flush() == 3
+    assert _rows() == [("2025-06-01", 2)]
+    assert ingest.status(first)[0] == "inserted" and ingest.status(dup)[0] == "duplicate"
+    assert ingest.queue_depth(path) == 0 and ingest._segments(path) == []
+
+
+def test_flush_all_applies_every_branch(branch):
+    other = branch + "-b"
+    db.create_branch(other)
+    ingest.submit({"dte": "2025-07-01", "units_baton": 1})
+    with db.use_branch(other):
+        ingest.submit({"dte": "2025-07-02", "units_baton": 2})
+    assert ingest.flush_all() == 2
+    assert _rows() == [("2025-07-01", 1)]
+    with db.use_branch(other):
+        assert _rows() == [("2025-07-02", 2)]
+        assert ingest.queue_depth() == 0
+
+
+# بعد commit دفعة: توقف العملية قبل الدفعة التالية (مقطع نصف مطبّق) أو قبل حذف المقطع
+_CRASH = textwrap.dedent("""
+    import os, sys
+    sys.path.insert(0, {root!r})
+    import db, ingest
+
+    db.init_db()
+    ingest.start = lambda: None
+    ingest.FLUSH_ROWS = 2
+    for i in range(5):
+        ingest.submit({{"dte": f"2025-08-0{{i + 1}}", "units_baton": i + 1}}, replace=True)
+    ingest.submit({{"dte": "2025-08-01", "units_baton": 7}})  # duplicate
+    point = {point!r}
+    if point == "batch":
+        real = db.insert_daily_queued
+        def once(entries):
+            out = real(entries)
+            os._exit(9)
+        db.insert_daily_queued = once
+    else:
+        remove = os.remove
+        os.remove = lambda p: os._exit(9) if p.endswith(".seg") else remove(p)
+    ingest.flush()
+    os._exit(0)  # لا نصل هنا
+""")
+
+
+@pytest.mark.parametrize("point", ["batch", "remove"])
+def test_replay_after_crash_applies_each_ticket_once(tmp_path, point):
+    env = dict(os.environ, DB_DIR=str(tmp_path))
+    env.pop("BAKERY_BRANCH", None)
+    crash = subprocess.run([sys.executable, "-c", _CRASH.format(root=ROOT, point=point)], env=env, cwd=ROOT)
+    assert crash.returncode == 9
+    segs = [f for f in os.listdir(tmp_path) if f.endswith(".seg")]
+    assert len(segs) == 1  # المقطع بقي على القرص
+
+    replay = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "ingest.py")], env=env, cwd=ROOT, capture_output=True, text=True)
+    assert replay.returncode == 0, replay.stderr
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".seg")]
+    [dbfile] = [f for f in os.listdir(tmp_path) if f.endswith(".db")]
+    with sqlite3.connect(os.path.join(tmp_path, dbfile)) as conn:
+        rows = conn.execute("SELECT dte, units_baton FROM daily ORDER BY dte").fetchall()
+        log = conn.execute("SELECT status, COUNT(*) FROM ingest_log GROUP BY status ORDER BY status").fetchall()
+    assert rows == [(f"2025-08-0{i + 1}", i + 1) for i in range(5)]
+    assert log == [("duplicate", 1), ("inserted", 5)]
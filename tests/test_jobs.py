@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""طابور المهام: دمج الطلبات المنتظرة، ومهمة جارية واحدة لكل نوع."""
+import threading
+
+import pytest
+
+import db
+import jobs
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    monkeypatch.setitem(jobs._HANDLERS, "sheets_sync", lambda full=False: {"full": full})
+    db.init_db(db.DB_FILE)
+    with jobs._connection() as conn:
+        conn.execute("DELETE FROM jobs")
+    yield
+    with jobs._connection() as conn:
+        conn.execute("DELETE FROM jobs")
+
+
+def _rows():
+    with jobs._connection() as conn:
+        return conn.execute("SELECT id, kind, status, requests FROM jobs ORDER BY id").fetchall()
+
+
+def _in_thread(fn, n=1):
+    """fn في n خيوط تبدأ معًا (عمّال/جلسات منفصلة)."""
+    barrier, out = threading.Barrier(n), [None] * n
+
+    def run(i):
+        barrier.wait()
+        out[i] = fn()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return out
+
+
+def test_sync_requests_collapse_while_one_is_pending(queue):
+    first = jobs.submit("sheets_sync", start_workers=False)
+    assert jobs._claim()[0] == first  # جارية: لا تُدمج معها الطلبات الجديدة
+    ids = _in_thread(lambda: jobs.submit("sheets_sync", start_workers=False), n=2)
+    assert ids[0] == ids[1] != first
+    assert jobs.submit("sheets_sync", {"full": True}, start_workers=False) not in ids  # معاملات مختلفة
+    assert _rows()[:2] == [(first, "sheets_sync", jobs.RUNNING, 1), (ids[0], "sheets_sync", jobs.QUEUED, 2)]
+    assert jobs.pending_count() == 3
+
+
+def test_second_worker_cannot_claim_running_kind(queue):
+    a = jobs.submit("sheets_sync", start_workers=False)
+    b = jobs.submit("sheets_sync", {"full": True}, start_workers=False)
+    exp = jobs.submit("export", start_workers=False)
+    claimed = _in_thread(jobs._claim, n=2)
+    assert sorted(job[0] for job in claimed) == [a, exp]  # b ينتظر رغم وجود عامل فاضي
+    assert _in_thread(jobs._claim) == [None]
+
+    assert jobs._run(a, "sheets_sync", '{"branch": null}') == jobs.DONE
+    job = jobs._claim()
+    assert job[0] == b
+    assert jobs._run(*job) == jobs.DONE and jobs.get(b)["result"] == {"full": True}
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""الحسابات المشتقة: تقرير الذاكرة والمحرك لكل فرع."""
+import pandas as pd
+
+import metrics
+
+
+def test_memory_report_measures_legacy_dtypes():
+    df = pd.DataFrame({
+        "dte": pd.to_datetime(["2025-01-01", "2025-01-02"]),
+        "yeast": pd.array([1, 2], dtype="Int32"),
+        "funding": pd.array([None, 5], dtype="Int32"),
+        "month": pd.PeriodIndex(["2025-01", "2025-01"], freq="M"),
+    })
+    legacy = metrics.legacy_frame(df)
+    assert [str(t) for t in legacy.dtypes] == ["datetime64[ns]", "int64", "float64", "datetime64[ns]"]
+    rep = metrics.memory_report(df).set_index("column")
+    assert rep.loc["yeast", "bytes"] == 2 * 4 + 2  # قيم int32 + قناع الفراغ
+    assert rep.loc["yeast", "legacy_bytes"] == 16
+    assert rep.loc["funding", "legacy_bytes"] == 16
+
+
+def test_engine_reads_its_own_branch_from_another_thread_branch():
+    import db
+
+    for name, units in (("eng-a", 100), ("eng-b", 200)):
+        db.create_branch(name)
+        with db.use_branch(name):
+            db.insert_daily_many([{"dte": "2025-01-01", "units_baton": units, "u1000_baton": 20}])
+    eng = metrics.engine(db.branch_path("eng-b"))
+    with db.use_branch("eng-a"):
+        assert eng.daily()["units_baton"].tolist() == [200]
+        with db.use_branch("eng-b"):
+            row = db.insert_daily({"dte": "2025-01-02", "units_baton": 300, "u1000_baton": 20})
+            db.upsert_monthly("2025-01-01", 100, 100)
+        assert eng.daily()["units_baton"].tolist() == [200, 300]  # تزايدي من eng-b
+        assert eng.daily()["id"].tolist()[-1] == row
+        assert eng.monthly()["gas"].tolist() == [100]
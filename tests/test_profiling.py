@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+"""تصدير المجاميع بصيغة Prometheus."""
+import profiling
+
+
+def test_prometheus_keeps_large_counts_exact(monkeypatch):
+    monkeypatch.setattr(profiling, "_spans", {"db.read_daily": [1_234_567, 0.1 + 0.2, 1e-7]})
+    monkeypatch.setattr(profiling, "_sql", {"SELECT 1": [3, 2.5, 1.0, 98_765_432_109]})
+    lines = dict(
+        line.rsplit(" ", 1) for line in profiling.prometheus().splitlines() if not line.startswith("#")
+    )
+    assert lines['bakery_span_calls_total{span="db.read_daily"}'] == "1234567"
+    assert lines['bakery_span_seconds_total{span="db.read_daily"}'] == repr(0.1 + 0.2)
+    assert float(lines['bakery_span_seconds_max{span="db.read_daily"}']) == 1e-7
+    assert lines['bakery_sql_rows_total{statement="SELECT 1"}'] == "98765432109"
+    assert lines['bakery_sql_seconds_total{statement="SELECT 1"}'] == "2.5"
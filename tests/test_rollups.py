@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""الملخصات المحفوظة: إعادة توزيع الشهر، التحديث بالشهر فقط، والتطابق مع pandas."""
+import pandas as pd
+import pytest
+
+import archive
+import db
+import metrics
+import rollups
+from metrics import WORKING_DAYS_PER_MONTH as W
+
+DAY = {"units_baton": 500, "u1000_baton": 25, "flour_bags": 1, "flour_bag_price": 1000}
+
+
+@pytest.fixture
+def branch(request):
+    name = "ru-" + request.node.name[len("test_"):][:30]
+    db.create_branch(name)
+    with db.use_branch(name):
+        yield name
+
+
+def _allocated(month):
+    with db.connection() as conn:
+        return conn.execute(
+            "SELECT dte, allocated FROM daily_rollup WHERE month=? ORDER BY dte", (month,)
+        ).fetchall()
+
+
+def _seed(days):
+    db.insert_daily_many([{"dte": d, **DAY} for d in days])
+
+
+def test_monthly_change_rebalances_days_and_last_day_remainder(branch):
+    _seed(["2025-03-01", "2025-03-02", "2025-03-05"])
+    db.upsert_monthly("2025-03-01", W * 100 + 7, W * 10 + 3)
+    assert _allocated("2025-03-01") == [
+        ("2025-03-01", 110), ("2025-03-02", 110), ("2025-03-05", 110 + 7 + 3)]
+
+    db.upsert_monthly("2025-03-01", W * 50, W * 20 + 1)
+    assert _allocated("2025-03-01") == [("2025-03-01", 70), ("2025-03-02", 70), ("2025-03-05", 71)]
+    # يوم أحدث في الشهر: البواقي تنتقل إليه
+    _seed(["2025-03-09"])
+    assert _allocated("2025-03-01")[-2:] == [("2025-03-05", 70), ("2025-03-09", 71)]
+    with db.connection() as conn:
+        assert conn.execute("SELECT allocated FROM monthly_rollup WHERE month='2025-03-01'").fetchone()[0] == (
+            4 * 70 + 1)
+    assert rollups.verify() == []
+
+
+def test_back_dated_insert_refreshes_only_its_month(branch, monkeypatch):
+    _seed(["2025-01-10", "2025-02-10", "2025-03-10"])
+    with db.connection() as conn:  # علامة في شهر آخر: لو أُعيد حسابه تختفي
+        conn.execute("UPDATE daily_rollup SET funding = 999 WHERE dte = '2025-03-10'")
+    seen = []
+    real = rollups.refresh_months
+    monkeypatch.setattr(rollups, "refresh_months", lambda conn, months: seen.append(set(months)) or real(conn, months))
+
+    db.insert_daily({"dte": "2025-01-03", **DAY})
+
+    assert seen == [{"2025-01-01"}]
+    with db.connection() as conn:
+        assert conn.execute("SELECT funding FROM daily_rollup WHERE dte = '2025-03-10'").fetchone()[0] == 999
+        assert conn.execute("SELECT days FROM monthly_rollup WHERE month = '2025-01-01'").fetchone()[0] == 2
+
+
+def test_verify_matches_full_pandas_recompute(branch):
+    _seed(["2025-01-30", "2025-01-31", "2025-02-01", "2025-02-14", "2025-04-02"])
+    db.insert_daily({"dte": "2025-02-15", "units_round": 90, "u1000_round": 16, "funding": 5000, "yeast": 300})
+    db.upsert_monthly("2025-01-01", 9001, 15002)
+    db.upsert_monthly("2025-02-01", 2600, 0)
+    db.upsert_monthly("2025-03-01", 500, 500)  # شهر بلا أيام
+    assert archive.archive_month("2025-01-01") == 2  # المؤرشف يدخل المقارنة من Parquet
+    assert rollups.verify() == []
+    df = metrics.fetch_daily_df()
+    assert rollups.summary() == {
+        "sales": df["إجمالي المبيعات"].sum(),
+        "expenses": df["الإجمالي اليومي للمصروفات (شامل الموزع)"].sum(),
+        "profit": df["الربح الصافي لليوم"].sum(),
+    }
+
+
+def test_rebuild_leaves_archived_months_alone(branch):
+    _seed(["2025-01-05", "2025-01-06", "2025-02-05"])
+    db.upsert_monthly("2025-01-01", W * 10, 0)
+    assert archive.archive_month("2025-01-01") == 2
+    before = rollups.monthly_totals()
+    with db.connection() as conn:
+        rollups.rebuild(conn)
+    assert rollups.monthly_totals().equals(before)
+    assert [d for d, _ in _allocated("2025-01-01")] == ["2025-01-05", "2025-01-06"]
+    assert rollups.verify() == []
+
+
+def test_two_branches_summary_and_combined_series(branch, monkeypatch):
+    other = branch + "-b"
+    db.create_branch(other)
+    _seed(["2025-03-01", "2025-03-02", "2025-03-04"])
+    db.upsert_monthly("2025-03-01", W * 100 + 7, 0)
+    with db.use_branch(other):
+        db.insert_daily_many([{"dte": d, **DAY, "units_baton": 300} for d in ["2025-03-02", "2025-03-03"]])
+        db.upsert_monthly("2025-03-01", W * 40, W * 5 + 1)
+
+    per = rollups.summary_by_branch([branch, other])
+    assert per[branch] == rollups.summary()
+    with db.use_branch(other):
+        assert per[other] == rollups.summary()
+        other_series = rollups.daily_series(metrics=("sales", "profit"))
+    assert per[branch]["sales"] == 3 * 500 * 40 and per[other]["sales"] == 2 * 300 * 40
+    assert rollups.combine(per) == {k: per[branch][k] + per[other][k] for k in per[branch]}
+
+    both = rollups.daily_series_all([branch, other], metrics=("sales", "profit"))
+    expected = (pd.concat([rollups.daily_series(metrics=("sales", "profit")), other_series])
+                .groupby("dte", as_index=False).sum())
+    assert both["dte"].dt.strftime("%Y-%m-%d").tolist() == ["2025-03-01", "2025-03-02", "2025-03-03", "2025-03-04"]
+    assert both[["sales", "profit"]].astype("int64").values.tolist() == expected[["sales", "profit"]].values.tolist()
+    assert int(both["profit"].sum()) == per[branch]["profit"] + per[other]["profit"]
+    part = rollups.daily_series_all([branch, other], start="2025-03-02", end="2025-03-03")
+    assert part["profit"].tolist() == expected["profit"].tolist()[1:3]
+    monkeypatch.setattr(db, "ATTACH_LIMIT", 1)  # فرع في كل دفعة ATTACH
+    assert rollups.daily_series_all([branch, other], metrics=("sales", "profit")).equals(both)
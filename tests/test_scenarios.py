@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""سيناريوهات الربح: النقطة الصفرية = الملخص، وΔ واحد = الحساب اليدوي بـ THOUSAND // u1000."""
+import pytest
+
+import db
+import rollups
+import scenarios
+
+DAYS = [
+    {"dte": "2025-03-01", "units_baton": 500, "u1000_baton": 25, "units_round": 90, "u1000_round": 16,
+     "flour_bags": 1, "flour_bag_price": 1000, "yeast": 300},
+    {"dte": "2025-03-02", "units_baton": 300, "u1000_baton": 40, "flour_bags": 2, "flour_bag_price": 1250},
+    {"dte": "2025-04-01", "units_baton": 100, "u1000_baton": 20, "flour_bags": 1, "flour_bag_price": 900},
+]
+MARCH = ("2025-03-01", "2025-03-31")
+
+
+@pytest.fixture
+def branch(request):
+    name = "sc-" + request.node.name[len("test_"):][:30]
+    db.create_branch(name)
+    with db.use_branch(name):
+        db.insert_daily_many(DAYS)
+        db.upsert_monthly("2025-03-01", 2600, 5201)
+        yield name
+
+
+def test_zero_delta_cell_equals_summary_profit(branch):
+    grid = scenarios.profit_grid((-3, 0, 4), (0, 2), (-10, 0), *MARCH)
+    assert grid.shape == (3, 2, 2)
+    assert grid[1, 0, 1] == rollups.summary(*MARCH)["profit"]
+    assert scenarios.profit_grid()[0, 0, 0] == rollups.summary()["profit"]
+    assert scenarios.profit_surface(start=MARCH[0], end=MARCH[1]).loc[0, 0] == rollups.summary(*MARCH)["profit"]
+
+
+def test_single_delta_matches_hand_computed_integer_pricing(branch):
+    profit = rollups.summary(*MARCH)["profit"]
+    # Δ البسطونة +5: 500 × (1000//30 − 1000//25) + 300 × (1000//45 − 1000//40)
+    baton = 500 * (33 - 40) + 300 * (22 - 25)
+    assert scenarios.profit_grid((5,), (0,), (0,), *MARCH)[0, 0, 0] == profit + baton == profit - 4400
+    # Δ المدور −30: u1000 = 16 − 30 → 1 فيصير سعر الوحدة 1000
+    assert scenarios.profit_grid((0,), (-30,), (0,), *MARCH)[0, 0, 0] == profit + 90 * (1000 - 62)
+    # ٪ الدقيق +10: 1000 → 1100 و 2500 → 2750
+    assert scenarios.profit_grid((0,), (0,), (10,), *MARCH)[0, 0, 0] == profit - 100 - 250
+    surface = scenarios.profit_surface((5,), (10,), *MARCH)  # Δ للنوعين معًا: المدور 1000//21 = 47
+    assert surface.loc[10, 5] == profit + baton + 90 * (47 - 62) - 350
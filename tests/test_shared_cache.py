@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""الكاش المشترك: مجلد لكل فرع، وأسماء متشابهة لا تمسح بعضها."""
+import os
+
+import pandas as pd
+
+import db
+import shared_cache
+
+
+def _frame(value):
+    return lambda: pd.DataFrame({"x": [value]})
+
+
+def test_branches_and_names_with_common_prefix_do_not_collide():
+    main = db.current_path()
+    # فرع اسمه "daily": ملفه <القاعدة>.daily.db يبدأ بنفس بادئة إطار "daily" للرئيسي
+    other = db.create_branch("daily")
+    shared_cache.clear(main)
+    shared_cache.frame("daily", _frame(1), path=main)
+    shared_cache.frame("series", _frame(2), path=main)
+    shared_cache.frame("series.profit", _frame(3), path=main)
+    shared_cache.frame("daily", _frame(4), path=other)
+    with db.connection(main) as conn:  # كتابة على الرئيسي → تخزين نسخة أحدث يحذف الأقدم منه فقط
+        conn.execute("UPDATE write_counter SET n = n + 1 WHERE id = 1")
+    shared_cache.frame("series", _frame(5), path=main)
+
+    assert shared_cache.frame("daily", _frame(-1), path=other)["x"].tolist() == [4]
+    assert shared_cache.frame("series", _frame(-1), path=main)["x"].tolist() == [5]
+    names = sorted(os.listdir(os.path.join(shared_cache.cache_dir(main), os.path.basename(main))))
+    n = db.write_counter(main)
+    assert names == [f"daily.{n - 1}.arrow", f"series.{n}.arrow", f"series.profit.{n - 1}.arrow"]
+    assert shared_cache.stats(main)["files"] == 4
+
+
+def test_pre_read_counter_skips_storing_a_stale_build():
+    path = db.current_path()
+    shared_cache.clear(path)
+    before = db.write_counter(path)
+    with db.connection(path) as conn:  # كتابة بعد قراءة العدّاد وقبل البناء
+        conn.execute("UPDATE write_counter SET n = n + 1 WHERE id = 1")
+    assert shared_cache.frame("stale", _frame(1), path=path, counter=before)["x"].tolist() == [1]
+    assert shared_cache.stats(path)["files"] == 0
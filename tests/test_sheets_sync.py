@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""المزامنة التزايدية مع Google Sheets على ورقة في الذاكرة."""
+import pandas as pd
+import pytest
+
+import db
+import sheets_sync
+from fakes import FakeSpreadsheet
+
+
+class Timeout(Exception):
+    code = 503
+
+
+@pytest.fixture
+def ws():
+    db.init_db()
+    sheets_sync.reset_state()
+    return FakeSpreadsheet().add_worksheet("Daily", rows=100, cols=10)
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(sheets_sync.time, "sleep", lambda s: None)
+
+
+def _frame(rows):
+    return pd.DataFrame(rows, columns=["id", "dte", "sales"])
+
+
+BASE = [(1, "2025-03-01", 100), (2, "2025-03-02", 200), (3, "2025-03-03", 300)]
+
+
+def test_first_sync_is_full(ws):
+    report = sheets_sync.sync_frame(ws, _frame(BASE), "id")
+    assert report["mode"] == "full"
+    assert ws.get_all_values() == [["id", "dte", "sales"], [1, "2025-03-01", 100],
+                                   [2, "2025-03-02", 200], [3, "2025-03-03", 300]]
+
+
+def test_incremental_append(ws):
+    sheets_sync.sync_frame(ws, _frame(BASE), "id")
+    ws.calls.clear()
+    report = sheets_sync.sync_frame(ws, _frame(BASE + [(4, "2025-03-04", 400)]), "id")
+    assert (report["mode"], report["appended"], report["updated"], report["deleted"]) == ("incremental", 1, 0, 0)
+    assert ws.calls == ["append_rows"]
+    assert ws.get_all_values()[-1] == [4, "2025-03-04", 400]
+
+
+def test_incremental_update(ws):
+    sheets_sync.sync_frame(ws, _frame(BASE), "id")
+    ws.calls.clear()
+    report = sheets_sync.sync_frame(ws, _frame([BASE[0], (2, "2025-03-02", 250), BASE[2]]), "id")
+    assert report["updated"] == 1
+    assert ws.calls == ["batch_update"]
+    assert ws.get_all_values()[2] == [2, "2025-03-02", 250]
+
+
+def test_incremental_delete_keeps_row_numbers(ws):
+    sheets_sync.sync_frame(ws, _frame(BASE), "id")
+    ws.calls.clear()
+    report = sheets_sync.sync_frame(ws, _frame([BASE[0], BASE[2]]), "id")
+    assert report["deleted"] == 1
+    assert ws.calls == ["delete_rows"]
+    # بعد الحذف يُعدَّل الصف الثالث في مكانه الجديد (السطر 3)
+    sheets_sync.sync_frame(ws, _frame([BASE[0], (3, "2025-03-03", 333)]), "id")
+    assert ws.get_all_values() == [["id", "dte", "sales"], [1, "2025-03-01", 100], [3, "2025-03-03", 333]]
+
+
+def test_update_is_retried_on_transient_error(ws):
+    sheets_sync.sync_frame(ws, _frame(BASE), "id")
+    ws.calls.clear()
+    ws.fail_next = [Timeout()]
+    report = sheets_sync.sync_frame(ws, _frame([(1, "2025-03-01", 111)] + BASE[1:]), "id")
+    assert report["updated"] == 1
+    assert ws.calls == ["batch_update", "batch_update"]
+    assert ws.get_all_values()[1] == [1, "2025-03-01", 111]
+
+
+def test_failed_append_is_not_retried_and_next_sync_is_full(ws):
+    sheets_sync.sync_frame(ws, _frame(BASE), "id")
+    ws.calls.clear()
+    ws.fail_next = [Timeout()]
+    grown = _frame(BASE + [(4, "2025-03-04", 400)])
+    with pytest.raises(Timeout):
+        sheets_sync.sync_frame(ws, grown, "id")
+    assert ws.calls == ["append_rows"]
+    assert sheets_sync._load_state("Daily") == (None, {})
+    report = sheets_sync.sync_frame(ws, grown, "id")
+    assert report["mode"] == "full"
+    assert len(ws.get_all_values()) == 5